@@ -0,0 +1,88 @@
+from heapq import heappop, heappush
+import threading
+
+
+class IdAllocator:
+    """ Asignador de identificadores únicos
+
+    Mantiene el conjunto de identificadores asignados y un montículo
+    de mínimos con los liberados, de modo que siempre se reutiliza
+    primero el identificador libre de menor valor.
+
+        · allocate: O(log n) si reutiliza un identificador, O(1)
+          amortizado si avanza el contador.
+        · reserve: O(1).
+        · release: O(log n).
+
+    El montículo se depura de forma perezosa: un identificador liberado
+    y reservado de nuevo se descarta al extraerlo. Todas las operaciones
+    son atómicas, protegidas por un cerrojo.
+
+    Opcionalmente se limita a un rango [inicio, fin], para que cada
+    partición de un despliegue distribuido asigne IDs disjuntos."""
+
+    def __init__(self, inicio=1, fin=None):
+        """ :param inicio: Primer identificador del rango.
+        :param fin: Último identificador del rango, None sin límite."""
+
+        self.inicio = inicio
+        self.fin = fin
+        self.current_id = inicio - 1  # Último identificador asignado por el contador.
+        self.assigned = set()  # Identificadores asignados.
+        self.released = []  # Montículo de identificadores liberados menores que current_id.
+        self._lock = threading.Lock()
+
+    def __contains__(self, target_id):
+        return target_id in self.assigned
+
+    def __len__(self):
+        return len(self.assigned)
+
+    def allocate(self):
+        """ Asigna el identificador disponible de menor valor.
+
+        :returns: Identificador asignado.
+        :raises IndexError: Si no quedan identificadores en el rango."""
+
+        with self._lock:
+            while self.released:
+                target_id = heappop(self.released)
+                if target_id not in self.assigned:
+                    self.assigned.add(target_id)
+                    return target_id
+
+            while True:
+                if self.fin is not None and self.current_id >= self.fin:
+                    raise IndexError(f'No quedan IDs libres en el rango {self.inicio}-{self.fin}.')
+                self.current_id += 1
+                if self.current_id not in self.assigned:
+                    break
+            self.assigned.add(self.current_id)
+            return self.current_id
+
+    def reserve(self, target_id):
+        """ Asigna un identificador concreto.
+
+        :param target_id: Identificador objetivo.
+        :returns: Identificador asignado.
+        :raises IndexError: Si el identificador ya está asignado o
+        está fuera del rango."""
+
+        with self._lock:
+            if target_id < self.inicio or (self.fin is not None and target_id > self.fin):
+                raise IndexError(f'El id {target_id} está fuera del rango {self.inicio}-{self.fin}.')
+            if target_id in self.assigned:
+                raise IndexError(f'El id {target_id} ya está registrado en el sistema.')
+            self.assigned.add(target_id)
+            return target_id
+
+    def release(self, target_id):
+        """ Libera un identificador para que pueda reutilizarse.
+
+        :param target_id: Identificador a liberar.
+        :raises KeyError: Si el identificador no estaba asignado."""
+
+        with self._lock:
+            self.assigned.remove(target_id)
+            if target_id <= self.current_id:
+                heappush(self.released, target_id)
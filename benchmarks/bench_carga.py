@@ -0,0 +1,187 @@
+""" Prueba de carga de las rutas de servidor.py
+
+Lanza servidor.py en un puerto local con un inventario generado y
+lo somete durante un tiempo a una mezcla ponderada de rutas desde
+varios procesos cliente, cada uno con su sesión persistente. Para cada
+ruta muestra las peticiones por segundo y las latencias p50, p95 y
+p99, y para el proceso servidor las escrituras a disco (llamadas
+write y bytes de /proc/<pid>/io, y las escrituras del almacenamiento
+de GET /persistencia). Los resultados se guardan en JSON para seguir
+su evolución entre versiones.
+
+    python benchmarks/bench_carga.py --habitaciones 20000 --clientes 8 --duracion 30 \\
+        --mezcla habitacion=60,disponibilidad=20,disponibles=5,listado=1,alta=2 \\
+        --salida resultados.json -- --servidor hilos --fsync siempre
+
+Los argumentos tras -- se pasan a servidor.py.
+"""
+from datetime import datetime, timezone
+from json import dump
+from math import ceil
+from multiprocessing import Pool
+from os import path
+from tempfile import TemporaryDirectory
+import argparse
+import random
+import subprocess
+import time
+
+import requests
+
+from utilidades import RAIZ
+
+import router  # noqa: E402
+
+""" Rutas de la mezcla: método y ruta, <id> se sustituye por un ID del inventario """
+RUTAS = {
+    'listado': ('GET', '/'),
+    'habitacion': ('GET', '/<id>'),
+    'disponibles': ('GET', '/disponibles'),
+    'disponibilidad': ('PUT', '/<id>/disponibilidad'),
+    'alta': ('POST', '/'),
+}
+MEZCLA = 'habitacion=60,disponibilidad=20,disponibles=2,listado=1,alta=2'
+
+
+def mezcla(texto):
+    pesos = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        if nombre not in RUTAS:
+            raise argparse.ArgumentTypeError(f'Ruta desconocida {nombre}, disponibles: {", ".join(RUTAS)}.')
+        pesos[nombre] = float(peso or 1)
+    return pesos
+
+
+def cliente(argumentos):
+    base, ids, pesos, duracion, semilla = argumentos
+    aleatorio = random.Random(semilla)
+    session = requests.Session()
+    nombres, cumulativos = list(pesos), list(pesos.values())
+    latencias = {nombre: [] for nombre in nombres}
+    errores = {nombre: 0 for nombre in nombres}
+
+    fin = time.monotonic() + duracion
+    while time.monotonic() < fin:
+        nombre = aleatorio.choices(nombres, cumulativos)[0]
+        metodo, ruta = RUTAS[nombre]
+        kwargs = {}
+        if '<id>' in ruta:
+            ruta = ruta.replace('<id>', str(aleatorio.choice(ids)))
+        if nombre == 'disponibilidad':
+            kwargs['params'] = {'disponible': aleatorio.choice(('true', 'false'))}
+        elif nombre == 'alta':
+            kwargs['json'] = {'plazas': 2, 'equipamiento': ['TV'], 'precio': 80}
+
+        inicio = time.perf_counter()
+        r = session.request(metodo, base + ruta, **kwargs)
+        r.content  # La latencia incluye la lectura del cuerpo completo.
+        latencias[nombre].append(time.perf_counter() - inicio)
+        if r.status_code >= 500:
+            errores[nombre] += 1
+    return latencias, errores
+
+
+def percentil(ordenadas, p):
+    """ Percentil por rango más cercano de una lista ordenada. """
+
+    if len(ordenadas) == 0:
+        return None
+    return ordenadas[max(0, ceil(p / 100 * len(ordenadas)) - 1)]
+
+
+def disco(proceso):
+    """ :returns: Llamadas write y bytes escritos por el proceso, None
+    si el sistema no expone /proc/<pid>/io."""
+
+    try:
+        with open(f'/proc/{proceso.pid}/io') as file:
+            campos = dict(linea.split(': ') for linea in file.read().splitlines())
+        return {'llamadas_write': int(campos['syscw']), 'bytes_escritos': int(campos['write_bytes'])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def diferencia(antes, despues):
+    if antes is None or despues is None:
+        return None
+    return {campo: despues[campo] - antes[campo] for campo in despues
+            if isinstance(despues[campo], (int, float)) and isinstance(antes.get(campo), (int, float))}
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=RAIZ, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de servidor.py.')
+    parser.add_argument('--habitaciones', type=int, default=20000, help='Tamaño del inventario generado.')
+    parser.add_argument('--clientes', type=int, default=8, help='Procesos cliente concurrentes.')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de medición.')
+    parser.add_argument('--mezcla', type=mezcla, default=mezcla(MEZCLA),
+                        help=f'Pesos de cada ruta, por defecto {MEZCLA}.')
+    parser.add_argument('--puerto', type=int, default=9180, help='Puerto del servidor.')
+    parser.add_argument('--salida', default='bench_carga.json', help='Fichero JSON de resultados.')
+    parser.add_argument('argumentos', nargs='*', help='Argumentos de servidor.py, tras --.')
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directorio:
+        proceso = router.lanzar_servidor(args.puerto, directorio, args.argumentos)
+        try:
+            base = f'http://localhost:{args.puerto}'
+            ids = []
+            for inicio in range(0, args.habitaciones, 1000):
+                lote = [{'plazas': 1 + i % 4, 'equipamiento': ['TV', 'wifi'], 'precio': 40 + i % 100}
+                        for i in range(inicio, min(args.habitaciones, inicio + 1000))]
+                r = requests.post(base + '/lote', json={'habitaciones': lote})
+                ids += [resultado['habitacion']['id'] for resultado in r.json()['resultados']]
+
+            disco_antes, persistencia_antes = disco(proceso), requests.get(base + '/persistencia').json()
+            with Pool(args.clientes) as pool:
+                inicio = time.perf_counter()
+                salidas = pool.map(cliente, [(base, ids, args.mezcla, args.duracion, i) for i in range(args.clientes)])
+                duracion = time.perf_counter() - inicio
+            disco_despues, persistencia_despues = disco(proceso), requests.get(base + '/persistencia').json()
+        finally:
+            router.detener_servidor(proceso)
+
+    rutas = {}
+    total = 0
+    for nombre in args.mezcla:
+        latencias = sorted(latencia for salida in salidas for latencia in salida[0][nombre])
+        errores = sum(salida[1][nombre] for salida in salidas)
+        total += len(latencias)
+        rutas[nombre] = {
+            'metodo': RUTAS[nombre][0], 'ruta': RUTAS[nombre][1], 'peticiones': len(latencias), 'errores_5xx': errores,
+            'peticiones_s': len(latencias) / duracion,
+            'p50_ms': None if not latencias else percentil(latencias, 50) * 1000,
+            'p95_ms': None if not latencias else percentil(latencias, 95) * 1000,
+            'p99_ms': None if not latencias else percentil(latencias, 99) * 1000,
+        }
+
+    resultados = {
+        'fecha': datetime.now(timezone.utc).isoformat(), 'commit': commit(),
+        'configuracion': {'habitaciones': args.habitaciones, 'clientes': args.clientes, 'duracion': args.duracion,
+                          'mezcla': args.mezcla, 'servidor': args.argumentos},
+        'peticiones': total, 'peticiones_s': total / duracion, 'rutas': rutas,
+        'disco': diferencia(disco_antes, disco_despues),
+        'persistencia': diferencia(persistencia_antes, persistencia_despues),
+    }
+    with open(args.salida, 'w') as file:
+        dump(resultados, file, indent=2)
+
+    print(f'{total} peticiones en {duracion:.1f}s, {total / duracion:.0f} peticiones/s')
+    for nombre, ruta in rutas.items():
+        print(f'{ruta["metodo"]:<4} {ruta["ruta"]:<22} {ruta["peticiones"]:>8} {ruta["peticiones_s"]:>9.0f}/s'
+              f'  p50 {ruta["p50_ms"] or 0:7.2f}ms  p95 {ruta["p95_ms"] or 0:7.2f}ms  p99 {ruta["p99_ms"] or 0:7.2f}ms'
+              f'  5xx {ruta["errores_5xx"]}')
+    print(f'Disco: {resultados["disco"]}, almacenamiento: {resultados["persistencia"]}')
+    print(f'Resultados en {path.abspath(args.salida)}')
+
+
+if __name__ == '__main__':
+    main()
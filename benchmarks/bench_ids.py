@@ -0,0 +1,50 @@
+""" Microbenchmark del asignador de identificadores de Room
+
+Asigna, libera y reasigna millones de identificadores y muestra el
+tiempo y las operaciones por segundo de cada fase.
+
+    python benchmarks/bench_ids.py --n 2000000
+"""
+from os import path
+import argparse
+import random
+import sys
+import time
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..'))
+
+from allocator import IdAllocator  # noqa: E402
+
+
+def medir(nombre, n, funcion):
+    inicio = time.perf_counter()
+    funcion()
+    duracion = time.perf_counter() - inicio
+    print(f'{nombre:<30} {n:>10} ops  {duracion:8.3f}s  {n / duracion:12.0f} ops/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Microbenchmark de IdAllocator.')
+    parser.add_argument('--n', type=int, default=2_000_000, help='Número de identificadores.')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    n = args.n
+    allocator = IdAllocator()
+    random.seed(args.semilla)
+
+    medir('allocate (contador)', n, lambda: [allocator.allocate() for _ in range(n)])
+
+    liberados = random.sample(range(1, n + 1), n // 2)
+    medir('release (aleatorio)', len(liberados), lambda: [allocator.release(i) for i in liberados])
+    medir('allocate (reutilizando)', len(liberados), lambda: [allocator.allocate() for _ in liberados])
+
+    reservas = range(n + 1, 2 * n + 1, 2)
+    medir('reserve', len(reservas), lambda: [allocator.reserve(i) for i in reservas])
+    medir('allocate (saltando reservas)', len(reservas), lambda: [allocator.allocate() for _ in reservas])
+
+    assert len(allocator) == n + 2 * len(reservas)
+
+
+if __name__ == '__main__':
+    main()
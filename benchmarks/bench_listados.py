@@ -0,0 +1,87 @@
+""" Benchmark de los listados con la caché de fragmentos JSON
+
+Da de alta N habitaciones en servidor.py y mide las peticiones por
+segundo de GET / a través de WSGI,
+* serializando cada habitación en cada petición, como antes de la
+caché de fragmentos,
+* con la caché caliente, concatenando los fragmentos,
+* con la caché, modificando un porcentaje de las habitaciones entre
+petición y petición, solo se serializan de nuevo las modificadas.
+
+    python benchmarks/bench_listados.py --n 50000 --peticiones 20 --cambios 1
+"""
+from json import dumps, loads
+from tempfile import TemporaryDirectory
+import argparse
+import random
+import time
+
+from utilidades import cargar_servidor, wsgi
+
+from fragmentos import Fragmentos  # noqa: E402
+import storage as almacenamiento  # noqa: E402
+
+
+class SinCache(Fragmentos):
+    """ Serializa la habitación en cada petición. """
+
+    def json(self, room):
+        return room.to_json()
+
+
+def medir(nombre, peticiones, antes=None):
+    duracion = 0.0
+    for _ in range(peticiones):
+        if antes is not None:
+            antes()
+        inicio = time.perf_counter()
+        estado, cuerpo = wsgi('GET', '/')
+        duracion += time.perf_counter() - inicio
+        assert estado.startswith('200'), estado
+    print(f'{nombre:<32} {peticiones:>6} peticiones  {duracion / peticiones * 1000:9.1f}ms/petición'
+          f'  {peticiones / duracion:8.1f} peticiones/s')
+    return cuerpo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GET / con y sin la caché de fragmentos JSON.')
+    parser.add_argument('--n', type=int, default=50000, help='Número de habitaciones.')
+    parser.add_argument('--peticiones', type=int, default=20, help='Peticiones GET / de cada medida.')
+    parser.add_argument('--cambios', type=float, default=1, help='Porcentaje de habitaciones modificadas entre '
+                                                                 'peticiones en la última medida.')
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directorio:
+        storage = almacenamiento.JournalStorage(directorio, almacenamiento.FSYNC_SO)
+        servidor = cargar_servidor(storage)
+        for inicio in range(0, args.n, 1000):
+            lote = [{'plazas': 1 + i % 4, 'equipamiento': ['TV', 'wifi', f'extra{i % 7}'], 'precio': 40 + i % 100}
+                    for i in range(inicio, min(args.n, inicio + 1000))]
+            estado, _ = wsgi('POST', '/lote', {'habitaciones': lote})
+            assert estado.startswith('201'), estado
+        ids = list(servidor.registry)
+
+        fragmentos = servidor.fragmentos
+        servidor.fragmentos = SinCache()
+        sin_cache = medir('Serializando cada habitación', args.peticiones)
+
+        servidor.fragmentos = fragmentos
+        fragmentos.vaciar()
+        medir('Caché fría (primera petición)', 1)
+        con_cache = medir('Caché caliente', args.peticiones)
+        assert con_cache == sin_cache
+        assert con_cache.decode() == dumps({h.id: h.to_dict() for h in servidor.registry.existing(ids)})
+
+        modificadas = max(1, int(len(ids) * args.cambios / 100))
+
+        def modificar():
+            for target_id in random.sample(ids, modificadas):
+                servidor.registry.modify(target_id, precio=random.randint(40, 140))
+
+        cuerpo = medir(f'Caché, {modificadas} cambios/petición', args.peticiones, modificar)
+        assert len(loads(cuerpo)) == len(ids)
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+""" Benchmark de las altas por lotes frente a las altas individuales
+
+Da de alta el mismo número de habitaciones con POST / (una petición
+y una escritura por habitación) y con POST /lote (una escritura por
+lote) y compara el número de habitaciones por segundo.
+
+    python benchmarks/bench_lote.py --n 20000 --lote 1000 --fsync siempre
+"""
+from tempfile import TemporaryDirectory
+import argparse
+import time
+
+from utilidades import cargar_servidor, wsgi
+
+import storage as almacenamiento  # noqa: E402
+
+
+def habitacion(i):
+    return {'plazas': 1 + i % 4, 'equipamiento': ['TV', 'wifi'], 'precio': 40 + i % 100}
+
+
+def individual(n):
+    for i in range(n):
+        estado, _ = wsgi('POST', '/', habitacion(i))
+        assert estado.startswith('201'), estado
+
+
+def por_lotes(n, lote):
+    for inicio in range(0, n, lote):
+        estado, _ = wsgi('POST', '/lote', {'habitaciones': [habitacion(i) for i in range(inicio, min(n, inicio + lote))]})
+        assert estado.startswith('201'), estado
+
+
+def medir(nombre, n, politica, funcion):
+    with TemporaryDirectory() as directorio:
+        storage = almacenamiento.JournalStorage(directorio, politica)
+        servidor = cargar_servidor(storage)
+        inicio = time.perf_counter()
+        funcion()
+        storage.close()
+        duracion = time.perf_counter() - inicio
+        for target_id in list(servidor.registry):
+            servidor.registry.remove(target_id)
+            servidor.Room.release_id(target_id)
+    print(f'{nombre:<20} {n:>8} habitaciones  {duracion:8.3f}s  {n / duracion:10.0f} habitaciones/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Altas por lotes frente a altas individuales.')
+    parser.add_argument('--n', type=int, default=20000, help='Número de habitaciones.')
+    parser.add_argument('--lote', type=int, default=1000, help='Habitaciones por lote.')
+    parser.add_argument('--fsync', choices=almacenamiento.POLITICAS_FSYNC, default=almacenamiento.FSYNC_SIEMPRE)
+    args = parser.parse_args()
+
+    medir('POST /', args.n, args.fsync, lambda: individual(args.n))
+    medir(f'POST /lote ({args.lote})', args.n, args.fsync, lambda: por_lotes(args.n, args.lote))
+
+
+if __name__ == '__main__':
+    main()
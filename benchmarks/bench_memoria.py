@@ -0,0 +1,62 @@
+""" Benchmark de memoria por habitación
+
+Construye N habitaciones con el modelo anterior (atributos en el
+__dict__ de cada instancia y una lista de equipamiento propia) y con
+Room (__slots__ y equipamiento codificado en el catálogo compartido)
+y muestra los bytes por habitación medidos con tracemalloc. El
+equipamiento se decodifica de JSON para cada habitación, como ocurre
+al cargar del disco.
+
+    python benchmarks/bench_memoria.py --n 1000000
+"""
+from json import loads
+from os import path
+import argparse
+import sys
+import tracemalloc
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..'))
+
+from room import Room  # noqa: E402
+
+EQUIPAMIENTO = '["TV", "wifi", "minibar", "aire acondicionado"]'
+
+
+class RoomAnterior:
+    """ Modelo de habitación anterior, con __dict__ por instancia """
+
+    def __init__(self, target_id, plazas, equipamiento, precio, disponible=True, version=0):
+        self.id = target_id
+        self.plazas = plazas
+        self.precio = precio
+        self.equipamiento = equipamiento.copy()
+        self.disponible = disponible
+        self.version = version
+
+
+def medir(nombre, n, construir):
+    tracemalloc.start()
+    inicio = tracemalloc.take_snapshot()
+    habitaciones = [construir(i) for i in range(1, n + 1)]
+    fin = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    # Se excluye el conjunto de IDs del asignador, que no forma parte de la habitación.
+    filtro = [tracemalloc.Filter(False, '*allocator.py')]
+    total = sum(estadistica.size_diff for estadistica in
+                fin.filter_traces(filtro).compare_to(inicio.filter_traces(filtro), 'filename'))
+    print(f'{nombre:<15} {n:>9} habitaciones  {total / 2 ** 20:9.1f} MiB  {total / n:7.1f} bytes/habitación')
+    return habitaciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memoria por habitación antes y después de __slots__.')
+    parser.add_argument('--n', type=int, default=1_000_000, help='Número de habitaciones.')
+    args = parser.parse_args()
+
+    medir('__dict__', args.n, lambda i: RoomAnterior(i, 2, loads(EQUIPAMIENTO), 80))
+    medir('__slots__', args.n, lambda i: Room(2, loads(EQUIPAMIENTO), 80, target_id=i))
+
+
+if __name__ == '__main__':
+    main()
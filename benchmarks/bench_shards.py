@@ -0,0 +1,86 @@
+""" Benchmark de escalado del despliegue particionado
+
+Para 1 a N particiones lanza router.py con un inventario generado y
+mide las peticiones por segundo de una mezcla de GET /<id> y
+PUT /<id>/disponibilidad desde varios procesos cliente. Con --directo
+los clientes calculan la partición dueña de cada ID y le envían la
+petición sin pasar por el enrutador, para separar el coste del
+enrutador del de las particiones.
+
+    python benchmarks/bench_shards.py --max-shards 4 --habitaciones 20000 --clientes 8
+"""
+from multiprocessing import Pool
+from tempfile import TemporaryDirectory
+import argparse
+import random
+import time
+
+import requests
+
+from utilidades import RAIZ  # noqa: F401
+
+import router  # noqa: E402
+
+TAM_RANGO = 10 ** 6
+
+
+def cliente(argumentos):
+    urls, ids, duracion, semilla = argumentos
+    aleatorio = random.Random(semilla)
+    session = requests.Session()
+    peticiones = 0
+    fin = time.monotonic() + duracion
+    while time.monotonic() < fin:
+        target_id = aleatorio.choice(ids)
+        base = urls[0] if len(urls) == 1 else urls[(target_id - 1) // TAM_RANGO]
+        if aleatorio.random() < 0.8:
+            session.get(f'{base}/{target_id}')
+        else:
+            session.put(f'{base}/{target_id}/disponibilidad',
+                        params={'disponible': aleatorio.choice(('true', 'false'))})
+        peticiones += 1
+    return peticiones
+
+
+def medir(shards, args):
+    with TemporaryDirectory() as directorio:
+        proceso = router.lanzar_servidor(args.puerto, directorio, ['--shards', str(shards),
+                                                                   '--puerto-base', str(args.puerto + 1),
+                                                                   '--tam-rango', str(TAM_RANGO)],
+                                         script=router.ROUTER)
+        try:
+            base = f'http://localhost:{args.puerto}'
+            ids = []
+            for inicio in range(0, args.habitaciones, 1000):
+                lote = [{'plazas': 2, 'equipamiento': ['TV'], 'precio': 80}
+                        for _ in range(min(1000, args.habitaciones - inicio))]
+                r = requests.post(base + '/lote', json={'habitaciones': lote})
+                ids += [resultado['habitacion']['id'] for resultado in r.json()['resultados']]
+
+            urls = [f'http://localhost:{args.puerto + 1 + i}' for i in range(shards)] if args.directo else [base]
+            with Pool(args.clientes) as pool:
+                inicio = time.perf_counter()
+                total = sum(pool.map(cliente, [(urls, ids, args.duracion, i) for i in range(args.clientes)]))
+                duracion = time.perf_counter() - inicio
+        finally:
+            router.detener_servidor(proceso)
+
+    print(f'{shards:>3} particiones  {total:>8} peticiones  {total / duracion:10.0f} peticiones/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Escalado de 1 a N particiones.')
+    parser.add_argument('--max-shards', type=int, default=4)
+    parser.add_argument('--habitaciones', type=int, default=20000, help='Tamaño del inventario.')
+    parser.add_argument('--clientes', type=int, default=8, help='Procesos cliente.')
+    parser.add_argument('--duracion', type=float, default=10, help='Segundos de medición por configuración.')
+    parser.add_argument('--puerto', type=int, default=9080, help='Puerto del enrutador, las particiones usan los siguientes.')
+    parser.add_argument('--directo', action='store_true', help='Los clientes se saltan el enrutador.')
+    args = parser.parse_args()
+
+    for shards in range(1, args.max_shards + 1):
+        medir(shards, args)
+
+
+if __name__ == '__main__':
+    main()
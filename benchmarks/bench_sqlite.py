@@ -0,0 +1,87 @@
+""" Benchmark del motor SQLite frente a los ficheros JSON
+
+Con el mismo inventario mide en cada motor la escritura inicial de
+todas las habitaciones, la carga completa al arrancar, las
+actualizaciones individuales (cambio de disponibilidad) y una
+búsqueda filtrada: en memoria tras cargarlo todo con ficheros, y en
+SQL sin cargar nada con SQLite.
+
+    python benchmarks/bench_sqlite.py --n 100000 --actualizaciones 2000
+"""
+from tempfile import TemporaryDirectory
+import argparse
+import time
+
+import utilidades  # noqa: F401
+
+from registry import Registry  # noqa: E402
+from room import Room  # noqa: E402
+import storage as almacenamiento  # noqa: E402
+
+EQUIPAMIENTOS = (['TV'], ['TV', 'wifi'], ['wifi', 'jacuzzi'], ['TV', 'wifi', 'minibar'], [])
+FILTROS = {'precio_max': 60, 'plazas_min': 3, 'disponible': True, 'equipamiento': ['wifi']}
+
+
+def habitacion(i):
+    return {'id': i, 'plazas': 1 + i % 4, 'precio': 40 + i % 100, 'equipamiento': EQUIPAMIENTOS[i % len(EQUIPAMIENTOS)],
+            'disponible': i % 3 != 0, 'version': i}
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def busqueda_en_memoria(motor):
+    registry = Registry()
+    for data in motor.load():
+        registry.add(Room.from_dict(data))
+    return registry.search(**FILTROS)
+
+
+def medir(nombre, abrir, n, actualizaciones):
+    datos = [habitacion(i) for i in range(1, n + 1)]
+    with TemporaryDirectory() as directorio:
+        motor = abrir(directorio)
+        escritura, _ = cronometrar(lambda: motor.save_many(datos))
+        motor.close()
+
+        motor = abrir(directorio)
+        carga, cargadas = cronometrar(lambda: sum(1 for _ in motor.load()))
+        assert cargadas == n, cargadas
+
+        def actualizar():
+            for i in range(actualizaciones):
+                data = dict(datos[i * n // actualizaciones])
+                data['disponible'] = not data['disponible']
+                motor.save(data)
+
+        actualizacion, _ = cronometrar(actualizar)
+        if isinstance(motor, almacenamiento.SqliteStorage):
+            busqueda, encontradas = cronometrar(lambda: motor.search(**FILTROS))
+        else:
+            busqueda, encontradas = cronometrar(lambda: busqueda_en_memoria(motor))
+        motor.close()
+
+    print(f'{nombre:<10} escritura {escritura:8.3f}s  carga {carga:8.3f}s'
+          f'  actualización {actualizacion / actualizaciones * 1e6:8.1f}µs'
+          f'  búsqueda {busqueda:8.3f}s ({len(encontradas)} habitaciones)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motor SQLite frente a ficheros JSON.')
+    parser.add_argument('--n', type=int, default=100000, help='Número de habitaciones.')
+    parser.add_argument('--actualizaciones', type=int, default=2000, help='Actualizaciones individuales.')
+    parser.add_argument('--fsync', choices=almacenamiento.POLITICAS_FSYNC, default=almacenamiento.FSYNC_GRUPO,
+                        help='Política de sincronización de SQLite.')
+    args = parser.parse_args()
+
+    print(f'{args.n} habitaciones, la búsqueda con ficheros incluye la carga en memoria.')
+    medir('ficheros', lambda directorio: almacenamiento.FileStorage(directorio), args.n, args.actualizaciones)
+    medir('sqlite', lambda directorio: almacenamiento.SqliteStorage(directorio, args.fsync), args.n,
+          args.actualizaciones)
+
+
+if __name__ == '__main__':
+    main()
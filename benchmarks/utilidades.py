@@ -0,0 +1,50 @@
+""" Utilidades comunes de los benchmarks
+
+Permiten cargar servidor.py en el propio proceso, con un motor de
+almacenamiento en un directorio temporal, y llamar a sus rutas a
+través de la interfaz WSGI de Bottle, sin red de por medio."""
+from io import BytesIO
+from json import dumps
+from os import path
+from wsgiref.util import setup_testing_defaults
+import sys
+
+RAIZ = path.join(path.dirname(path.abspath(__file__)), '..')
+sys.path.insert(0, RAIZ)
+
+
+def cargar_servidor(storage):
+    """ Importa servidor.py con el motor de almacenamiento indicado.
+
+    :param storage: Motor de almacenamiento ya abierto.
+    :returns: Módulo servidor."""
+
+    import servidor
+    servidor.storage = storage
+    return servidor
+
+
+def wsgi(metodo, ruta, cuerpo=None, cabeceras=None, app=None):
+    """ Llama a una ruta del servidor a través de WSGI.
+
+    :param metodo: Método HTTP.
+    :param ruta: Ruta con QUERY VARIABLES opcionales, '/1/plazas?plazas=4'.
+    :param cuerpo: Objeto que se envía serializado como JSON.
+    :param cabeceras: Cabeceras adicionales en formato WSGI, {'HTTP_IF_NONE_MATCH': ...}.
+    :param app: Aplicación WSGI, por defecto la de Bottle de servidor.py.
+    :returns: Par (estado, cuerpo en bytes)."""
+
+    import bottle
+
+    datos = b'' if cuerpo is None else dumps(cuerpo).encode('utf-8')
+    ruta, _, query = ruta.partition('?')
+    environ = {'REQUEST_METHOD': metodo, 'PATH_INFO': ruta, 'QUERY_STRING': query,
+               'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(datos)),
+               'wsgi.input': BytesIO(datos)}
+    environ.update(cabeceras or {})
+    setup_testing_defaults(environ)
+
+    estado = []
+    app = bottle.default_app() if app is None else app
+    cuerpo = b''.join(app(environ, lambda status, headers, exc_info=None: estado.append(status)))
+    return estado[0], cuerpo
@@ -0,0 +1,78 @@
+from collections import deque
+from itertools import islice
+import threading
+
+""" Cambios que se conservan para los clientes que se quedan atrás """
+CAPACIDAD = 10000
+
+
+class Cambios:
+    """ Secuencia de cambios del registro para GET /cambios
+
+    Cada alta, baja o modificación se publica con su número de
+    secuencia, la generación del registro tras el cambio, que crece
+    de uno en uno. Se conservan los últimos `capacidad` cambios en un
+    búfer circular compartido por todos los clientes, cada uno lee a
+    partir de su cursor sin colas propias. Si un cliente se queda tan
+    atrás que sus cambios ya se han descartado se le indica que se han
+    perdido, y debe volver a leer los listados.
+
+    Los clientes esperan nuevos cambios en una Condition, sin sondeos,
+    y publicar despierta a todos."""
+
+    def __init__(self, capacidad=CAPACIDAD):
+        self.secuencia = 0  # Secuencia del último cambio publicado.
+        self._eventos = deque(maxlen=capacidad)  # Tuplas (secuencia, tipo, id, campos, disponible).
+        self._condicion = threading.Condition()
+
+    def publicar(self, secuencia, tipo, target_id, campos=(), disponible=None):
+        """ Publica un cambio y despierta a los clientes que esperan.
+
+        :param secuencia: Número de secuencia, mayor que el anterior.
+        :param tipo: alta, baja o modificacion.
+        :param target_id: Identificador único de la habitación.
+        :param campos: Atributos modificados.
+        :param disponible: Disponibilidad tras el cambio, None en las bajas."""
+
+        with self._condicion:
+            self.secuencia = secuencia
+            self._eventos.append((secuencia, tipo, target_id, tuple(campos), disponible))
+            self._condicion.notify_all()
+
+    def iniciar(self, secuencia):
+        """ Fija la secuencia inicial, la generación del registro cargado. """
+
+        with self._condicion:
+            self.secuencia = secuencia
+
+    def _leer(self, desde, limite):
+        primero = self._eventos[0][0] if self._eventos else self.secuencia + 1
+        perdidos = desde > self.secuencia or desde + 1 < primero
+        inicio = max(0, desde + 1 - primero)
+        eventos = [{'secuencia': secuencia, 'tipo': tipo, 'id': target_id, 'campos': list(campos),
+                    'disponible': disponible}
+                   for secuencia, tipo, target_id, campos, disponible
+                   in islice(self._eventos, inicio, None if limite is None else inicio + limite)]
+        return eventos, perdidos
+
+    def leer(self, desde, limite=None):
+        """ Devuelve los cambios posteriores a un cursor sin esperar.
+
+        :param desde: Secuencia del último cambio ya recibido.
+        :param limite: Número máximo de cambios, None para todos.
+        :returns: Par (lista de cambios en orden, True si se han
+        perdido cambios posteriores al cursor)."""
+
+        with self._condicion:
+            return self._leer(desde, limite)
+
+    def esperar(self, desde, timeout, limite=None):
+        """ Como leer(), pero si no hay cambios posteriores al cursor
+        espera hasta que se publique alguno o pasen `timeout` segundos.
+
+        :returns: Par (lista de cambios, posiblemente vacía, True si se
+        han perdido cambios)."""
+
+        with self._condicion:
+            self._condicion.wait_for(lambda: self.secuencia != desde, timeout)
+            return self._leer(desde, limite)
@@ -0,0 +1,196 @@
+from array import array
+from sys import intern
+import threading
+import weakref
+
+
+class Combinacion:
+    """ Equipamiento compartido por todas las habitaciones que lo tienen
+
+    Guarda los códigos de sus elementos empaquetados en bytes y la
+    tupla de elementos ya decodificada."""
+
+    __slots__ = ('codificado', 'elementos', '__weakref__')
+
+    def __init__(self, codificado, elementos):
+        self.codificado = codificado
+        self.elementos = elementos
+
+
+class Catalogo:
+    """ Diccionario global de elementos de equipamiento
+
+    Cada elemento distinto ('wifi', 'TV', ...) recibe un código entero
+    y cada habitación guarda su equipamiento como una Combinacion con
+    los códigos de sus elementos, en orden de inserción, empaquetados
+    en bytes. Las combinaciones se internan, de modo que todas las
+    habitaciones con el mismo equipamiento comparten el mismo objeto.
+    Los elementos se distinguen por tipo y valor: 1, 1.0 y true son
+    elementos distintos.
+
+    El catálogo solo guarda referencias débiles a las combinaciones.
+    Cuando ninguna habitación usa una combinación se libera y, con
+    ella, los códigos de los elementos que ya no aparecen en ninguna
+    otra, que se reutilizan. Las liberaciones se anotan al destruirse
+    la combinación y se aplican al empezar la siguiente operación,
+    para que un código no cambie de elemento en mitad de otra.
+
+    Añadir y quitar elementos son operaciones de conjunto sobre los
+    códigos, O(n + m) en lugar de buscar cada elemento en una lista.
+    Todas las operaciones son atómicas, protegidas por un cerrojo."""
+
+    TIPO = 'I'  # Entero sin signo de 4 bytes por código.
+
+    def __init__(self):
+        self.codigos = {}  # Código de cada par (tipo, elemento).
+        self.elementos = []  # Elemento de cada código, None si está libre.
+        self._usos = []  # Combinaciones vivas que usan cada código.
+        self._libres = []  # Códigos libres para reutilizar.
+        self._combinaciones = weakref.WeakValueDictionary()  # Combinación de cada codificación.
+        self._soltadas = []  # Códigos de las combinaciones destruidas pendientes de liberar.
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.codigos)
+
+    @staticmethod
+    def _clave(elemento):
+        return type(elemento), elemento
+
+    def _liberar(self):
+        """ Libera los códigos que ya no usa ninguna combinación. Se
+        llama con el cerrojo tomado. """
+
+        while self._soltadas:
+            for codigo in self._soltadas.pop():
+                self._usos[codigo] -= 1
+                if self._usos[codigo] == 0:
+                    del self.codigos[self._clave(self.elementos[codigo])]
+                    self.elementos[codigo] = None
+                    self._libres.append(codigo)
+
+    def codigo(self, elemento):
+        """ Devuelve el código de un elemento, asignando uno si es nuevo.
+
+        :param elemento: Elemento de equipamiento.
+        :returns: Código del elemento.
+        :raises ValueError: Si el elemento no es un valor simple."""
+
+        try:
+            clave = self._clave(elemento)
+            codigo = self.codigos.get(clave)
+        except TypeError:
+            raise ValueError('Los elementos del equipamiento no pueden ser listas ni objetos.')
+        if codigo is not None:
+            return codigo
+
+        with self._lock:
+            codigo = self.codigos.get(clave)
+            if codigo is None:
+                if isinstance(elemento, str):
+                    elemento = intern(elemento)
+                if self._libres:
+                    codigo = self._libres.pop()
+                    self.elementos[codigo] = elemento
+                else:
+                    codigo = len(self.elementos)
+                    self.elementos.append(elemento)
+                    self._usos.append(0)
+                self.codigos[clave] = codigo
+            return codigo
+
+    def _combinacion(self, codigos):
+        codificado = codigos.tobytes()
+        combinacion = self._combinaciones.get(codificado)
+        if combinacion is None:
+            distintos = tuple(set(codigos))
+            combinacion = Combinacion(codificado, tuple(self.elementos[codigo] for codigo in codigos))
+            for codigo in distintos:
+                self._usos[codigo] += 1
+            self._combinaciones[codificado] = combinacion
+            weakref.finalize(combinacion, self._soltadas.append, distintos).atexit = False
+        return combinacion
+
+    @staticmethod
+    def _lista(elementos):
+        if not isinstance(elementos, (list, tuple)):
+            raise ValueError('El equipamiento tiene que ser una lista.')
+        return elementos
+
+    @staticmethod
+    def _simples(elementos):
+        """ Comprueba todos los elementos antes de asignar códigos, para
+        no dejar códigos sin usar si alguno no es válido. """
+
+        for elemento in Catalogo._lista(elementos):
+            try:
+                hash(elemento)
+            except TypeError:
+                raise ValueError('Los elementos del equipamiento no pueden ser listas ni objetos.')
+        return elementos
+
+    def codificar(self, elementos):
+        """ Codifica una lista de elementos conservando su orden.
+
+        :param elementos: Lista de elementos de equipamiento, o una
+        combinación ya codificada.
+        :returns: Combinación codificada y compartida.
+        :raises ValueError: Si no es una lista o algún elemento no es
+        un valor simple."""
+
+        if isinstance(elementos, Combinacion):
+            return elementos
+        with self._lock:
+            self._liberar()
+            codigos = array(self.TIPO, [self.codigo(elemento) for elemento in self._simples(elementos)])
+            return self._combinacion(codigos)
+
+    @staticmethod
+    def decodificar(codificado):
+        """ :param codificado: Combinación codificada.
+        :returns: Tupla de elementos en orden de inserción."""
+
+        return codificado.elementos
+
+    def anadir(self, codificado, elementos):
+        """ Añade a una combinación los elementos que no contiene.
+
+        :param codificado: Combinación codificada.
+        :param elementos: Lista de elementos a añadir, al final y en su
+        orden.
+        :returns: Nueva combinación codificada.
+        :raises ValueError: Si no es una lista o algún elemento no es
+        un valor simple."""
+
+        with self._lock:
+            self._liberar()
+            codigos = array(self.TIPO, codificado.codificado)
+            presentes = set(codigos)
+            for elemento in self._simples(elementos):
+                codigo = self.codigo(elemento)
+                if codigo not in presentes:
+                    presentes.add(codigo)
+                    codigos.append(codigo)
+            return self._combinacion(codigos)
+
+    def quitar(self, codificado, elementos):
+        """ Quita de una combinación los elementos indicados.
+
+        :param codificado: Combinación codificada.
+        :param elementos: Lista de elementos a quitar, se ignoran los
+        ausentes.
+        :returns: Nueva combinación codificada.
+        :raises ValueError: Si no es una lista."""
+
+        with self._lock:
+            self._liberar()
+            ausentes = set()
+            for elemento in self._lista(elementos):
+                try:
+                    codigo = self.codigos.get(self._clave(elemento))
+                except TypeError:
+                    continue
+                if codigo is not None:
+                    ausentes.add(codigo)
+            return self._combinacion(array(self.TIPO, [codigo for codigo in array(self.TIPO, codificado.codificado)
+                                                       if codigo not in ausentes]))
@@ -1,284 +1,185 @@
 # -*- coding: utf-8 -*-
-from json import dumps
-import requests
+""" Menú interactivo de gestión de habitaciones
 
-BASE = "http://localhost:8080/"
-HEADER = {'content-type': 'application/json'}
+Las peticiones se hacen con ClienteHabitaciones de cliente_api.py, el
+menú principal es un bucle y cada opción vuelve a él al terminar.
 
-def alta_habitacion():
-    print("Introduce el número de plazas de la habitación:")
+    python cliente.py --base http://localhost:8080/
+"""
+from cliente_api import BASE, ClienteHabitaciones, ErrorServidor
+import argparse
+
+
+def leer_entero(minimo, mensaje_minimo):
     while True:
         try:
-            plazas = int(input("> "))
-            if plazas >= 1:
-                break
+            valor = int(input("> "))
+            if valor >= minimo:
+                return valor
             else:
-                print("El numero de plazas tiene que ser mayor que 0")
+                print(mensaje_minimo)
         except ValueError:
             print("Debe introducir números.")
+
+
+def leer_id():
+    return leer_entero(1, "La ID tiene que ser mayor que 0")
+
+
+def leer_equipamiento():
     equipamiento = []
     print("Introduce el quipamiento de la habitación ('Salir' para seguir con el procedimiento):")
     while True:
         nuevo_equipamiento = input("> ")
         if nuevo_equipamiento == "Salir":
-            break;
+            return equipamiento
         else:
             equipamiento.append(nuevo_equipamiento)
-    print("Introduce el precio por noche de la habitacion:")
+
+
+def leer_opcion(opciones):
     while True:
         try:
-            precio = int(input("> "))
-            if precio >= 0:
-                break
+            opcion = int(input("> "))
+            if 1 <= opcion <= opciones:
+                return opcion
             else:
-                print("El precio no puede ser negativo.")
+                print("Opción no valida")
         except ValueError:
             print("Debe introducir números.")
-    payload = {'plazas': plazas, 'equipamiento': equipamiento, 'precio': precio}
-    r = requests.post(BASE, data=dumps(payload), headers=HEADER)
-    if r.status_code == 400:
-        print(r.json()['error_description'])
-    else:
-        print("Habitación creada correctamente.")
-    iniciar_seleccion()
 
-def borrar_habitacion():
+
+def mostrar(habitacion):
+    print("ID de la habitación: ", habitacion.id)
+    print("     Plazas: ", habitacion.plazas)
+    print("     Precio: ", habitacion.precio)
+    print("     Equipamiento: ")
+    for elemento in habitacion.equipamiento:
+        print("         ", elemento)
+    print("     Disponible: ", habitacion.disponible)
+
+
+def alta_habitacion(cliente):
+    print("Introduce el número de plazas de la habitación:")
+    plazas = leer_entero(1, "El numero de plazas tiene que ser mayor que 0")
+    equipamiento = leer_equipamiento()
+    print("Introduce el precio por noche de la habitacion:")
+    precio = leer_entero(0, "El precio no puede ser negativo.")
+    cliente.alta(plazas, equipamiento, precio)
+    print("Habitación creada correctamente.")
+
+
+def borrar_habitacion(cliente):
     print("Introduce la ID de la habitación que desea borrar:")
-    while True:
-        try:
-            id_habitacion = int(input("> "))
-            if id_habitacion >= 1:
-                break
-            else:
-                print("La ID tiene que ser mayor que 0")
-        except ValueError:
-            print("Debe introducir números.")
-    r = requests.delete(BASE + id_habitacion.__str__(), headers=HEADER)
-    if r.status_code == 409 or r.status_code == 404:
-        print(r.json()['error_description'])
+    cliente.borrar(leer_id())
+    print("Habitación eliminada correctamente.")
+
+
+def modificar_equipamiento(cliente, id_habitacion):
+    print("Elige que opción deseas realizar: ")
+    print("     1. Reemplazar listado completo de equipamiento.")
+    print("     2. Añadir equipamiento.")
+    print("     3. Eliminar equipamiento.")
+    print("     4. Salir.")
+    opcion = leer_opcion(4)
+    if opcion == 4:
+        print("Opción seleccionada: Salir.")
+        return
+
+    equipamiento = leer_equipamiento()
+    if opcion == 1:
+        cliente.modificar_equipamiento(id_habitacion, equipamiento)
+        print("El equipamiento se cambio correctamente")
+    elif opcion == 2:
+        cliente.anadir_equipamiento(id_habitacion, equipamiento)
+        print("El nuevo equipamiento se añadio correctamente")
     else:
-        print("Habitación eliminada correctamente.")
-    iniciar_seleccion()
+        cliente.eliminar_equipamiento(id_habitacion, equipamiento)
+        print("El equipamiento se elimino correctamente")
 
-def modificar_habitacion():
+
+def modificar_habitacion(cliente):
     print("Introduce la ID de la habitación que desea modificar:")
-    while True:
-        try:
-            id_habitacion = int(input("> "))
-            if id_habitacion >= 1:
-                break
-            else:
-                print("La ID tiene que ser mayor que 0")
-        except ValueError:
-            print("Debe introducir números.")
-    r = requests.get(BASE + id_habitacion.__str__(), headers=HEADER)
-    if r.status_code == 404:
-        print(r.json()['error_description'])
+    habitacion = cliente.habitacion(leer_id())
+    print("Elige que opción deseas realizar: ")
+    print("     1. Modificar plazas.")
+    print("     2. Modificar equipamiento.")
+    print("     3. Modificar precio.")
+    print("     4. Modificar disponibilidad.")
+    print("     5. Salir.")
+    opcion = leer_opcion(5)
+    if opcion == 1:
+        print("Introduce el nuevo número de plazas de la habitación:")
+        cliente.modificar_plazas(habitacion.id, leer_entero(1, "El numero de plazas tiene que ser mayor que 0"))
+        print("El valor plazas se cambio correctamente.")
+    elif opcion == 2:
+        modificar_equipamiento(cliente, habitacion.id)
+    elif opcion == 3:
+        print("Introduce el nuevo precio por noche de la habitacion:")
+        cliente.modificar_precio(habitacion.id, leer_entero(0, "El precio no puede ser negativo."))
+        print("El precio se cambio correctamente.")
+    elif opcion == 4:
+        cliente.modificar_disponibilidad(habitacion.id, not habitacion.disponible)
+        print("La disponibilidad de la habitación se cambio correctamente.")
     else:
-        print("Elige que opción deseas realizar: ")
-        print("     1. Modificar plazas.")
-        print("     2. Modificar equipamiento.")
-        print("     3. Modificar precio.")
-        print("     4. Modificar disponibilidad.")
-        print("     5. Salir.")
-        while True:
-            try:
-                opcionseleccionada = int(input("> "))
-                if opcionseleccionada >= 1 and opcionseleccionada <= 5:
-                    if opcionseleccionada == 1:
-                        print("Introduce el nuevo número de plazas de la habitación:")
-                        while True:
-                            try:
-                                plazas = int(input("> "))
-                                if plazas >= 1:
-                                    break
-                                else:
-                                    print("El numero de plazas tiene que ser mayor que 0")
-                            except ValueError:
-                                print("Debe introducir números.")
-                        y = requests.put(BASE + id_habitacion.__str__() + '/plazas', params={'plazas': plazas}, headers=HEADER)
-                        if y.status_code == 409:
-                            print(y.json()['error_description'])
-                        else:
-                            print("El valor plazas se cambio correctamente.")
-                    if opcionseleccionada == 2:
-                        print("Elige que opción deseas realizar: ")
-                        print("     1. Reemplazar listado completo de equipamiento.")
-                        print("     2. Añadir equipamiento.")
-                        print("     3. Eliminar equipamiento.")
-                        print("     4. Salir.")
-                        while True:
-                            try:
-                                opcionmodificar = int(input("> "))
-                                if opcionmodificar >= 1 and opcionmodificar <= 3:
-                                    equipamiento = []
-                                    print("Introduce el quipamiento de la habitación ('Salir' para seguir con el procedimiento):")
-                                    while True:
-                                        nuevo_equipamiento = input("> ")
-                                        if nuevo_equipamiento == "Salir":
-                                            break;
-                                        else:
-                                            equipamiento.append(nuevo_equipamiento)
-                                    datos = {'equipamiento': equipamiento}
-                                    if opcionmodificar == 1:
-                                        y = requests.put(BASE + id_habitacion.__str__() + '/equipamiento', data=dumps(datos), headers=HEADER)
-                                        if y.status_code == 409:
-                                            print(y.json()['error_description'])
-                                        else:
-                                            print("El equipamiento se cambio correctamente")
-                                    if opcionmodificar == 2:
-                                        y = requests.put(BASE + id_habitacion.__str__() + '/equipamiento/add', data=dumps(datos), headers=HEADER)
-                                        if y.status_code == 409:
-                                            print(y.json()['error_description'])
-                                        else:
-                                            print("El nuevo equipamiento se añadio correctamente")
-                                    if opcionmodificar == 3:
-                                        y = requests.put(BASE + id_habitacion.__str__() + '/equipamiento/eliminar', data=dumps(datos), headers=HEADER)
-                                        if y.status_code == 409:
-                                            print(y.json()['error_description'])
-                                        else:
-                                            print("El equipamiento se elimino correctamente")
-                                    break
-                                else:
-                                    if opcionmodificar == 4:
-                                        print("Opción seleccionada: Salir.")
-                                        break
-                                    else:
-                                        print("Opción no valida")
-                                    break
-                                break
-                            except ValueError:
-                                print("Debe introducir números.")
-                    if opcionseleccionada == 3:
-                        print("Introduce el nuevo precio por noche de la habitacion:")
-                        while True:
-                            try:
-                                precio = int(input("> "))
-                                if precio >= 0:
-                                    break
-                                else:
-                                    print("El precio no puede ser negativo.")
-                            except ValueError:
-                                print("Debe introducir números.")
-                        y = requests.put(BASE + id_habitacion.__str__() + '/precio', params={'precio': precio}, headers=HEADER)
-                        if y.status_code == 409:
-                            print(y.json()['error_description'])
-                        else:
-                            print("El precio se cambio correctamente.")
-                    if opcionseleccionada == 4:
-                        if r.json()['disponible']:
-                            y = requests.put(BASE + id_habitacion.__str__() + '/disponibilidad', params={'disponible': False},headers=HEADER)
-                        else:
-                            y = requests.put(BASE + id_habitacion.__str__() + '/disponibilidad', params={'disponible': True},headers=HEADER)
-                        print("La disponibilidad de la habitación se cambio correctamente.")
-                    if opcionseleccionada == 5:
-                        print("Opción seleccionada: Salir.")
-                        break
-                    break
-                else:
-                    print("Opción no valida")
-            except ValueError:
-                print("Debe introducir números.")
-    iniciar_seleccion()
-
-def consultar_habitaciones():
-    r = requests.get(BASE, headers=HEADER)
-    if r.status_code == 204:
+        print("Opción seleccionada: Salir.")
+
+
+def consultar_habitaciones(cliente):
+    habitaciones = cliente.habitaciones()
+    if len(habitaciones) == 0:
         print("No existen habitaciones registradas en el sistema.")
-    else:
-        for i in r.json():
-            print("ID de la habitación: ", r.json()[i]['id'])
-            print("     Plazas: ", r.json()[i]['plazas'])
-            print("     Precio: ", r.json()[i]['precio'])
-            print("     Equipamiento: ")
-            for j in r.json()[i]['equipamiento']:
-                print("         ", j)
-            print("     Disponible: ", r.json()[i]['disponible'])
-    iniciar_seleccion()
-
-def consultar_habitacion():
+    for habitacion in habitaciones:
+        mostrar(habitacion)
+
+
+def consultar_habitacion(cliente):
     print("Introduce la ID de la habitación que desea consultar:")
+    mostrar(cliente.habitacion(leer_id()))
+
+
+def consultar_habitaciones_ocupadas(cliente):
+    for habitacion in cliente.ocupadas():
+        mostrar(habitacion)
+
+
+def consultar_habitaciones_desocupadas(cliente):
+    for habitacion in cliente.disponibles():
+        mostrar(habitacion)
+
+
+OPCIONES = (
+    ("Dar de alta una habitación.", alta_habitacion),
+    ("Eliminar una habitación.", borrar_habitacion),
+    ("Modificar los datos de una habitación.", modificar_habitacion),
+    ("Consultar la lista completa de habitaciones.", consultar_habitaciones),
+    ("Consultar una habitación mediante identificador.", consultar_habitacion),
+    ("Consultar la lista de habitaciones ocupadas.", consultar_habitaciones_ocupadas),
+    ("Consultar la lista de habitaciones desocupadas.", consultar_habitaciones_desocupadas),
+)
+
+
+def iniciar_seleccion(cliente):
     while True:
+        print("Elige que opción deseas realizar: ")
+        for numero, (descripcion, _) in enumerate(OPCIONES, 1):
+            print(f"     {numero}. {descripcion}")
+        print(f"     {len(OPCIONES) + 1}. Salir.")
+
+        opcion = leer_opcion(len(OPCIONES) + 1)
+        if opcion == len(OPCIONES) + 1:
+            print("Opción seleccionada: Salir.")
+            return
         try:
-            id_habitacion = int(input("> "))
-            if id_habitacion >= 1:
-                break
-            else:
-                print("La ID tiene que ser mayor que 0")
-        except ValueError:
-            print("Debe introducir números.")
-    r = requests.get(BASE + id_habitacion.__str__(), headers=HEADER)
-    if r.status_code == 404:
-        print(r.json()['error_description'])
-    else:
-        print("ID de la habitación: ", r.json()['id'])
-        print("     Plazas: ", r.json()['plazas'])
-        print("     Precio: ", r.json()['precio'])
-        print("     Equipamiento: ")
-        for i in r.json()['equipamiento']:
-            print("         ", i)
-        print("     Disponible: ", r.json()['disponible'])
-    iniciar_seleccion()
-
-def consultar_habitaciones_ocupadas():
-    r = requests.get(BASE+'ocupadas', headers=HEADER)
-    for i in r.json():
-        print("ID de la habitación: ", r.json()[i]['id'])
-        print("     Plazas: ", r.json()[i]['plazas'])
-        print("     Precio: ", r.json()[i]['precio'])
-        print("     Equipamiento: ")
-        for j in r.json()[i]['equipamiento']:
-            print("         ", j)
-        print("     Disponible: ", r.json()[i]['disponible'])
-    iniciar_seleccion()
-
-def consultar_habitaciones_desocupadas():
-    r = requests.get(BASE+'disponibles', headers=HEADER)
-    for i in r.json():
-        print("ID de la habitación: ", r.json()[i]['id'])
-        print("     Plazas: ", r.json()[i]['plazas'])
-        print("     Precio: ", r.json()[i]['precio'])
-        print("     Equipamiento: ")
-        for j in r.json()[i]['equipamiento']:
-            print("         ", j)
-        print("     Disponible: ", r.json()[i]['disponible'])
-    iniciar_seleccion()
-
-def iniciar_seleccion():
-    print("Elige que opción deseas realizar: ")
-    print("     1. Dar de alta una habitación.")
-    print("     2. Eliminar una habitación.")
-    print("     3. Modificar los datos de una habitación.")
-    print("     4. Consultar la lista completa de habitaciones.")
-    print("     5. Consultar una habitación mediante identificador.")
-    print("     6. Consultar la lista de habitaciones ocupadas.")
-    print("     7. Consultar la lista de habitaciones desocupadas.")
-    print("     8. Salir.")
-    while True:
-        try:
-            opcionseleccionada = int(input("> "))
-            if opcionseleccionada >=1 and opcionseleccionada <=8:
-                if opcionseleccionada == 1:
-                    alta_habitacion()
-                if opcionseleccionada == 2:
-                    borrar_habitacion()
-                if opcionseleccionada == 3:
-                    modificar_habitacion()
-                if opcionseleccionada == 4:
-                    consultar_habitaciones()
-                if opcionseleccionada == 5:
-                    consultar_habitacion()
-                if opcionseleccionada == 6:
-                    consultar_habitaciones_ocupadas()
-                if opcionseleccionada == 7:
-                    consultar_habitaciones_desocupadas()
-                if opcionseleccionada == 8:
-                    print("Opción seleccionada: Salir.")
-                    break
-                break
-            else:
-                print("Opción no valida")
-        except ValueError:
-            print("Debe introducir números.")
+            OPCIONES[opcion - 1][1](cliente)
+        except ErrorServidor as e:
+            print(e.descripcion)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cliente interactivo del servicio de habitaciones.')
+    parser.add_argument('--base', default=BASE, help='URL del servidor o del enrutador.')
+    args = parser.parse_args()
 
-iniciar_seleccion()
\ No newline at end of file
+    with ClienteHabitaciones(args.base) as cliente:
+        iniciar_seleccion(cliente)
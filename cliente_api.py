@@ -0,0 +1,308 @@
+""" Biblioteca cliente del servicio de habitaciones
+
+Envuelve la API REST del servidor en objetos Python, separada del
+menú interactivo de cliente.py:
+
+    with ClienteHabitaciones('http://localhost:8080/') as cliente:
+        habitacion = cliente.alta(2, ['TV', 'wifi'], 60)
+        cliente.modificar_precio(habitacion.id, 75)
+        for habitacion in cliente.recorrer(disponible=True):
+            print(habitacion)
+
+Todas las peticiones comparten una sesión de requests con conexiones
+persistentes (keep-alive) reutilizadas desde un pool, y cada respuesta
+se analiza una sola vez."""
+from requests.adapters import HTTPAdapter
+import requests
+
+BASE = 'http://localhost:8080/'
+HEADER = {'content-type': 'application/json'}
+
+
+class ErrorServidor(Exception):
+    """ Respuesta de error del servidor
+
+    :ivar status: Código de estado HTTP.
+    :ivar descripcion: Descripción del error devuelta por el servidor.
+    :ivar errores: Errores de cada elemento en los lotes rechazados."""
+
+    def __init__(self, status, descripcion, errores=()):
+        super().__init__(f'{status}: {descripcion}')
+        self.status = status
+        self.descripcion = descripcion
+        self.errores = list(errores)
+
+
+class Habitacion:
+    """ Habitación devuelta por el servidor
+
+    Registro de solo lectura con los mismos campos que el
+    diccionario serializado de Room."""
+
+    __slots__ = ('id', 'plazas', 'precio', 'equipamiento', 'disponible', 'version', 'reservas')
+
+    def __init__(self, id, plazas, precio, equipamiento, disponible, version=0, reservas=()):
+        self.id = id
+        self.plazas = plazas
+        self.precio = precio
+        self.equipamiento = list(equipamiento)
+        self.disponible = disponible
+        self.version = version
+        self.reservas = [list(reserva) for reserva in reservas]
+
+    @classmethod
+    def from_dict(cls, data):
+        """ :param data: Diccionario de la habitación recibido del servidor.
+        :returns: Habitación."""
+
+        return cls(data['id'], data['plazas'], data['precio'], data['equipamiento'], data['disponible'],
+                   data.get('version', 0), data.get('reservas', ()))
+
+    def to_dict(self):
+        return {'id': self.id, 'plazas': self.plazas, 'precio': self.precio,
+                'equipamiento': list(self.equipamiento), 'disponible': self.disponible, 'version': self.version,
+                'reservas': [list(reserva) for reserva in self.reservas]}
+
+    def __eq__(self, otra):
+        return isinstance(otra, Habitacion) and self.to_dict() == otra.to_dict()
+
+    def __repr__(self):
+        return (f'Habitacion(id={self.id}, plazas={self.plazas}, precio={self.precio}, '
+                f'equipamiento={self.equipamiento}, disponible={self.disponible}, version={self.version}, '
+                f'reservas={self.reservas})')
+
+
+class ClienteHabitaciones:
+    """ Cliente de la API REST de habitaciones
+
+    Los métodos devuelven objetos Habitacion o valores simples y
+    lanzan ErrorServidor si el servidor responde con un error.
+
+    :param base: URL base del servidor o del enrutador.
+    :param conexiones: Conexiones persistentes que se mantienen en el pool.
+    :param timeout: Segundos de espera de cada petición."""
+
+    def __init__(self, base=BASE, conexiones=10, timeout=10):
+        self.base = base if base.endswith('/') else base + '/'
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADER)
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """ Cierra las conexiones del pool. """
+
+        self.session.close()
+
+    def _peticion(self, metodo, ruta, **kwargs):
+        """ Envía una petición y analiza su cuerpo una sola vez.
+
+        :returns: Par (respuesta, cuerpo JSON o None si está vacío).
+        :raises ErrorServidor: Si el estado es de error."""
+
+        r = self.session.request(metodo, self.base + ruta, timeout=self.timeout, **kwargs)
+        try:
+            cuerpo = r.json() if r.content else None
+        except ValueError:
+            cuerpo = r.text
+        if r.status_code >= 400:
+            if isinstance(cuerpo, dict):
+                raise ErrorServidor(r.status_code, cuerpo.get('error_description', ''), cuerpo.get('errores', ()))
+            raise ErrorServidor(r.status_code, cuerpo or r.reason)
+        return r, cuerpo
+
+    def _habitaciones(self, cuerpo):
+        return [Habitacion.from_dict(data) for data in (cuerpo or {}).values()]
+
+    # Peticiones individuales
+
+    def alta(self, plazas, equipamiento, precio):
+        """ :returns: Habitación creada. """
+
+        _, cuerpo = self._peticion('POST', '', json={'plazas': plazas, 'equipamiento': equipamiento,
+                                                     'precio': precio})
+        return Habitacion.from_dict(cuerpo)
+
+    def borrar(self, target_id):
+        """ Elimina una habitación disponible. """
+
+        self._peticion('DELETE', str(target_id))
+
+    def habitacion(self, target_id):
+        """ :returns: Habitación con ese ID. """
+
+        _, cuerpo = self._peticion('GET', str(target_id))
+        return Habitacion.from_dict(cuerpo)
+
+    def habitaciones(self):
+        """ :returns: Lista de todas las habitaciones en orden de ID. """
+
+        _, cuerpo = self._peticion('GET', '')
+        return self._habitaciones(cuerpo)
+
+    def ocupadas(self):
+        """ :returns: Lista de las habitaciones ocupadas. """
+
+        _, cuerpo = self._peticion('GET', 'ocupadas')
+        return self._habitaciones(cuerpo)
+
+    def disponibles(self):
+        """ :returns: Lista de las habitaciones disponibles. """
+
+        _, cuerpo = self._peticion('GET', 'disponibles')
+        return self._habitaciones(cuerpo)
+
+    def total(self, disponible):
+        """ :param disponible: True para las disponibles, False para las ocupadas.
+        :returns: Número de habitaciones. """
+
+        _, cuerpo = self._peticion('GET', 'disponibles/total' if disponible else 'ocupadas/total')
+        return cuerpo['total']
+
+    def estadisticas(self):
+        """ :returns: Diccionario de GET /estadisticas. """
+
+        _, cuerpo = self._peticion('GET', 'estadisticas')
+        return cuerpo
+
+    def buscar(self, **filtros):
+        """ Busca habitaciones, ver GET /buscar.
+
+            cliente.buscar(precio_max=120, equipamiento=['wifi', 'TV'])
+
+        :returns: Lista de las habitaciones encontradas."""
+
+        if 'disponible' in filtros:
+            filtros['disponible'] = str(filtros['disponible']).lower()
+        _, cuerpo = self._peticion('GET', 'buscar', params=filtros)
+        return self._habitaciones(cuerpo)
+
+    def recorrer(self, disponible=None, pagina=1000):
+        """ Recorre un listado por páginas con el cursor del servidor.
+
+        :param disponible: True o False para recorrer solo las
+        disponibles u ocupadas, None para todas.
+        :param pagina: Habitaciones por petición.
+        :returns: Generador de habitaciones en orden de ID."""
+
+        ruta = {None: '', True: 'disponibles', False: 'ocupadas'}[disponible]
+        after = None
+        while True:
+            params = {'limit': pagina} if after is None else {'limit': pagina, 'after': after}
+            r, cuerpo = self._peticion('GET', ruta, params=params)
+            yield from self._habitaciones(cuerpo)
+            after = r.headers.get('X-Next-Cursor')
+            if after is None:
+                return
+
+    def disponibilidad(self, target_id):
+        """ :returns: True si la habitación está disponible. """
+
+        _, cuerpo = self._peticion('GET', f'{target_id}/disponibilidad')
+        return cuerpo
+
+    def modificar_disponibilidad(self, target_id, disponible):
+        """ :returns: Nueva disponibilidad. """
+
+        _, cuerpo = self._peticion('PUT', f'{target_id}/disponibilidad', params={'disponible': disponible})
+        return cuerpo
+
+    def modificar_plazas(self, target_id, plazas):
+        """ :returns: Nuevo número de plazas. """
+
+        _, cuerpo = self._peticion('PUT', f'{target_id}/plazas', params={'plazas': plazas})
+        return cuerpo['plazas']
+
+    def modificar_precio(self, target_id, precio):
+        """ :returns: Nuevo precio. """
+
+        _, cuerpo = self._peticion('PUT', f'{target_id}/precio', params={'precio': precio})
+        return cuerpo
+
+    def modificar_equipamiento(self, target_id, equipamiento):
+        """ Sustituye el equipamiento.
+
+        :returns: Habitación modificada."""
+
+        _, cuerpo = self._peticion('PUT', f'{target_id}/equipamiento', json={'equipamiento': equipamiento})
+        return Habitacion.from_dict(cuerpo)
+
+    def anadir_equipamiento(self, target_id, equipamiento):
+        """ Añade los elementos que la habitación no tiene.
+
+        :returns: Habitación modificada."""
+
+        _, cuerpo = self._peticion('PUT', f'{target_id}/equipamiento/add', json={'equipamiento': equipamiento})
+        return Habitacion.from_dict(cuerpo)
+
+    def eliminar_equipamiento(self, target_id, equipamiento):
+        """ Quita los elementos indicados.
+
+        :returns: Habitación modificada."""
+
+        _, cuerpo = self._peticion('PUT', f'{target_id}/equipamiento/eliminar', json={'equipamiento': equipamiento})
+        return Habitacion.from_dict(cuerpo)
+
+    def reservas(self, target_id):
+        """ :returns: Pares de fechas [inicio, fin) reservadas, en orden. """
+
+        _, cuerpo = self._peticion('GET', f'{target_id}/reservas')
+        return cuerpo
+
+    def reservar(self, target_id, inicio, fin):
+        """ Reserva una habitación de la fecha inicio, incluida, a fin, excluida.
+
+        :param inicio: Fecha de llegada, AAAA-MM-DD.
+        :param fin: Fecha de salida, AAAA-MM-DD.
+        :returns: Reservas de la habitación.
+        :raises ErrorServidor: Con estado 409 si solapa otra reserva."""
+
+        _, cuerpo = self._peticion('POST', f'{target_id}/reservas', json={'inicio': inicio, 'fin': fin})
+        return cuerpo
+
+    def cancelar_reserva(self, target_id, inicio):
+        """ Cancela la reserva que empieza en la fecha inicio.
+
+        :returns: Reservas restantes de la habitación."""
+
+        _, cuerpo = self._peticion('DELETE', f'{target_id}/reservas/{inicio}')
+        return cuerpo
+
+    def libres(self, inicio, fin):
+        """ :returns: Lista de las habitaciones sin reservas entre inicio, incluida, y fin, excluida. """
+
+        _, cuerpo = self._peticion('GET', 'libres', params={'inicio': inicio, 'fin': fin})
+        return self._habitaciones(cuerpo)
+
+    # Peticiones por lotes, todo o nada
+
+    def alta_lote(self, habitaciones):
+        """ Da de alta varias habitaciones en una petición.
+
+        :param habitaciones: Diccionarios con plazas, equipamiento y precio.
+        :returns: Habitaciones creadas, en el mismo orden."""
+
+        _, cuerpo = self._peticion('POST', 'lote', json={'habitaciones': list(habitaciones)})
+        return [Habitacion.from_dict(resultado['habitacion']) for resultado in cuerpo['resultados']]
+
+    def modificar_lote(self, cambios):
+        """ Modifica varias habitaciones en una petición.
+
+        :param cambios: Diccionarios con id y plazas, precio o equipamiento.
+        :returns: Habitaciones modificadas, en el mismo orden."""
+
+        _, cuerpo = self._peticion('PUT', 'lote', json={'cambios': list(cambios)})
+        return [Habitacion.from_dict(resultado['habitacion']) for resultado in cuerpo['resultados']]
+
+    def disponibilidad_lote(self, ids, disponible):
+        """ Fija la disponibilidad de varias habitaciones en una petición. """
+
+        self._peticion('PUT', 'lote/disponibilidad', json={'ids': list(ids), 'disponible': disponible})
@@ -0,0 +1,312 @@
+""" Cliente asíncrono para operaciones masivas
+
+Contraparte asyncio de cliente_api.py basada en aiohttp, para los
+trabajos que cambian precio, plazas, equipamiento o disponibilidad de
+miles de habitaciones. Las peticiones se lanzan concurrentemente con
+un límite de peticiones en vuelo, las idempotentes (GET, PUT y
+DELETE) se reintentan con espera exponencial ante errores de conexión
+y respuestas 5xx, y se mide el número de peticiones por segundo. Las
+POST (altas y reservas) no se reintentan, el servidor puede haberlas
+aplicado aunque la respuesta no llegue:
+
+    async with ClienteAsincrono('http://localhost:8080/', concurrencia=32) as cliente:
+        informe = await cliente.aplicar(range(1, 5001), cliente.modificar_precio, 120)
+        print(informe)
+
+Desde la línea de comandos, contra un servidor en marcha o contra un
+servidor.py local con un inventario generado (--local):
+
+    python cliente_async.py --local 5000 --ids 1:5000 --precio 120 --concurrencia 32
+"""
+from json import loads
+from tempfile import TemporaryDirectory
+import argparse
+import asyncio
+import random
+import time
+
+import aiohttp
+
+from cliente_api import BASE, ErrorServidor, Habitacion
+
+""" Métodos que se pueden repetir sin cambiar el resultado, los únicos que se reintentan por defecto """
+IDEMPOTENTES = ('GET', 'PUT', 'DELETE')
+
+
+class Informe:
+    """ Resultado de aplicar una operación a varios IDs
+
+    :ivar resultados: Resultado de cada ID que ha funcionado.
+    :ivar errores: ErrorServidor o excepción de cada ID que ha fallado.
+    :ivar duracion: Segundos transcurridos.
+    :ivar peticiones: Peticiones HTTP enviadas, reintentos incluidos."""
+
+    def __init__(self, resultados, errores, duracion, peticiones):
+        self.resultados = resultados
+        self.errores = errores
+        self.duracion = duracion
+        self.peticiones = peticiones
+
+    @property
+    def rps(self):
+        """ Peticiones por segundo conseguidas. """
+
+        return self.peticiones / self.duracion if self.duracion > 0 else 0.0
+
+    def __repr__(self):
+        return (f'{len(self.resultados)} correctas, {len(self.errores)} con error, {self.peticiones} peticiones'
+                f' en {self.duracion:.3f}s ({self.rps:.0f} peticiones/s)')
+
+
+class ClienteAsincrono:
+    """ Cliente asyncio de la API REST de habitaciones
+
+    Cada corrutina equivale al método del mismo nombre de
+    ClienteHabitaciones y lanza ErrorServidor si el servidor responde
+    con un error que no se reintenta (4xx).
+
+    :param base: URL base del servidor o del enrutador.
+    :param concurrencia: Peticiones simultáneas como máximo.
+    :param reintentos: Reintentos de cada petición idempotente fallida.
+    :param espera: Segundos de la primera espera entre reintentos, se
+    duplica en cada uno, con variación aleatoria.
+    :param timeout: Segundos de espera de cada petición."""
+
+    def __init__(self, base=BASE, concurrencia=16, reintentos=3, espera=0.05, timeout=10):
+        self.base = base if base.endswith('/') else base + '/'
+        self.concurrencia = concurrencia
+        self.reintentos = reintentos
+        self.espera = espera
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.peticiones = 0  # Peticiones HTTP enviadas, reintentos incluidos.
+        self.reintentadas = 0
+        self.session = None
+        self._semaforo = None
+
+    async def __aenter__(self):
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrencia),
+                                             timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """ Cierra las conexiones. """
+
+        if self.session is not None:
+            await self.session.close()
+
+    async def _peticion(self, metodo, ruta, reintentar=None, **kwargs):
+        """ Envía una petición con reintentos y analiza su cuerpo una vez.
+
+        :param reintentar: True o False para reintentar o no la
+        petición, por defecto solo se reintentan los métodos de
+        IDEMPOTENTES.
+        :returns: Cuerpo JSON de la respuesta, None si está vacío.
+        :raises ErrorServidor: Si el servidor responde con un error."""
+
+        if reintentar is None:
+            reintentar = metodo in IDEMPOTENTES
+        reintentos = self.reintentos if reintentar else 0
+        intento = 0
+        while True:
+            try:
+                async with self._semaforo:
+                    self.peticiones += 1
+                    async with self.session.request(metodo, self.base + ruta, **kwargs) as r:
+                        texto = await r.text()
+                        estado = r.status
+                error = None
+                if estado >= 500:
+                    error = ErrorServidor(estado, texto)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+
+            if error is None:
+                break
+            if intento >= reintentos:
+                raise error
+            intento += 1
+            self.reintentadas += 1
+            await asyncio.sleep(self.espera * 2 ** (intento - 1) * random.uniform(0.5, 1.5))
+
+        try:
+            cuerpo = loads(texto) if texto else None
+        except ValueError:
+            cuerpo = texto
+        if estado >= 400:
+            if isinstance(cuerpo, dict):
+                raise ErrorServidor(estado, cuerpo.get('error_description', ''), cuerpo.get('errores', ()))
+            raise ErrorServidor(estado, cuerpo)
+        return cuerpo
+
+    @staticmethod
+    def _habitaciones(cuerpo):
+        return [Habitacion.from_dict(data) for data in (cuerpo or {}).values()]
+
+    # Peticiones individuales
+
+    async def alta(self, plazas, equipamiento, precio):
+        return Habitacion.from_dict(await self._peticion('POST', '', json={'plazas': plazas,
+                                                                            'equipamiento': equipamiento,
+                                                                            'precio': precio}))
+
+    async def borrar(self, target_id):
+        await self._peticion('DELETE', str(target_id))
+
+    async def habitacion(self, target_id):
+        return Habitacion.from_dict(await self._peticion('GET', str(target_id)))
+
+    async def habitaciones(self):
+        return self._habitaciones(await self._peticion('GET', ''))
+
+    async def ocupadas(self):
+        return self._habitaciones(await self._peticion('GET', 'ocupadas'))
+
+    async def disponibles(self):
+        return self._habitaciones(await self._peticion('GET', 'disponibles'))
+
+    async def buscar(self, **filtros):
+        if 'disponible' in filtros:
+            filtros['disponible'] = str(filtros['disponible']).lower()
+        return self._habitaciones(await self._peticion('GET', 'buscar', params=filtros))
+
+    async def disponibilidad(self, target_id):
+        return await self._peticion('GET', f'{target_id}/disponibilidad')
+
+    async def modificar_disponibilidad(self, target_id, disponible):
+        return await self._peticion('PUT', f'{target_id}/disponibilidad', params={'disponible': str(disponible)})
+
+    async def plazas(self, target_id):
+        return await self._peticion('GET', f'{target_id}/plazas')
+
+    async def modificar_plazas(self, target_id, plazas):
+        return (await self._peticion('PUT', f'{target_id}/plazas', params={'plazas': plazas}))['plazas']
+
+    async def precio(self, target_id):
+        return await self._peticion('GET', f'{target_id}/precio')
+
+    async def modificar_precio(self, target_id, precio):
+        return await self._peticion('PUT', f'{target_id}/precio', params={'precio': precio})
+
+    async def equipamiento(self, target_id):
+        return await self._peticion('GET', f'{target_id}/equipamiento')
+
+    async def modificar_equipamiento(self, target_id, equipamiento):
+        return Habitacion.from_dict(await self._peticion('PUT', f'{target_id}/equipamiento',
+                                                         json={'equipamiento': equipamiento}))
+
+    async def anadir_equipamiento(self, target_id, equipamiento):
+        return Habitacion.from_dict(await self._peticion('PUT', f'{target_id}/equipamiento/add',
+                                                         json={'equipamiento': equipamiento}))
+
+    async def eliminar_equipamiento(self, target_id, equipamiento):
+        return Habitacion.from_dict(await self._peticion('PUT', f'{target_id}/equipamiento/eliminar',
+                                                         json={'equipamiento': equipamiento}))
+
+    async def reservas(self, target_id):
+        return await self._peticion('GET', f'{target_id}/reservas')
+
+    async def reservar(self, target_id, inicio, fin):
+        return await self._peticion('POST', f'{target_id}/reservas', json={'inicio': inicio, 'fin': fin})
+
+    async def cancelar_reserva(self, target_id, inicio):
+        return await self._peticion('DELETE', f'{target_id}/reservas/{inicio}')
+
+    async def libres(self, inicio, fin):
+        return self._habitaciones(await self._peticion('GET', 'libres', params={'inicio': inicio, 'fin': fin}))
+
+    # Operaciones masivas
+
+    async def aplicar(self, ids, operacion, *args):
+        """ Aplica una operación a cada uno de los IDs concurrentemente.
+
+            await cliente.aplicar(ids, cliente.anadir_equipamiento, ['wifi'])
+
+        Un error en un ID no detiene el resto, se recoge en el informe.
+
+        :param ids: Identificadores de las habitaciones.
+        :param operacion: Corrutina del cliente que recibe el ID y args.
+        :param args: Argumentos adicionales de la operación.
+        :returns: Informe con el resultado de cada ID."""
+
+        ids = list(ids)
+        peticiones = self.peticiones
+        inicio = time.perf_counter()
+        salidas = await asyncio.gather(*(operacion(target_id, *args) for target_id in ids), return_exceptions=True)
+        duracion = time.perf_counter() - inicio
+
+        resultados, errores = {}, {}
+        for target_id, salida in zip(ids, salidas):
+            if isinstance(salida, Exception):
+                errores[target_id] = salida
+            else:
+                resultados[target_id] = salida
+        return Informe(resultados, errores, duracion, self.peticiones - peticiones)
+
+    async def alta_masiva(self, habitaciones):
+        """ Da de alta varias habitaciones con una petición por habitación.
+
+        :param habitaciones: Diccionarios con plazas, equipamiento y precio.
+        :returns: Informe con la habitación creada de cada índice."""
+
+        habitaciones = list(habitaciones)
+        return await self.aplicar(range(len(habitaciones)), lambda indice: self.alta(**habitaciones[indice]))
+
+
+def _rango_ids(texto):
+    inicio, _, fin = texto.partition(':')
+    return range(int(inicio), int(fin or inicio) + 1)
+
+
+async def _ejecutar(args, base):
+    async with ClienteAsincrono(base, args.concurrencia, args.reintentos) as cliente:
+        if args.local:
+            inventario = [{'plazas': 1 + i % 4, 'equipamiento': ['TV'], 'precio': 40 + i % 100}
+                          for i in range(args.local)]
+            print(f'Alta de {args.local} habitaciones: {await cliente.alta_masiva(inventario)}')
+
+        # La disponibilidad al final, el servidor no permite modificar habitaciones ocupadas.
+        cambios = [(cliente.modificar_precio, args.precio), (cliente.modificar_plazas, args.plazas),
+                   (cliente.modificar_equipamiento, args.equipamiento),
+                   (cliente.anadir_equipamiento, args.anadir), (cliente.eliminar_equipamiento, args.eliminar),
+                   (cliente.modificar_disponibilidad, args.disponible)]
+        for operacion, valor in cambios:
+            if valor is not None:
+                informe = await cliente.aplicar(args.ids, operacion, valor)
+                print(f'{operacion.__name__}: {informe}')
+                for target_id, error in list(informe.errores.items())[:10]:
+                    print(f'\t{target_id}: {error}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cambios masivos de habitaciones con peticiones concurrentes.')
+    parser.add_argument('--base', default=BASE, help='URL del servidor o del enrutador.')
+    parser.add_argument('--ids', type=_rango_ids, default=range(0), metavar='INICIO:FIN',
+                        help='Rango de IDs a los que se aplican los cambios.')
+    parser.add_argument('--concurrencia', type=int, default=16, help='Peticiones simultáneas como máximo.')
+    parser.add_argument('--reintentos', type=int, default=3, help='Reintentos de cada petición idempotente fallida.')
+    parser.add_argument('--precio', type=int, help='Nuevo precio.')
+    parser.add_argument('--plazas', type=int, help='Nuevo número de plazas.')
+    parser.add_argument('--disponible', choices=('true', 'false'), help='Nueva disponibilidad.')
+    parser.add_argument('--equipamiento', type=lambda texto: texto.split(','), help='Nuevo equipamiento, a,b,c.')
+    parser.add_argument('--anadir', type=lambda texto: texto.split(','), help='Equipamiento a añadir, a,b,c.')
+    parser.add_argument('--eliminar', type=lambda texto: texto.split(','), help='Equipamiento a quitar, a,b,c.')
+    parser.add_argument('--local', type=int, default=0, metavar='N',
+                        help='Lanza un servidor.py local con N habitaciones generadas en lugar de usar --base.')
+    parser.add_argument('--puerto-local', type=int, default=8095, help='Puerto del servidor local.')
+    args = parser.parse_args()
+
+    if args.local:
+        import router
+
+        with TemporaryDirectory() as directorio:
+            proceso = router.lanzar_servidor(args.puerto_local, directorio, ('--servidor', 'hilos'))
+            try:
+                asyncio.run(_ejecutar(args, f'http://localhost:{args.puerto_local}/'))
+            finally:
+                router.detener_servidor(proceso)
+    else:
+        asyncio.run(_ejecutar(args, args.base))
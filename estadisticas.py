@@ -0,0 +1,99 @@
+from bisect import bisect_right
+
+""" Límites de los intervalos del histograma de precios, el último intervalo no tiene límite superior """
+LIMITES_PRECIO = (25, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+
+class Estadisticas:
+    """ Agregados del inventario mantenidos al vuelo
+
+    Número de habitaciones y de disponibles, plazas totales y
+    disponibles, suma de precios e histograma de precios. Cada alta,
+    baja o modificación suma y resta la aportación de la habitación,
+    de modo que consultarlos no depende del tamaño del inventario. Los
+    precios enteros se suman aparte para que su suma sea exacta.
+
+    No toma cerrojos, Registry los actualiza bajo su cerrojo."""
+
+    def __init__(self, limites=LIMITES_PRECIO):
+        self.limites = tuple(limites)
+        self.habitaciones = 0
+        self.disponibles = 0
+        self.plazas = 0
+        self.plazas_disponibles = 0
+        self.suma_entera = 0  # Suma de los precios enteros.
+        self.suma_decimal = 0.0  # Suma del resto de precios.
+        self.histograma = [0] * (len(self.limites) + 1)  # Habitaciones por intervalo de precio.
+
+    @classmethod
+    def desde(cls, agregados, limites=LIMITES_PRECIO):
+        """ Construye las estadísticas a partir de agregados calculados
+        de una vez, ver SqliteStorage.agregados().
+
+        :param agregados: Diccionario de agregados.
+        :param limites: Límites del histograma de los agregados.
+        :returns: Estadísticas."""
+
+        estadisticas = cls(limites)
+        for campo in ('habitaciones', 'disponibles', 'plazas', 'plazas_disponibles', 'histograma'):
+            setattr(estadisticas, campo, agregados[campo])
+        if isinstance(agregados['suma_precio'], int):
+            estadisticas.suma_entera = agregados['suma_precio']
+        else:
+            estadisticas.suma_decimal = agregados['suma_precio']
+        return estadisticas
+
+    def _aplicar(self, signo, disponible, plazas, precio):
+        self.habitaciones += signo
+        self.plazas += signo * plazas
+        if disponible:
+            self.disponibles += signo
+            self.plazas_disponibles += signo * plazas
+        if isinstance(precio, int):
+            self.suma_entera += signo * precio
+        else:
+            self.suma_decimal += signo * precio
+        self.histograma[bisect_right(self.limites, precio)] += signo
+
+    @staticmethod
+    def aportacion(room):
+        """ :returns: Valores de la habitación que cuentan en los agregados. """
+
+        return room.disponible, room.plazas, room.precio
+
+    def anadir(self, aportacion):
+        self._aplicar(1, *aportacion)
+
+    def quitar(self, aportacion):
+        self._aplicar(-1, *aportacion)
+
+    def cambiar(self, anterior, nueva):
+        """ Sustituye la aportación de una habitación modificada. """
+
+        if anterior != nueva:
+            self._aplicar(-1, *anterior)
+            self._aplicar(1, *nueva)
+
+    def to_dict(self, minimo, maximo, equipamiento):
+        """ Devuelve el diccionario serializable de las estadísticas.
+
+        :param minimo: Precio mínimo, None sin habitaciones.
+        :param maximo: Precio máximo, None sin habitaciones.
+        :param equipamiento: Habitaciones con cada elemento.
+        :returns: Diccionario de GET /estadisticas."""
+
+        ocupadas = self.habitaciones - self.disponibles
+        suma = self.suma_entera + self.suma_decimal
+        desde = (0,) + self.limites
+        hasta = self.limites + (None,)
+        return {
+            'habitaciones': self.habitaciones, 'disponibles': self.disponibles, 'ocupadas': ocupadas,
+            'ocupacion': ocupadas / self.habitaciones if self.habitaciones else 0.0,
+            'plazas': {'total': self.plazas, 'disponibles': self.plazas_disponibles,
+                       'ocupadas': self.plazas - self.plazas_disponibles},
+            'precio': {'medio': suma / self.habitaciones if self.habitaciones else None,
+                       'minimo': minimo, 'maximo': maximo},
+            'histograma_precio': [{'desde': inicio, 'hasta': fin, 'habitaciones': total}
+                                  for inicio, fin, total in zip(desde, hasta, self.histograma)],
+            'equipamiento': dict(sorted(equipamiento.items(), key=lambda par: (-par[1], str(par[0])))),
+        }
@@ -0,0 +1,41 @@
+class Fragmentos:
+    """ Caché del JSON de cada habitación
+
+    Guarda por ID la habitación serializada junto a la versión con la
+    que se serializó. Toda modificación pasa por Registry.modify y
+    cambia la versión, de modo que un fragmento es válido mientras la
+    versión coincida y solo se vuelve a serializar la habitación la
+    primera vez que se pide tras cambiar. Los listados se construyen
+    concatenando fragmentos en lugar de serializar diccionarios.
+
+    Sin cerrojos: la versión se lee antes de serializar, si la
+    habitación cambia entretanto el fragmento queda anotado con la
+    versión anterior y se rehace en la siguiente petición."""
+
+    def __init__(self):
+        self._fragmentos = {}  # Par (versión, JSON) por ID.
+
+    def __len__(self):
+        return len(self._fragmentos)
+
+    def json(self, room):
+        """ :param room: Habitación.
+        :returns: Habitación serializada en JSON, como room.to_json()."""
+
+        version = room.version
+        fragmento = self._fragmentos.get(room.id)
+        if fragmento is not None and fragmento[0] == version:
+            return fragmento[1]
+        texto = room.to_json()
+        self._fragmentos[room.id] = (version, texto)
+        return texto
+
+    def descartar(self, target_id):
+        """ Olvida el fragmento de una habitación eliminada.
+
+        :param target_id: Identificador único de la habitación."""
+
+        self._fragmentos.pop(target_id, None)
+
+    def vaciar(self):
+        self._fragmentos.clear()
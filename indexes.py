@@ -0,0 +1,209 @@
+from bisect import bisect_left, bisect_right, insort
+
+
+class SortedIndex:
+    """ Índice ordenado de un atributo numérico
+
+    Guarda los pares (valor, id) ordenados para resolver consultas
+    por rango con búsqueda binaria. Recuerda el valor indexado de
+    cada ID para poder actualizarlo sin conocer el valor anterior."""
+
+    def __init__(self):
+        self._entradas = []  # Pares (valor, id) ordenados.
+        self._valores = {}  # Valor indexado de cada ID.
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def update(self, target_id, valor):
+        """ Indexa o reindexa el valor de un ID. """
+
+        self.remove(target_id)
+        self._valores[target_id] = valor
+        insort(self._entradas, (valor, target_id))
+
+    def remove(self, target_id):
+        """ Elimina un ID del índice si estaba indexado. """
+
+        valor = self._valores.pop(target_id, None)
+        if valor is not None:
+            del self._entradas[bisect_left(self._entradas, (valor, target_id))]
+
+    def primero(self):
+        """ :returns: ID con el menor valor, None si está vacío. """
+
+        return self._entradas[0][1] if self._entradas else None
+
+    def ultimo(self):
+        """ :returns: ID con el mayor valor, None si está vacío. """
+
+        return self._entradas[-1][1] if self._entradas else None
+
+    def _limites(self, minimo=None, maximo=None):
+        inicio = 0 if minimo is None else bisect_left(self._entradas, (minimo,))
+        fin = len(self._entradas) if maximo is None else bisect_right(self._entradas, (maximo, float('inf')))
+        return inicio, max(inicio, fin)
+
+    def count(self, minimo=None, maximo=None):
+        """ :returns: Número de IDs con valor en [minimo, maximo]. """
+
+        inicio, fin = self._limites(minimo, maximo)
+        return fin - inicio
+
+    def ids(self, minimo=None, maximo=None):
+        """ :returns: IDs con valor en [minimo, maximo]. """
+
+        inicio, fin = self._limites(minimo, maximo)
+        return (target_id for _, target_id in self._entradas[inicio:fin])
+
+
+class InvertedIndex:
+    """ Índice invertido de un atributo multivaluado
+
+    Relaciona cada elemento (por ejemplo 'wifi') con el conjunto de
+    IDs que lo contienen."""
+
+    def __init__(self):
+        self._ids = {}  # IDs por elemento.
+        self._elementos = {}  # Elementos indexados de cada ID.
+
+    def update(self, target_id, elementos):
+        """ Indexa o reindexa los elementos de un ID. """
+
+        self.remove(target_id)
+        elementos = frozenset(elementos)
+        self._elementos[target_id] = elementos
+        for elemento in elementos:
+            self._ids.setdefault(elemento, set()).add(target_id)
+
+    def remove(self, target_id):
+        """ Elimina un ID del índice si estaba indexado. """
+
+        for elemento in self._elementos.pop(target_id, ()):
+            ids = self._ids[elemento]
+            ids.discard(target_id)
+            if len(ids) == 0:
+                del self._ids[elemento]
+
+    def frecuencias(self):
+        """ :returns: Número de IDs que contienen cada elemento. """
+
+        return {elemento: len(ids) for elemento, ids in self._ids.items()}
+
+    def ids(self, elemento):
+        """ :returns: Conjunto de IDs que contienen el elemento. """
+
+        return self._ids.get(elemento, set())
+
+
+class SortedIdSet:
+    """ Conjunto de IDs ordenado
+
+    Permite recorrer los IDs en orden estable a partir de un cursor,
+    base de la paginación de los listados. Las altas de IDs nuevos,
+    normalmente los mayores, se anexan al final."""
+
+    def __init__(self):
+        self._ids = []  # IDs ordenados.
+
+    def __contains__(self, target_id):
+        i = bisect_left(self._ids, target_id)
+        return i < len(self._ids) and self._ids[i] == target_id
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, target_id):
+        """ Añade un ID si no estaba en el conjunto. """
+
+        if len(self._ids) == 0 or self._ids[-1] < target_id:
+            self._ids.append(target_id)
+        elif target_id not in self:
+            insort(self._ids, target_id)
+
+    def discard(self, target_id):
+        """ Elimina un ID si estaba en el conjunto. """
+
+        i = bisect_left(self._ids, target_id)
+        if i < len(self._ids) and self._ids[i] == target_id:
+            del self._ids[i]
+
+    def after(self, cursor=None, limit=None):
+        """ Devuelve los IDs posteriores al cursor.
+
+        :param cursor: Último ID ya recorrido, None para empezar.
+        :param limit: Número máximo de IDs, None para todos.
+        :returns: Lista de IDs ordenada."""
+
+        inicio = 0 if cursor is None else bisect_right(self._ids, cursor)
+        fin = len(self._ids) if limit is None else inicio + limit
+        return self._ids[inicio:fin]
+
+
+class IntervalIndex:
+    """ Índice de intervalos semiabiertos [inicio, fin) de varios IDs
+
+    Reparte los intervalos en clases por duración, la clase k contiene
+    los que duran menos de 2**k y al menos 2**(k - 1), y en cada clase
+    guarda las tripletas (inicio, fin, id) ordenadas por inicio. Un
+    intervalo solapa [a, b) si empieza antes de b y termina después de
+    a; los de la clase k que solapan empiezan en (a - 2**k, b), un
+    rango que se localiza con búsqueda binaria, y de los que empiezan
+    en él solo pueden terminar antes de a los que empiezan en
+    (a - 2**k, a - 2**(k - 1)]. Una consulta cuesta O(c log n + k), con
+    c las clases no vacías (una por potencia de 2 de las duraciones) y
+    k los intervalos recorridos, así una reserva muy larga no obliga a
+    recorrer todas las cortas como con una única duración máxima."""
+
+    def __init__(self):
+        self._clases = {}  # Tripletas (inicio, fin, id) ordenadas de cada clase de duración.
+        self._intervalos = {}  # Intervalos indexados de cada ID.
+
+    def __len__(self):
+        return sum(len(entradas) for entradas in self._clases.values())
+
+    @staticmethod
+    def _clase(inicio, fin):
+        return (fin - inicio).bit_length()
+
+    def update(self, target_id, intervalos):
+        """ Indexa o reindexa los intervalos de un ID.
+
+        Solo se tocan los intervalos añadidos o quitados."""
+
+        anteriores = self._intervalos.get(target_id, frozenset())
+        intervalos = frozenset(intervalos)
+        for inicio, fin in anteriores - intervalos:
+            self._quitar(target_id, inicio, fin)
+        for inicio, fin in intervalos - anteriores:
+            insort(self._clases.setdefault(self._clase(inicio, fin), []), (inicio, fin, target_id))
+        if intervalos:
+            self._intervalos[target_id] = intervalos
+        else:
+            self._intervalos.pop(target_id, None)
+
+    def remove(self, target_id):
+        """ Elimina los intervalos de un ID si estaba indexado. """
+
+        for inicio, fin in self._intervalos.pop(target_id, ()):
+            self._quitar(target_id, inicio, fin)
+
+    def _quitar(self, target_id, inicio, fin):
+        clase = self._clase(inicio, fin)
+        entradas = self._clases[clase]
+        del entradas[bisect_left(entradas, (inicio, fin, target_id))]
+        if len(entradas) == 0:
+            del self._clases[clase]
+
+    def ids(self, inicio, fin):
+        """ :returns: Conjunto de IDs con algún intervalo que solapa [inicio, fin). """
+
+        ids = set()
+        for clase, entradas in self._clases.items():
+            desde = bisect_right(entradas, (inicio - 2 ** clase, float('inf')))
+            hasta = bisect_left(entradas, (fin,))
+            ids.update(target_id for comienzo, final, target_id in entradas[desde:hasta] if final > inicio)
+        return ids
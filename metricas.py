@@ -0,0 +1,188 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from bottle import HTTPResponse, response
+import threading
+import time
+
+""" Límites superiores, en segundos, de los intervalos de los histogramas de latencia """
+LIMITES_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+""" Tipo de contenido del formato de texto de Prometheus """
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _etiquetas(**etiquetas):
+    """ Formatea las etiquetas de una muestra, escapando sus valores. """
+
+    return '{' + ','.join('{}="{}"'.format(nombre, str(valor).replace('\\', '\\\\').replace('"', '\\"')
+                                           .replace('\n', '\\n'))
+                          for nombre, valor in etiquetas.items()) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(int(valor))
+
+
+class Histograma:
+    """ Histograma de observaciones con intervalos fijos
+
+    Guarda el recuento de cada intervalo sin acumular, la suma y el
+    total, observar() es una búsqueda binaria y tres sumas. Los
+    recuentos se acumulan al exportar, como espera Prometheus."""
+
+    __slots__ = ('limites', 'recuentos', 'suma', 'total')
+
+    def __init__(self, limites=LIMITES_LATENCIA):
+        self.limites = limites
+        self.recuentos = [0] * (len(limites) + 1)  # El último intervalo es +Inf.
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.recuentos[bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def muestras(self, nombre, **etiquetas):
+        """ :returns: Líneas _bucket, _sum y _count del histograma. """
+
+        acumulado = 0
+        for limite, recuento in zip(self.limites + ('+Inf',), self.recuentos):
+            acumulado += recuento
+            le = limite if limite == '+Inf' else _numero(limite)
+            yield f'{nombre}_bucket{_etiquetas(**etiquetas, le=le)} {acumulado}'
+        yield f'{nombre}_sum{_etiquetas(**etiquetas)} {_numero(self.suma)}'
+        yield f'{nombre}_count{_etiquetas(**etiquetas)} {self.total}'
+
+
+class Metricas:
+    """ Métricas del servicio en el formato de texto de Prometheus
+
+    Es un plugin de Bottle: al instalarlo envuelve cada ruta y anota,
+    por método y plantilla de ruta ('/<target_id:int>/precio', no la
+    URL concreta), el número de peticiones por código de estado y un
+    histograma de su latencia. La latencia es la del handler, en los
+    listados en streaming no incluye el envío del cuerpo.
+
+        metricas = Metricas()
+        install(metricas)
+
+    paso() mide las fases de una operación en otro histograma, y
+    medidor() registra valores que se leen al exportar, como el tamaño
+    del registro. exportar() genera el texto de GET /metrics.
+
+    Cada anotación toma un único cerrojo durante unas pocas sumas, la
+    plantilla y el histograma de cada ruta se resuelven una sola vez
+    al aplicar el plugin."""
+
+    name = 'metricas'
+    api = 2
+
+    def __init__(self, prefijo='habitaciones'):
+        self.prefijo = prefijo
+        self.peticiones = {}  # Recuento por (método, ruta, estado).
+        self.latencias = {}  # Histograma de latencia por (método, ruta).
+        self.pasos = {}  # Histograma de duración por paso.
+        self.medidores = {}  # Par (descripción, función que devuelve los valores) por nombre.
+        self._lock = threading.Lock()
+
+    def apply(self, callback, route):
+        clave = (route.method, route.rule)
+        with self._lock:
+            histograma = self.latencias.setdefault(clave, Histograma())
+
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            estado = 500
+            try:
+                resultado = callback(*args, **kwargs)
+                estado = response.status_code
+                return resultado
+            except HTTPResponse as e:
+                estado = e.status_code
+                raise
+            finally:
+                duracion = time.perf_counter() - inicio
+                with self._lock:
+                    histograma.observar(duracion)
+                    self.peticiones[clave + (estado,)] = self.peticiones.get(clave + (estado,), 0) + 1
+
+        return wrapper
+
+    def observar(self, paso, duracion):
+        """ Anota la duración de un paso.
+
+        :param paso: Nombre del paso.
+        :param duracion: Segundos."""
+
+        with self._lock:
+            histograma = self.pasos.get(paso)
+            if histograma is None:
+                histograma = self.pasos[paso] = Histograma()
+            histograma.observar(duracion)
+
+    @contextmanager
+    def paso(self, paso):
+        """ Mide la duración de un bloque, aunque lance una excepción.
+
+            with metricas.paso('escritura'):
+                storage.save(data)
+
+        :param paso: Nombre del paso."""
+
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(paso, time.perf_counter() - inicio)
+
+    def medidor(self, nombre, descripcion, valores):
+        """ Registra un medidor que se evalúa al exportar.
+
+        :param nombre: Nombre de la métrica, sin prefijo.
+        :param descripcion: Texto de ayuda.
+        :param valores: Función que devuelve un número, o un
+        diccionario de números por valor de la etiqueta 'tipo'."""
+
+        self.medidores[nombre] = (descripcion, valores)
+
+    def exportar(self):
+        """ :returns: Texto de todas las métricas en formato Prometheus. """
+
+        with self._lock:
+            peticiones = sorted(self.peticiones.items())
+            latencias = [(clave, self._copia(histograma)) for clave, histograma in sorted(self.latencias.items())]
+            pasos = [(paso, self._copia(histograma)) for paso, histograma in sorted(self.pasos.items())]
+
+        nombre = f'{self.prefijo}_peticiones_total'
+        lineas = [f'# HELP {nombre} Peticiones atendidas por método, ruta y estado.', f'# TYPE {nombre} counter']
+        lineas += [f'{nombre}{_etiquetas(metodo=metodo, ruta=ruta, estado=estado)} {total}'
+                   for (metodo, ruta, estado), total in peticiones]
+
+        nombre = f'{self.prefijo}_peticion_segundos'
+        lineas += [f'# HELP {nombre} Latencia de las peticiones por método y ruta.', f'# TYPE {nombre} histogram']
+        for (metodo, ruta), histograma in latencias:
+            lineas += histograma.muestras(nombre, metodo=metodo, ruta=ruta)
+
+        nombre = f'{self.prefijo}_paso_segundos'
+        lineas += [f'# HELP {nombre} Duración de cada paso de la persistencia.', f'# TYPE {nombre} histogram']
+        for paso, histograma in pasos:
+            lineas += histograma.muestras(nombre, paso=paso)
+
+        for sufijo, (descripcion, valores) in sorted(self.medidores.items()):
+            nombre = f'{self.prefijo}_{sufijo}'
+            lineas += [f'# HELP {nombre} {descripcion}', f'# TYPE {nombre} gauge']
+            valores = valores()
+            if isinstance(valores, dict):
+                lineas += [f'{nombre}{_etiquetas(tipo=tipo)} {_numero(valor)}' for tipo, valor in valores.items()]
+            else:
+                lineas.append(f'{nombre} {_numero(valores)}')
+        return '\n'.join(lineas) + '\n'
+
+    @staticmethod
+    def _copia(histograma):
+        copia = Histograma(histograma.limites)
+        copia.recuentos, copia.suma, copia.total = list(histograma.recuentos), histograma.suma, histograma.total
+        return copia
@@ -0,0 +1,138 @@
+from functools import wraps
+import cProfile
+import pstats
+import random
+import re
+import threading
+
+""" Criterios de ordenación de las funciones más costosas """
+ORDENES = {'acumulado': 3, 'propio': 2, 'llamadas': 1}
+
+
+class Perfilador:
+    """ Perfilado bajo demanda de las peticiones
+
+    Plugin de Bottle que ejecuta con cProfile una muestra de las
+    peticiones, una de cada 1/`tasa` al azar, o todas las de las rutas
+    cuya plantilla ('/<target_id:int>/precio') case con `patron`, y
+    acumula los resultados por método y ruta. Se activa, desactiva y
+    reconfigura en caliente con configurar(); desactivado solo cuesta
+    comprobar un atributo por petición.
+
+        perfilador = Perfilador()
+        install(perfilador)
+        perfilador.configurar(activo=True, patron='^/buscar')
+
+    Solo se perfila una petición a la vez (cProfile admite un único
+    perfilador activo en Python 3.12), las que llegan mientras tanto
+    se atienden sin perfilar. Se perfila el handler, en los listados
+    en streaming no se incluye la generación del cuerpo. Las rutas de
+    /debug/ no se perfilan."""
+
+    name = 'perfilador'
+    api = 2
+
+    def __init__(self, tasa=0.0, patron=None, activo=False):
+        self.tasa = 0.0
+        self.patron = None
+        self.activo = False
+        self.resultados = {}  # Estadísticas acumuladas por (método, ruta).
+        self.perfiladas = {}  # Peticiones perfiladas por (método, ruta).
+        self._lock = threading.Lock()
+        self._perfilando = threading.Lock()
+        self.configurar(activo, tasa, patron)
+
+    def configurar(self, activo=None, tasa=None, patron=None):
+        """ Cambia la configuración, los parámetros None se mantienen.
+
+        :param activo: Activa o desactiva el perfilado.
+        :param tasa: Fracción de las peticiones que se perfilan, de 0 a 1.
+        :param patron: Expresión regular de las plantillas de ruta que
+        se perfilan siempre, '' para ninguna.
+        :raises ValueError: Si la tasa no está entre 0 y 1 o el patrón
+        no es una expresión regular válida."""
+
+        if tasa is not None and not 0 <= tasa <= 1:
+            raise ValueError('La tasa tiene que estar entre 0 y 1.')
+        if patron is not None:
+            try:
+                patron = re.compile(patron) if patron else None
+            except re.error as e:
+                raise ValueError(f'Patrón no válido: {e}.')
+            self.patron = patron
+        if tasa is not None:
+            self.tasa = tasa
+        if activo is not None:
+            self.activo = activo
+
+    def configuracion(self):
+        """ :returns: Diccionario serializable de la configuración. """
+
+        return {'activo': self.activo, 'tasa': self.tasa, 'patron': None if self.patron is None else self.patron.pattern}
+
+    def reiniciar(self):
+        """ Descarta los resultados acumulados. """
+
+        with self._lock:
+            self.resultados = {}
+            self.perfiladas = {}
+
+    def _perfilar(self, rule):
+        if self.patron is not None and self.patron.search(rule):
+            return True
+        return self.tasa > 0 and random.random() < self.tasa
+
+    def apply(self, callback, route):
+        if route.rule.startswith('/debug/'):
+            return callback
+        clave = (route.method, route.rule)
+
+        @wraps(callback)
+        def wrapper(*args, **kwargs):
+            if not self.activo or not self._perfilar(route.rule) or not self._perfilando.acquire(blocking=False):
+                return callback(*args, **kwargs)
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+                try:
+                    return callback(*args, **kwargs)
+                finally:
+                    perfil.disable()
+            finally:
+                self._perfilando.release()
+                self._acumular(clave, perfil)
+
+        return wrapper
+
+    def _acumular(self, clave, perfil):
+        with self._lock:
+            if clave in self.resultados:
+                self.resultados[clave].add(perfil)
+            else:
+                self.resultados[clave] = pstats.Stats(perfil)
+            self.perfiladas[clave] = self.perfiladas.get(clave, 0) + 1
+
+    def funciones(self, orden='acumulado', limite=20, ruta=None):
+        """ Devuelve las funciones más costosas de cada ruta.
+
+        :param orden: acumulado, propio o llamadas, ver ORDENES.
+        :param limite: Funciones por ruta.
+        :param ruta: Plantilla de ruta, None para todas.
+        :returns: Lista serializable con las peticiones perfiladas y
+        las funciones de cada ruta."""
+
+        indice = ORDENES[orden]
+        with self._lock:
+            rutas = []
+            for (metodo, plantilla), estadisticas in sorted(self.resultados.items()):
+                if ruta is not None and plantilla != ruta:
+                    continue
+                filas = sorted(estadisticas.stats.items(), key=lambda fila: fila[1][indice], reverse=True)
+                rutas.append({
+                    'metodo': metodo, 'ruta': plantilla, 'peticiones': self.perfiladas[(metodo, plantilla)],
+                    'segundos': estadisticas.total_tt,
+                    'funciones': [{'funcion': pstats.func_std_string(funcion), 'llamadas': llamadas,
+                                   'propio': propio, 'acumulado': acumulado}
+                                  for funcion, (_, llamadas, propio, acumulado, _) in filas[:limite]],
+                })
+        return rutas
@@ -0,0 +1,315 @@
+from cambios import Cambios
+from contextlib import ExitStack, contextmanager
+from estadisticas import Estadisticas
+from indexes import IntervalIndex, SortedIndex, InvertedIndex, SortedIdSet
+import threading
+
+""" Número de cerrojos entre los que se reparten las habitaciones """
+STRIPES = 256
+
+
+class Registry:
+    """ Registro en memoria de las habitaciones
+
+    Además del diccionario de habitaciones por ID mantiene los
+    conjuntos ordenados de todos los IDs, de los ocupados y de los
+    disponibles, que dan un orden estable a los listados paginados,
+    índices ordenados por precio y plazas, un índice invertido de
+    equipamiento, un índice de intervalos de las reservas y los
+    agregados de GET /estadisticas. Todos se actualizan en cada alta, baja o
+    modificación, por lo que toda modificación de una habitación
+    registrada debe pasar por modify.
+
+    Cada cambio incrementa la generación del registro y la habitación
+    modificada toma ese valor como versión, de modo que las versiones
+    de una habitación crecen siempre, aunque su ID se reutilice. El
+    cambio se publica en `cambios` con la generación como secuencia.
+
+    Concurrencia: las lecturas no toman cerrojos. Las altas, bajas y
+    modificaciones actualizan los índices bajo `lock`. Las escrituras
+    sobre una misma habitación se serializan con room_lock(), que
+    reparte las habitaciones entre STRIPES cerrojos reentrantes. Quien
+    necesite ambos toma siempre primero los de las habitaciones, en
+    orden, y después `lock`.
+
+    Si se asigna `cargar`, las habitaciones que no están en memoria se
+    cargan bajo demanda al accederlas por ID, para servir sin cargar
+    todo el almacenamiento al arrancar. En ese caso los conjuntos e
+    índices solo contienen las habitaciones cargadas."""
+
+    def __init__(self):
+        self.rooms = {}  # Habitaciones por ID.
+        self.ids = SortedIdSet()  # IDs de todas las habitaciones.
+        self.available_ids = SortedIdSet()  # IDs de las habitaciones disponibles.
+        self.occupied_ids = SortedIdSet()  # IDs de las habitaciones ocupadas.
+        self.precio = SortedIndex()
+        self.plazas = SortedIndex()
+        self.equipamiento = InvertedIndex()
+        self.reservas = IntervalIndex()
+        self.estadisticas = Estadisticas()
+        self.cambios = Cambios()
+        self.generation = 0  # Generación del registro, aumenta con cada cambio.
+        self.lock = threading.RLock()  # Cerrojo de los índices y de las operaciones por lotes.
+        self._stripes = [threading.RLock() for _ in range(STRIPES)]
+        self.cargar = None  # Función que devuelve la habitación de un ID que no está en memoria, o None.
+
+    def __getitem__(self, target_id):
+        room = self.rooms.get(target_id)
+        if room is None:
+            return self._cargar(target_id)
+        return room
+
+    def __contains__(self, target_id):
+        try:
+            self[target_id]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.rooms)
+
+    def values(self):
+        return self.rooms.values()
+
+    def room_lock(self, target_id):
+        """ Devuelve el cerrojo que serializa las escrituras de una habitación.
+
+        :param target_id: Identificador único de la habitación.
+        :returns: Cerrojo reentrante."""
+
+        return self._stripes[hash(target_id) % STRIPES]
+
+    @contextmanager
+    def room_locks(self, ids):
+        """ Toma en orden los cerrojos de varias habitaciones.
+
+        :param ids: Identificadores de las habitaciones."""
+
+        with ExitStack() as stack:
+            for stripe in sorted({hash(target_id) % STRIPES for target_id in ids}):
+                stack.enter_context(self._stripes[stripe])
+            yield
+
+    def _cargar(self, target_id):
+        if self.cargar is None:
+            raise KeyError(target_id)
+        with self.lock:
+            room = self.rooms.get(target_id)
+            if room is None:
+                room = self.cargar(target_id)
+                if room is None:
+                    raise KeyError(target_id)
+                self.add(room)
+            return room
+
+    def _indice(self, disponible):
+        return self.available_ids if disponible else self.occupied_ids
+
+    def _cambio(self):
+        self.generation += 1
+        return self.generation
+
+    def _indexar(self, room, campos):
+        if 'disponible' in campos:
+            self.available_ids.discard(room.id)
+            self.occupied_ids.discard(room.id)
+            self._indice(room.disponible).add(room.id)
+        if 'precio' in campos:
+            self.precio.update(room.id, float(room.precio))
+        if 'plazas' in campos:
+            self.plazas.update(room.id, float(room.plazas))
+        if 'equipamiento' in campos:
+            self.equipamiento.update(room.id, room.elementos())
+        if 'reservas' in campos:
+            self.reservas.update(room.id, room.reservas)
+
+    def add(self, room):
+        """ Registra una habitación.
+
+        Una habitación nueva (versión 0) recibe la siguiente generación
+        como versión, una cargada del almacenamiento conserva la suya.
+
+        :param room: Habitación a registrar."""
+
+        with self.lock:
+            nueva = room.version == 0
+            if nueva:
+                room.version = self._cambio()
+            else:
+                self.generation = max(self.generation, room.version)
+            anterior = self.rooms.get(room.id)
+            if anterior is not None:
+                self.estadisticas.quitar(Estadisticas.aportacion(anterior))
+            self.estadisticas.anadir(Estadisticas.aportacion(room))
+            self.rooms[room.id] = room
+            self.ids.add(room.id)
+            self._indexar(room, ('disponible', 'precio', 'plazas', 'equipamiento', 'reservas'))
+            if nueva:
+                self.cambios.publicar(room.version, 'alta', room.id, disponible=room.disponible)
+
+    def remove(self, target_id):
+        """ Elimina una habitación del registro.
+
+        Nunca carga la habitación con `cargar`, solo elimina las que
+        están en memoria.
+
+        :param target_id: Identificador único de la habitación.
+        :returns: Habitación eliminada.
+        :raises KeyError: Si la habitación no está en memoria."""
+
+        with self.lock:
+            room = self.rooms.pop(target_id)
+            self._cambio()
+            self.estadisticas.quitar(Estadisticas.aportacion(room))
+            self.ids.discard(target_id)
+            self._indice(room.disponible).discard(target_id)
+            self.precio.remove(target_id)
+            self.plazas.remove(target_id)
+            self.equipamiento.remove(target_id)
+            self.reservas.remove(target_id)
+            self.cambios.publicar(self.generation, 'baja', target_id)
+            return room
+
+    def modify(self, target_id, **campos):
+        """ Modifica los atributos de una habitación y sus índices.
+
+            registry.modify(3, precio=120, disponible=False)
+
+        Solo se incrementa la versión si algún valor cambia.
+
+        :param target_id: Identificador único de la habitación.
+        :param campos: Nuevos valores de los atributos.
+        :returns: Habitación modificada.
+        :raises KeyError: Si la habitación no está registrada.
+        :raises ValueError: Si algún valor no es válido."""
+
+        room = self[target_id]
+        campos = {campo: room.normalize(campo, valor) for campo, valor in campos.items()}
+        campos = {campo: valor for campo, valor in campos.items() if getattr(room, campo) != valor}
+        if len(campos) == 0:
+            return room
+
+        with self.lock:
+            anterior = Estadisticas.aportacion(room)
+            for campo, valor in campos.items():
+                setattr(room, campo, valor)
+            room.version = self._cambio()
+            self._indexar(room, campos)
+            self.estadisticas.cambiar(anterior, Estadisticas.aportacion(room))
+            self.cambios.publicar(room.version, 'modificacion', room.id, campos, room.disponible)
+        return room
+
+    def ocupadas(self):
+        """ :returns: Habitaciones ocupadas. """
+
+        return self.existing(self.occupied_ids)
+
+    def disponibles(self):
+        """ :returns: Habitaciones disponibles. """
+
+        return self.existing(self.available_ids)
+
+    def existing(self, ids):
+        """ Devuelve las habitaciones registradas de una lista de IDs.
+
+        Se omiten los IDs eliminados mientras se recorren, de modo que
+        las lecturas concurrentes no necesitan cerrojos.
+
+        :param ids: Identificadores de las habitaciones.
+        :returns: Habitaciones registradas, en el orden de los IDs."""
+
+        for key in ids:
+            room = self.rooms.get(key)
+            if room is not None:
+                yield room
+
+    def resumen(self):
+        """ Devuelve las estadísticas del inventario.
+
+        Los agregados se mantienen en cada cambio, el mínimo y el máximo
+        de precio son los extremos del índice de precios y la frecuencia
+        de cada elemento el tamaño de su conjunto en el índice invertido.
+        El coste no depende del número de habitaciones.
+
+        :returns: Diccionario serializable, ver Estadisticas.to_dict()."""
+
+        with self.lock:
+            extremos = [None if target_id is None else self.rooms[target_id].precio
+                        for target_id in (self.precio.primero(), self.precio.ultimo())]
+            return self.estadisticas.to_dict(*extremos, self.equipamiento.frecuencias())
+
+    def libres(self, inicio, fin):
+        """ Devuelve las habitaciones sin reservas en un intervalo.
+
+        Las reservas que lo solapan se obtienen del índice de
+        intervalos, sin recorrer el calendario de cada habitación. La
+        respuesta es el complemento de las reservadas, por eso se
+        recorren todos los IDs: el coste es O(n) con n el inventario,
+        como el de un listado completo, que también se serializa.
+
+        :param inicio: Ordinal de la fecha de llegada, incluida.
+        :param fin: Ordinal de la fecha de salida, excluida.
+        :returns: Lista de IDs ordenada."""
+
+        reservadas = self.reservas.ids(inicio, fin)
+        return [target_id for target_id in self.ids if target_id not in reservadas]
+
+    def search(self, precio_min=None, precio_max=None, plazas_min=None, plazas_max=None, disponible=None,
+               equipamiento=()):
+        """ Busca las habitaciones que cumplen todos los predicados.
+
+        Se parte del predicado más selectivo según el tamaño de cada
+        índice (el tamaño de un rango se obtiene por búsqueda binaria)
+        y el resto se comprueba sobre esos candidatos.
+
+        :param precio_min: Precio mínimo, incluido.
+        :param precio_max: Precio máximo, incluido.
+        :param plazas_min: Plazas mínimas, incluidas.
+        :param plazas_max: Plazas máximas, incluidas.
+        :param disponible: Disponibilidad, None para no filtrar.
+        :param equipamiento: Elementos que deben estar todos presentes.
+        :returns: Lista de IDs ordenada."""
+
+        candidatos = []  # Pares (tamaño, función que devuelve los IDs).
+        if precio_min is not None or precio_max is not None:
+            candidatos.append((self.precio.count(precio_min, precio_max),
+                               lambda: self.precio.ids(precio_min, precio_max)))
+        if plazas_min is not None or plazas_max is not None:
+            candidatos.append((self.plazas.count(plazas_min, plazas_max),
+                               lambda: self.plazas.ids(plazas_min, plazas_max)))
+        if disponible is not None:
+            ids = self._indice(disponible)
+            candidatos.append((len(ids), lambda ids=ids: ids))
+        for elemento in equipamiento:
+            ids = self.equipamiento.ids(elemento)
+            candidatos.append((len(ids), lambda ids=ids: ids))
+
+        if len(candidatos) == 0:
+            return list(self.ids)
+
+        candidatos.sort(key=lambda candidato: candidato[0])
+        requeridos = set(equipamiento)
+        resultado = []
+        for target_id in list(candidatos[0][1]()):
+            room = self.rooms.get(target_id)
+            if room is None:
+                continue
+            if precio_min is not None and float(room.precio) < precio_min:
+                continue
+            if precio_max is not None and float(room.precio) > precio_max:
+                continue
+            if plazas_min is not None and float(room.plazas) < plazas_min:
+                continue
+            if plazas_max is not None and float(room.plazas) > plazas_max:
+                continue
+            if disponible is not None and room.disponible != disponible:
+                continue
+            if not requeridos.issubset(room.elementos()):
+                continue
+            resultado.append(target_id)
+        resultado.sort()
+        return resultado
@@ -0,0 +1,107 @@
+""" Calendario de reservas de una habitación
+
+Una reserva es un intervalo semiabierto de noches [inicio, fin), del
+día de llegada al de salida, que se recibe y serializa con fechas ISO
+('2026-03-12'). En memoria cada fecha es su ordinal (date.toordinal())
+y el calendario de una habitación es una tupla inmutable de pares
+(inicio, fin) ordenada y sin solapes, de modo que se busca un
+intervalo por bisección y modificarlo crea una tupla nueva."""
+from bisect import bisect_right
+from datetime import date
+
+""" Ordinales de la primera y la última fecha que se pueden serializar """
+ORDINAL_MINIMO = date.min.toordinal()
+ORDINAL_MAXIMO = date.max.toordinal()
+
+
+def fecha(valor):
+    """ Convierte una fecha recibida a su ordinal.
+
+    :param valor: Fecha ISO, date u ordinal.
+    :returns: Ordinal de la fecha.
+    :raises ValueError: Si no es una fecha válida o el ordinal está
+    fuera del rango de date."""
+
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        if not ORDINAL_MINIMO <= valor <= ORDINAL_MAXIMO:
+            raise ValueError(f'{valor} no es el ordinal de una fecha.')
+        return valor
+    if isinstance(valor, date):
+        return valor.toordinal()
+    if not isinstance(valor, str):
+        raise ValueError('Las fechas tienen que tener el formato AAAA-MM-DD.')
+    try:
+        return date.fromisoformat(valor).toordinal()
+    except ValueError:
+        raise ValueError(f'{valor} no es una fecha con el formato AAAA-MM-DD.')
+
+
+def intervalo(inicio, fin):
+    """ :param inicio: Fecha de llegada, incluida.
+    :param fin: Fecha de salida, excluida.
+    :returns: Par de ordinales (inicio, fin).
+    :raises ValueError: Si alguna fecha no es válida o fin no es
+    posterior a inicio."""
+
+    inicio, fin = fecha(inicio), fecha(fin)
+    if fin <= inicio:
+        raise ValueError('La fecha de fin tiene que ser posterior a la de inicio.')
+    return inicio, fin
+
+
+def iso(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+def solapada(reservas, inicio, fin):
+    """ Busca la reserva que solapa un intervalo.
+
+    :param reservas: Calendario ordenado de la habitación.
+    :returns: Par (inicio, fin) de la reserva que solapa, None si no hay."""
+
+    # Solo pueden solapar la última reserva que empieza antes de fin y,
+    # al no solaparse entre sí, ninguna anterior termina después que ella.
+    i = bisect_right(reservas, (fin,))
+    if i > 0 and reservas[i - 1][1] > inicio:
+        return reservas[i - 1]
+    return None
+
+
+def normalizar(reservas):
+    """ Valida y ordena un calendario.
+
+    :param reservas: Pares (inicio, fin) de fechas ISO u ordinales.
+    :returns: Tupla ordenada de pares de ordinales.
+    :raises ValueError: Si algún intervalo no es válido o dos se solapan."""
+
+    try:
+        calendario = sorted(intervalo(*reserva) for reserva in reservas)
+    except TypeError:
+        raise ValueError('Las reservas son pares de fechas [inicio, fin].')
+    for anterior, siguiente in zip(calendario, calendario[1:]):
+        if siguiente[0] < anterior[1]:
+            raise ValueError(f'Las reservas {serializar((anterior, siguiente))} se solapan.')
+    return tuple(calendario)
+
+
+def reservar(reservas, inicio, fin):
+    """ :returns: Calendario con el intervalo añadido, sin comprobar solapes. """
+
+    i = bisect_right(reservas, (inicio, fin))
+    return reservas[:i] + ((inicio, fin),) + reservas[i:]
+
+
+def cancelar(reservas, inicio):
+    """ :returns: Calendario sin la reserva que empieza en inicio.
+    :raises KeyError: Si ninguna reserva empieza ese día."""
+
+    i = bisect_right(reservas, (inicio,))
+    if i == len(reservas) or reservas[i][0] != inicio:
+        raise KeyError(inicio)
+    return reservas[:i] + reservas[i + 1:]
+
+
+def serializar(reservas):
+    """ :returns: Lista serializable de pares de fechas ISO. """
+
+    return [[iso(inicio), iso(fin)] for inicio, fin in reservas]
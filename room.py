@@ -1,9 +1,37 @@
+from allocator import IdAllocator
+from catalogo import Catalogo
+from json import dumps
+from math import isfinite
+import reservas as calendario
+
+PLAZAS_MAXIMO = 2 ** 32 - 1  # Mayor número de plazas que cabe en los registros de ancho fijo.
+
+
+def _numero(valor):
+    """ Convierte un valor recibido a int, o a float si no es entero. """
+
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return valor
+    try:
+        return int(valor)
+    except ValueError:
+        return float(valor)
+
+
 class Room:
-    """ Representa una Habitación """
+    """ Representa una Habitación
+
+    Registro compacto con __slots__, sin diccionario por instancia. El
+    equipamiento se guarda codificado con el catálogo global, las
+    habitaciones con el mismo equipamiento comparten su codificación, y
+    elementos() lo devuelve decodificado. Las reservas son una tupla
+    ordenada de pares de ordinales, ver reservas.py. Se serializa con
+    to_dict() y to_json()."""
+
+    __slots__ = ('id', 'plazas', 'precio', 'equipamiento', 'disponible', 'version', 'reservas')
 
-    current_id = 0  # Variable Estática que indica el último número de indetificación asignado.
-    assigned_ids = []  # Listado de las Variables Asignadas
-    released_ids = []  # Identificaciones que han sido liberadas.
+    allocator = IdAllocator()  # Asignador de identificadores compartido por todas las habitaciones.
+    catalogo = Catalogo()  # Diccionario de equipamiento compartido por todas las habitaciones.
 
     @staticmethod
     def assign_id(target_id):
@@ -17,47 +45,113 @@ class Room:
         :raises IndexError: Si la ID objetivo ya está ocupada."""
 
         if target_id == -1:
-            if len(Room.released_ids) == 0:
-                while True:
-                    Room.current_id = Room.current_id + 1
-                    if Room.current_id not in Room.assigned_ids:
-                        break
-                assigned_id = Room.current_id
+            return Room.allocator.allocate()
+        else:
+            return Room.allocator.reserve(target_id)
+
+    @staticmethod
+    def release_id(target_id):
+        """Libera la ID de una habitación eliminada para que se reutilice
 
-            else:
-                assigned_id = Room.released_ids.pop()
+        :param target_id: ID a liberar
+        :raises KeyError: Si la ID no estaba asignada."""
 
-        else:
-            if target_id in Room.assigned_ids:
-                raise IndexError(f'El id {id} ya está registrado en el sistema.')
-            else:
-                assigned_id = target_id
+        Room.allocator.release(target_id)
+
+    @staticmethod
+    def normalize(campo, valor):
+        """Normaliza el valor de un atributo de la habitación
+
+        Plazas se convierte a entero, precio a número, equipamiento a
+        su combinación codificada en el catálogo y reservas a un
+        calendario ordenado.
 
-        Room.assigned_ids.append(assigned_id)
-        return assigned_id
+        :param campo: Nombre del atributo.
+        :param valor: Valor recibido.
+        :returns: Valor normalizado.
+        :raises ValueError: Si plazas o precio no son números positivos,
+        si plazas supera PLAZAS_MAXIMO, si algún elemento del
+        equipamiento no es un valor simple, o si alguna reserva no es
+        válida o se solapan."""
 
-    def __init__(self, plazas, equipamiento, precio, disponible=True, target_id=-1):
+        if campo == 'plazas':
+            valor = int(valor)
+            if valor < 0:
+                raise ValueError('Plazas debe ser un valor positivo.')
+            if valor > PLAZAS_MAXIMO:
+                raise ValueError(f'Plazas no puede ser mayor que {PLAZAS_MAXIMO}.')
+        elif campo == 'precio':
+            valor = _numero(valor)
+            # float() también acepta 'nan' e 'inf', que no se pueden serializar en JSON.
+            if not isfinite(valor) or valor < 0:
+                raise ValueError('Precio debe ser un valor positivo.')
+        elif campo == 'equipamiento':
+            valor = Room.catalogo.codificar(valor)
+        elif campo == 'reservas':
+            valor = calendario.normalizar(valor) if valor else ()
+        return valor
+
+    def __init__(self, plazas, equipamiento, precio, disponible=True, target_id=-1, version=0, reservas=()):
         """ Constructor Parametrizado de Room
 
         :param plazas: número máximo de ocupantes que pueden alojarse.
         :param equipamiento: lista con todos los servicios.
         :param precio: precio por noche.
         :param disponible: estado de la habitación.
+        :param target_id: ID objetivo, -1 para asignar una nueva.
+        :param version: versión de la habitación, 0 si es nueva.
+        :param reservas: pares de fechas [inicio, fin) reservadas.
         """
 
+        # Validación previa a la asignación de la ID para no consumir IDs.
+        plazas = Room.normalize('plazas', plazas)
+        precio = Room.normalize('precio', precio)
+        equipamiento = Room.normalize('equipamiento', equipamiento)
+        reservas = Room.normalize('reservas', reservas)
+
         # Inicialiación de los atributos del objeto.
         self.id = Room.assign_id(target_id)
+        self.plazas = plazas
+        self.precio = precio
 
-        if int(plazas) < 0:
-            raise ValueError('Plazas debe ser un valor positivo.')
-        else:
-            self.plazas = plazas
+        self.equipamiento = equipamiento
+        self.disponible = disponible
+        self.version = version
+        self.reservas = reservas
 
-        if int(precio) < 0:
-            raise ValueError('Precio debe ser un valor positivo.')
-        else:
-            self.precio = precio
+    @classmethod
+    def from_dict(cls, data):
+        """ Reconstruye una habitación persistida cuyo ID ya está asignado.
 
-        self.equipamiento = equipamiento.copy()
-        self.disponible = disponible
+        A diferencia del constructor no reserva el ID en el asignador.
+
+        :param data: Diccionario de la habitación, ver to_dict().
+        :returns: Habitación."""
+
+        room = cls.__new__(cls)
+        room.id = data['id']
+        room.plazas = Room.normalize('plazas', data['plazas'])
+        room.precio = Room.normalize('precio', data['precio'])
+        room.equipamiento = Room.normalize('equipamiento', data['equipamiento'])
+        room.disponible = data['disponible']
+        room.version = data.get('version', 0)
+        room.reservas = Room.normalize('reservas', data.get('reservas', ()))
+        return room
+
+    def elementos(self):
+        """ Devuelve el equipamiento decodificado, en orden de inserción. """
+
+        return Room.catalogo.decodificar(self.equipamiento)
+
+    def to_dict(self):
+        """ Devuelve el diccionario serializable de la habitación. """
+
+        return {'id': self.id, 'plazas': self.plazas, 'precio': self.precio,
+                'equipamiento': list(self.elementos()), 'disponible': self.disponible, 'version': self.version,
+                'reservas': calendario.serializar(self.reservas)}
+
+    def to_json(self):
+        """ Devuelve la habitación serializada en JSON. """
+
+        return dumps(self.to_dict())
 
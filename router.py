@@ -0,0 +1,433 @@
+from bottle import Bottle, HTTPResponse, request, response, run
+from concurrent.futures import ThreadPoolExecutor
+from json import dumps
+from os import makedirs, path
+from signal import SIGINT
+import argparse
+import itertools
+import logging
+import subprocess
+import sys
+import time
+
+import requests
+
+from estadisticas import Estadisticas
+import servidor_hilos
+import storage as almacenamiento
+
+""" Despliegue particionado del servicio de habitaciones
+
+Se lanzan N procesos servidor.py, cada uno dueño de un rango contiguo
+de IDs [i·R + 1, (i + 1)·R], con su propio directorio de datos, y un
+enrutador delante que reenvía las rutas /<target_id>/... al proceso
+dueño del ID y reparte entre todos los listados, totales y búsquedas,
+combinando sus resultados. Como los rangos son contiguos y crecientes,
+concatenar los resultados de las particiones en orden mantiene el
+orden por ID de los listados.
+
+    python router.py --shards 4 --puerto 8080
+"""
+
+SERVIDOR = path.join(path.dirname(path.abspath(__file__)), 'servidor.py')
+ROUTER = path.abspath(__file__)
+
+""" Cabeceras que se trasladan entre el cliente y las particiones """
+CABECERAS_PETICION = ('Content-Type', 'If-None-Match')
+CABECERAS_RESPUESTA = ('Content-Type', 'ETag', 'X-Next-Cursor')
+
+""" Cabeceras de las peticiones condicionales, solo se trasladan a la partición dueña de una habitación """
+CABECERAS_CONDICIONALES = ('If-None-Match',)
+
+
+def rango_shard(indice, tam_rango):
+    """ :returns: Rango 'INICIO:FIN' de IDs de la partición indicada. """
+
+    return f'{indice * tam_rango + 1}:{(indice + 1) * tam_rango}'
+
+
+def lanzar_servidor(puerto, directorio, argumentos=(), host='localhost', espera=30, script=SERVIDOR):
+    """ Lanza servidor.py en otro proceso y espera a que responda.
+
+    La salida del servidor se guarda en {directorio}/servidor.log. El
+    servidor se lanza en su propia sesión para que un Ctrl-C en la
+    terminal no le llegue dos veces, solo lo detiene detener_servidor.
+
+    :param puerto: Puerto del servidor.
+    :param directorio: Directorio de datos, se crea si no existe.
+    :param argumentos: Argumentos adicionales de servidor.py.
+    :param host: Dirección del servidor.
+    :param espera: Segundos máximos de espera.
+    :param script: Script que se lanza, servidor.py o router.py.
+    :returns: Proceso del servidor.
+    :raises RuntimeError: Si el servidor no llega a responder."""
+
+    makedirs(directorio, exist_ok=True)
+    with open(path.join(directorio, 'servidor.log'), 'ab') as log:
+        proceso = subprocess.Popen([sys.executable, script, '--host', host, '--puerto', str(puerto),
+                                    '--directorio', directorio, *argumentos], stdout=log, stderr=log,
+                                   start_new_session=True)
+
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f'El servidor del puerto {puerto} ha terminado al arrancar, ver {directorio}.')
+        try:
+            requests.get(f'http://{host}:{puerto}/ocupadas/total', timeout=1)
+            return proceso
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    detener_servidor(proceso)
+    raise RuntimeError(f'El servidor del puerto {puerto} no responde tras {espera}s.')
+
+
+def detener_servidor(proceso, espera=30):
+    """ Detiene un servidor lanzado con lanzar_servidor.
+
+    Se envía SIGINT para que escriba la instantánea y cierre el
+    almacenamiento antes de terminar. Se repite cada segundo, el
+    servidor wsgiref descarta la interrupción si le llega mientras
+    atiende una petición; una vez recibida el servidor ignora las
+    siguientes hasta cerrar el almacenamiento.
+
+    :param proceso: Proceso del servidor.
+    :param espera: Segundos máximos de espera antes de matarlo."""
+
+    limite = time.monotonic() + espera
+    while proceso.poll() is None and time.monotonic() < limite:
+        proceso.send_signal(SIGINT)
+        try:
+            proceso.wait(min(1, max(0, limite - time.monotonic())))
+        except subprocess.TimeoutExpired:
+            pass
+    if proceso.poll() is None:
+        proceso.kill()
+        proceso.wait()
+
+
+class Router:
+    """ Enrutador entre las particiones del servicio
+
+    :param shards: URLs base de las particiones, en orden de rango.
+    :param tam_rango: Número de IDs del rango de cada partición."""
+
+    def __init__(self, shards, tam_rango):
+        self.shards = shards
+        self.tam_rango = tam_rango
+        self.app = Bottle()
+        self._session = requests.Session()
+        self._session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=64))
+        self._executor = ThreadPoolExecutor(max_workers=max(4, len(shards)), thread_name_prefix='router')
+        self._turno = itertools.count()
+        self._rutas()
+
+    def owner(self, target_id):
+        """ Devuelve la partición dueña de un ID.
+
+        :param target_id: Identificador único de la habitación.
+        :returns: Índice de la partición, None si el ID no pertenece a ninguna."""
+
+        if target_id < 1:
+            return None
+        indice = (target_id - 1) // self.tam_rango
+        return indice if indice < len(self.shards) else None
+
+    @staticmethod
+    def _cabeceras(condicionales=False):
+        """ Cabeceras de la petición que se trasladan a las particiones.
+
+        Las condicionales solo se trasladan a la partición dueña de una
+        habitación: en un listado combinado una partición respondería
+        304 por su parte aunque el resultado combinado haya cambiado.
+
+        :param condicionales: True para incluir If-None-Match."""
+
+        # La petición de Bottle es local al hilo, se lee antes de repartir el trabajo.
+        return {cabecera: request.headers[cabecera] for cabecera in CABECERAS_PETICION
+                if cabecera in request.headers and (condicionales or cabecera not in CABECERAS_CONDICIONALES)}
+
+    def _peticion(self, indice, metodo, ruta, query='', cuerpo=None, stream=False, cabeceras=None):
+        url = self.shards[indice] + ruta + ('?' + query if query else '')
+        if cabeceras is None:
+            cabeceras = self._cabeceras()
+        return self._session.request(metodo, url, data=cuerpo, headers=cabeceras, stream=stream)
+
+    @staticmethod
+    def _respuesta(r):
+        cabeceras = {cabecera: r.headers[cabecera] for cabecera in CABECERAS_RESPUESTA if cabecera in r.headers}
+        return HTTPResponse(body=r.content, status=r.status_code, headers=cabeceras)
+
+    def _todas(self, metodo, ruta, query='', cuerpo=None):
+        """ Envía la misma petición a todas las particiones en paralelo. """
+
+        cabeceras = self._cabeceras()
+        return list(self._executor.map(lambda indice: self._peticion(indice, metodo, ruta, query, cuerpo,
+                                                                     cabeceras=cabeceras),
+                                       range(len(self.shards))))
+
+    def reenviar(self, target_id, resto=''):
+        """ Reenvía una petición sobre una habitación a su partición. """
+
+        indice = self.owner(target_id)
+        if indice is None:
+            response.status = 404
+            response.content_type = "application/json"
+            return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
+        ruta = f'/{target_id}' + (f'/{resto}' if resto else '')
+        return self._respuesta(self._peticion(indice, request.method, ruta, request.query_string,
+                                              request.body.read(), cabeceras=self._cabeceras(condicionales=True)))
+
+    def alta(self, ruta):
+        """ Envía un alta a las particiones por turnos.
+
+        Si una partición no tiene IDs libres (503) se prueba la siguiente."""
+
+        cuerpo = request.body.read()
+        inicio = next(self._turno)
+        for desplazamiento in range(len(self.shards)):
+            r = self._peticion((inicio + desplazamiento) % len(self.shards), 'POST', ruta, cuerpo=cuerpo)
+            if r.status_code != 503:
+                break
+        return self._respuesta(r)
+
+    def listado(self, ruta):
+        """ Combina un listado de todas las particiones.
+
+        Sin paginación se piden todas en paralelo. Con limit o formato
+        NDJSON se recorren en orden a partir de la partición dueña del
+        cursor, pidiendo a cada una lo que falta para completar."""
+
+        limit = request.query.get('limit')
+        after = request.query.get('after')
+        ndjson = request.query.formato == 'ndjson'
+        if limit is None and not ndjson:
+            return self._combinar(self._todas('GET', ruta, request.query_string), ruta == '/')
+
+        try:
+            limit = None if limit is None else int(limit)
+            after = None if after is None else int(after)
+            if limit is not None and limit < 1:
+                raise ValueError
+        except ValueError:
+            # La validación y el mensaje de error son los de la partición.
+            return self._respuesta(self._peticion(0, 'GET', ruta, request.query_string))
+
+        # Como en una sola partición, un cursor negativo empieza desde el principio.
+        primera = 0 if after is None or after < 0 else self.owner(after + 1)
+        primera = len(self.shards) if primera is None else primera
+        if ndjson:
+            response.content_type = "application/x-ndjson"
+            return self._ndjson(ruta, primera, after, limit, self._cabeceras())
+
+        pagina = {}
+        for indice in range(primera, len(self.shards)):
+            query = {'limit': limit - len(pagina) + 1}
+            if after is not None:
+                query['after'] = after
+            r = self._peticion(indice, 'GET', ruta, requests.compat.urlencode(query))
+            if r.status_code == 200:
+                pagina.update(r.json())
+            if len(pagina) > limit:
+                break
+
+        response.content_type = "application/json"
+        claves = list(pagina)
+        if len(claves) > limit:
+            response.set_header('X-Next-Cursor', claves[limit - 1])
+        return dumps({clave: pagina[clave] for clave in claves[:limit]})
+
+    def _ndjson(self, ruta, primera, after, limit, cabeceras):
+        restantes = limit
+        for indice in range(primera, len(self.shards)):
+            query = {'formato': 'ndjson'}
+            if after is not None:
+                query['after'] = after
+            if restantes is not None:
+                query['limit'] = restantes
+            r = self._peticion(indice, 'GET', ruta, requests.compat.urlencode(query), stream=True,
+                               cabeceras=cabeceras)
+            if r.status_code != 200:
+                continue
+            for linea in r.iter_lines():
+                if linea:
+                    yield linea + b'\n'
+                    if restantes is not None:
+                        restantes -= 1
+            if restantes is not None and restantes <= 0:
+                break
+
+    @staticmethod
+    def _combinar(respuestas, vacio_204=False):
+        """ Une los listados en JSON de todas las particiones. """
+
+        combinado = {}
+        for r in respuestas:
+            if r.status_code == 200:
+                combinado.update(r.json())
+            elif r.status_code != 204:
+                return Router._respuesta(r)
+        response.content_type = "application/json"
+        if vacio_204 and len(combinado) == 0:
+            response.status = 204
+            return ''
+        return dumps(combinado)
+
+    def total(self, ruta):
+        """ Suma los totales de todas las particiones. """
+
+        response.content_type = "application/json"
+        return dumps({'total': sum(r.json()['total'] for r in self._todas('GET', ruta))})
+
+    def estadisticas(self):
+        """ Combina las estadísticas de todas las particiones.
+
+        Se suman los contadores, los histogramas y las frecuencias, el
+        precio medio se pondera por las habitaciones de cada partición."""
+
+        partes = []
+        for r in self._todas('GET', '/estadisticas'):
+            if r.status_code != 200:
+                return self._respuesta(r)
+            partes.append(r.json())
+
+        limites = tuple(intervalo['desde'] for intervalo in partes[0]['histograma_precio'][1:])
+        equipamiento = {}
+        for parte in partes:
+            for elemento, total in parte['equipamiento'].items():
+                equipamiento[elemento] = equipamiento.get(elemento, 0) + total
+        precios = [parte['precio'] for parte in partes if parte['habitaciones']]
+        agregados = {
+            'habitaciones': sum(parte['habitaciones'] for parte in partes),
+            'disponibles': sum(parte['disponibles'] for parte in partes),
+            'plazas': sum(parte['plazas']['total'] for parte in partes),
+            'plazas_disponibles': sum(parte['plazas']['disponibles'] for parte in partes),
+            'suma_precio': sum(parte['precio']['medio'] * parte['habitaciones'] for parte in partes
+                               if parte['habitaciones']),
+            'histograma': [sum(intervalos) for intervalos in
+                           zip(*([intervalo['habitaciones'] for intervalo in parte['histograma_precio']]
+                                 for parte in partes))],
+        }
+        response.content_type = "application/json"
+        return dumps(Estadisticas.desde(agregados, limites).to_dict(
+            min((precio['minimo'] for precio in precios), default=None),
+            max((precio['maximo'] for precio in precios), default=None), equipamiento))
+
+    def lote(self, clave, ruta, identificador):
+        """ Reparte un lote de cambios entre las particiones dueñas.
+
+        Cada partición valida y aplica su parte del lote de forma
+        atómica, pero no hay atomicidad entre particiones. Si una
+        partición rechaza el lote entero, sin errores por elemento, se
+        devuelve su respuesta.
+
+        :param clave: Campo del JSON con la lista de elementos.
+        :param ruta: Ruta de lotes de las particiones.
+        :param identificador: Función que devuelve el ID de cada elemento."""
+
+        data = request.json
+        if not isinstance(data, dict) or not isinstance(data.get(clave), list):
+            return self._respuesta(self._peticion(0, 'PUT', ruta, cuerpo=request.body.read()))
+
+        partes = {}
+        errores = []
+        for indice, elemento in enumerate(data[clave]):
+            target_id = identificador(elemento)
+            shard = self.owner(target_id) if type(target_id) is int else None
+            if shard is None:
+                errores.append({"indice": indice, "id": target_id, "status": 404,
+                                "error_description": f"La habitación {target_id} no está registrada en el sistema."})
+            else:
+                partes.setdefault(shard, []).append((indice, elemento))
+
+        cabeceras = self._cabeceras()
+
+        def enviar(shard):
+            cuerpo = dict(data)
+            cuerpo[clave] = [elemento for _, elemento in partes[shard]]
+            return shard, self._peticion(shard, 'PUT', ruta, cuerpo=dumps(cuerpo), cabeceras=cabeceras)
+
+        resultados = []
+        for shard, r in self._executor.map(enviar, list(partes)):
+            try:
+                contenido = r.json()
+            except ValueError:
+                contenido = None
+            if r.status_code != 200 and not (isinstance(contenido, dict) and 'errores' in contenido):
+                # Lote rechazado entero, por ejemplo por un campo común no válido: se devuelve su error.
+                return self._respuesta(r)
+            originales = [indice for indice, _ in partes[shard]]
+            for resultado in contenido.get('resultados', []) + contenido.get('errores', []):
+                resultado['indice'] = originales[resultado['indice']]
+            resultados += contenido.get('resultados', [])
+            errores += contenido.get('errores', [])
+
+        response.content_type = "application/json"
+        if errores:
+            response.status = 400
+            return dumps({"error_description": "Parte del lote no es válido, solo se han aplicado los cambios"
+                                               " de resultados.",
+                          "resultados": sorted(resultados, key=lambda r: r['indice']),
+                          "errores": sorted(errores, key=lambda r: r['indice'])})
+        return dumps({"resultados": sorted(resultados, key=lambda r: r['indice'])})
+
+    def _rutas(self):
+        app = self.app
+        app.route('/', 'GET', lambda: self.listado('/'))
+        app.route('/', 'POST', lambda: self.alta('/'))
+        for ruta in ('/ocupadas', '/disponibles'):
+            app.route(ruta, 'GET', lambda ruta=ruta: self.listado(ruta))
+        app.route('/buscar', 'GET', lambda: self._combinar(self._todas('GET', '/buscar', request.query_string)))
+        app.route('/estadisticas', 'GET', self.estadisticas)
+        app.route('/libres', 'GET', lambda: self._combinar(self._todas('GET', '/libres', request.query_string)))
+        for ruta in ('/ocupadas/total', '/disponibles/total'):
+            app.route(ruta, 'GET', lambda ruta=ruta: self.total(ruta))
+        app.route('/lote', 'POST', lambda: self.alta('/lote'))
+        app.route('/lote', 'PUT', lambda: self.lote(
+            'cambios', '/lote', lambda elemento: elemento.get('id') if isinstance(elemento, dict) else None))
+        app.route('/lote/disponibilidad', 'PUT', lambda: self.lote('ids', '/lote/disponibilidad', lambda i: i))
+        app.route('/<target_id:int>', ['GET', 'PUT', 'DELETE'], self.reenviar)
+        app.route('/<target_id:int>/<resto:path>', ['GET', 'POST', 'PUT', 'DELETE'], self.reenviar)
+
+    def close(self):
+        self._executor.shutdown()
+        self._session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Enrutador de un despliegue particionado del servicio.',
+                                     epilog='Los argumentos no reconocidos se pasan a cada servidor.py.')
+    parser.add_argument('--shards', type=int, default=2, help='Número de particiones.')
+    parser.add_argument('--host', default='localhost', help='Dirección en la que escucha el enrutador.')
+    parser.add_argument('--puerto', type=int, default=8080, help='Puerto del enrutador.')
+    parser.add_argument('--puerto-base', type=int, default=8081,
+                        help='Puerto de la primera partición, las siguientes usan los consecutivos.')
+    parser.add_argument('--directorio', default='ArchivosServidor/',
+                        help='Directorio base, cada partición usa el subdirectorio shardN/.')
+    parser.add_argument('--tam-rango', type=int, default=10 ** 8, help='Número de IDs de cada partición.')
+    parser.add_argument('--workers', type=int, default=16, help='Hilos que atienden peticiones en el enrutador.')
+    args, argumentos_shard = parser.parse_known_args()
+    motor = argparse.ArgumentParser(add_help=False)
+    motor.add_argument('--almacenamiento', default=almacenamiento.MOTOR_DIARIO)
+    if motor.parse_known_args(argumentos_shard)[0].almacenamiento == almacenamiento.MOTOR_MMAP \
+            and args.shards * args.tam_rango > almacenamiento.MmapStorage.ID_MAXIMO:
+        parser.error(f'Con mmap los IDs no pueden superar {almacenamiento.MmapStorage.ID_MAXIMO},'
+                     f' --shards por --tam-rango es {args.shards * args.tam_rango}.')
+
+    logging.basicConfig(level=logging.INFO)
+    procesos = []
+    try:
+        urls = []
+        for indice in range(args.shards):
+            puerto = args.puerto_base + indice
+            directorio = path.join(args.directorio, f'shard{indice}')
+            rango = rango_shard(indice, args.tam_rango)
+            procesos.append(lanzar_servidor(puerto, directorio, ['--rango-ids', rango, *argumentos_shard]))
+            urls.append(f'http://localhost:{puerto}')
+            logging.info(f'Partición {indice}: puerto {puerto}, IDs {rango}, {directorio}')
+
+        router = Router(urls, args.tam_rango)
+        run(router.app, host=args.host, port=args.puerto,
+            server_class=servidor_hilos.servidor_con_hilos(args.workers))
+    finally:
+        for proceso in procesos:
+            detener_servidor(proceso)
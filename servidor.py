@@ -1,16 +1,54 @@
-from bottle import run, request, response, delete, get, post, put
-from json import dumps, load
-from room import Room
-from os import remove, path, mkdir, listdir
+from bottle import install, run, request, response, delete, get, post, put
+from functools import wraps
+from json import dumps
+from allocator import IdAllocator
+from estadisticas import Estadisticas
+from fragmentos import Fragmentos
+from metricas import CONTENT_TYPE, Metricas
+from perfilado import ORDENES, Perfilador
+from room import PLAZAS_MAXIMO, Room
+from registry import Registry
+from os import mkdir
+import reservas as calendario
+import storage as almacenamiento
+import servidor_hilos
+import argparse
 import logging
+import signal
+import threading
+import time
 
 """ Listado de todas las habitaciones registradas """
-registry = {}
+registry = Registry()
+
+""" Motor de almacenamiento, se configura al iniciar el servicio """
+storage = None
+consultas = None  # Motor que resuelve listados y búsquedas si las habitaciones no se cargan al arrancar.
+
+""" Segundos que GET /cambios espera nuevos cambios como máximo, 0 con el servidor simple """
+espera_cambios = 30
+
+""" Peticiones a GET /cambios que pueden esperar a la vez, cada una ocupa un hilo del servidor """
+esperas_cambios = threading.BoundedSemaphore(2)
+
+""" JSON de cada habitación, se rehace solo cuando la habitación cambia """
+fragmentos = Fragmentos()
+
+""" Métricas de las rutas y de la persistencia, ver GET /metrics """
+metricas = Metricas()
+install(metricas)
+
+""" Perfilado de peticiones, desactivado hasta configurarlo, ver /debug/profile """
+perfilador = Perfilador()
+install(perfilador)
 
 
 def habitaciones_ocupadas(serializar=False):
     """ Devuelve la lista de las habitaciones ocupadas
 
+    Se recorre el índice de habitaciones ocupadas del registro,
+    el coste depende del número de habitaciones devueltas.
+
     :param serializar: Si es True devolverá los diccionarios
     de los objetos para que puedan ser serializados para su
     transmisión.
@@ -19,12 +57,11 @@ def habitaciones_ocupadas(serializar=False):
 
     ocupadas = {}
 
-    for key in registry:
-        if not registry[key].disponible:
-            if serializar:
-                ocupadas[key] = registry[key].__dict__
-            else:
-                ocupadas[key] = registry[key]
+    for habitacion in registry.ocupadas():
+        if serializar:
+            ocupadas[habitacion.id] = habitacion.to_dict()
+        else:
+            ocupadas[habitacion.id] = habitacion
 
     return ocupadas
 
@@ -32,6 +69,9 @@ def habitaciones_ocupadas(serializar=False):
 def habitaciones_disponibles(serializar=False):
     """ Devuelve la lista de las habitaciones disponibles
 
+    Se recorre el índice de habitaciones disponibles del registro,
+    el coste depende del número de habitaciones devueltas.
+
     :param serializar: Si es True devolverá los diccionarios
     de los objetos para que puedan ser serializados para su
     transmisión.
@@ -40,42 +80,223 @@ def habitaciones_disponibles(serializar=False):
 
     disponibles = {}
 
-    for key in registry:
-        if registry[key].disponible:
-            if serializar:
-                disponibles[key] = registry[key].__dict__
-            else:
-                disponibles[key] = registry[key]
+    for habitacion in registry.disponibles():
+        if serializar:
+            disponibles[habitacion.id] = habitacion.to_dict()
+        else:
+            disponibles[habitacion.id] = habitacion
 
     return disponibles
 
 
+def no_modificado(version):
+    """ Fija la cabecera ETag y comprueba If-None-Match.
+
+    Debe llamarse antes de serializar la respuesta, si el cliente ya
+    tiene esa versión se responde 304 sin cuerpo.
+
+    :param version: Valor de la versión que identifica la respuesta.
+    :returns: True si el cliente ya tiene la versión actual."""
+
+    etag = f'"{version}"'
+    response.set_header('ETag', etag)
+    cabecera = request.headers.get('If-None-Match')
+    if cabecera is None:
+        return False
+
+    etiquetas = [etiqueta.strip() for etiqueta in cabecera.split(',')]
+    if '*' in etiquetas or etag in etiquetas or 'W/' + etag in etiquetas:
+        response.status = 304
+        return True
+    return False
+
+
+def indice(disponible=None):
+    """ Devuelve los IDs ordenados que se recorren en un listado.
+
+    Sin precarga se consultan al motor de almacenamiento, si no se
+    usan los conjuntos del registro.
+
+    :param disponible: Disponibilidad, None para todas las habitaciones.
+    :returns: Conjunto ordenado de IDs, con len() y after()."""
+
+    if consultas is not None:
+        return consultas.ids(disponible)
+    if disponible is None:
+        return registry.ids
+    return registry.available_ids if disponible else registry.occupied_ids
+
+
+def serializadas(ids):
+    """ Devuelve las habitaciones de una lista de IDs serializadas en JSON.
+
+    Las habitaciones del registro se toman de la caché de fragmentos,
+    sin precarga se serializan las filas devueltas por el motor.
+
+    :param ids: Identificadores de las habitaciones.
+    :returns: Pares (ID, JSON) de las habitaciones que existen, en orden."""
+
+    if consultas is not None:
+        return ((data['id'], dumps(data)) for data in consultas.habitaciones(ids))
+    return ((habitacion.id, fragmentos.json(habitacion)) for habitacion in registry.existing(ids))
+
+
+def objeto_json(serializadas):
+    """ Concatena fragmentos en un objeto JSON indexado por ID.
+
+    El resultado es idéntico a dumps() de un diccionario {id: habitación}.
+
+    :param serializadas: Pares (ID, JSON), ver serializadas().
+    :returns: Objeto JSON."""
+
+    return '{' + ', '.join(f'"{target_id}": {texto}' for target_id, texto in serializadas) + '}'
+
+
+""" IDs por bloque al emitir un listado en streaming """
+PAGINA_STREAMING = 1000
+
+
+def _ndjson(ids, after, limit):
+    """ Genera el listado de habitaciones en NDJSON, una por línea.
+
+    Se recorren los IDs por bloques a partir del cursor, nunca se
+    mantiene en memoria el cuerpo completo de la respuesta."""
+
+    restantes = limit
+    while restantes is None or restantes > 0:
+        bloque = ids.after(after, PAGINA_STREAMING if restantes is None else min(PAGINA_STREAMING, restantes))
+        if len(bloque) == 0:
+            break
+        for _, texto in serializadas(bloque):
+            yield texto + '\n'
+        after = bloque[-1]
+        if restantes is not None:
+            restantes -= len(bloque)
+
+
+def listado(ids):
+    """ Construye la respuesta de un listado de habitaciones.
+
+    Admite por QUERY VARIABLE paginación por cursor en orden de ID,
+
+        .../?limit=50&after=120
+
+    devolviendo en la cabecera X-Next-Cursor el valor de after para la
+    página siguiente si quedan habitaciones, y el formato NDJSON en
+    streaming con formato=ndjson. Sin parámetros devuelve el listado
+    completo como hasta ahora.
+
+    La ETag es la generación del registro, con If-None-Match se
+    responde 304 si no ha habido cambios.
+
+    :param ids: Conjunto ordenado de IDs a listar.
+    :returns: Cuerpo de la respuesta. Si limit o after no son
+    válidos HTTPResponse 400"""
+
+    try:
+        limit = request.query.get('limit')
+        limit = None if limit is None else int(limit)
+        after = request.query.get('after')
+        after = None if after is None else int(after)
+        if limit is not None and limit < 1:
+            raise ValueError
+    except ValueError:
+        response.status = 400
+        response.content_type = "application/json"
+        return dumps({"error_description": "Los parámetros limit y after tienen que ser enteros, limit mayor que 0."})
+
+    if no_modificado(f'g{registry.generation}'):
+        return ''
+
+    if request.query.formato == 'ndjson':
+        response.content_type = "application/x-ndjson"
+        return _ndjson(ids, after, limit)
+
+    response.content_type = "application/json"
+    pagina = ids.after(after, None if limit is None else limit + 1)
+    if limit is not None and len(pagina) > limit:
+        pagina = pagina[:limit]
+        response.set_header('X-Next-Cursor', str(pagina[-1]))
+
+    return objeto_json(serializadas(pagina))
+
+
 def update(target_id):
     """ Hace persistente cualquier modificación en una habitación.
 
-    Se busca la habitación por su ID en el registro, si no encuentra
-    ninguna habitación busca en los fichero y elimina su fichero.
-    Si existe y los datos son diferentes, sobreescribe el fichero, si
-    existe en el registro pero no en los ficheros genera uno nuevo.
+    Se busca la habitación por su ID entre las que están en memoria,
+    sin cargarla del almacenamiento, si no encuentra ninguna habitación
+    la elimina del almacenamiento, anotando la generación del registro
+    para que no retroceda al reiniciar. Si existe se delega en el motor
+    de almacenamiento configurado, que
+    omite la escritura si el estado no ha cambiado desde la última. Se
+    serializa y escribe bajo el cerrojo de la habitación para que las
+    escrituras concurrentes lleguen al almacenamiento en orden.
+
+    La duración de la lectura, la serialización y la escritura (que
+    incluye la comparación con el último estado escrito) se anota en
+    las métricas.
 
     :param target_id: Identificador único de la habitación."""
 
-    url = f'ArchivosServidor/Habitacion{target_id}.json'
-    try:
-        target = registry[target_id]
-        with open(url, 'r') as file:
-            target_data = load(file)
-        if target_data is None or not dumps(target_data) == target.__dict__:
-            with open(url, 'w') as file:
-                file.write(dumps(target.__dict__))
+    with registry.room_lock(target_id):
+        try:
+            with metricas.paso('lectura'):
+                target = registry.rooms[target_id]
+        except KeyError:
+            fragmentos.descartar(target_id)
+            with metricas.paso('borrado'):
+                storage.delete(target_id, registry.generation)
+        else:
+            with metricas.paso('serializacion'):
+                data = target.to_dict()
+            with metricas.paso('escritura'):
+                storage.save(data)
 
-    except FileNotFoundError:
-        with open(url, 'w') as file:
-            file.write(dumps(target.__dict__))
 
-    except KeyError:
-        response.status = 404
-        return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
+def eliminar(target_id):
+    """ Elimina una habitación del registro y del almacenamiento.
+
+    Se mantiene `registry.lock` hasta borrarla del almacenamiento: sin
+    precarga, un acceso concurrente por ID la volvería a cargar si aún
+    estuviera en él. El ID se libera al final, una vez borrada, para
+    que un alta no lo reutilice antes.
+
+    :param target_id: Identificador único de la habitación.
+    :raises KeyError: Si la habitación no está en memoria."""
+
+    with registry.room_lock(target_id), registry.lock:
+        registry.remove(target_id)
+        fragmentos.descartar(target_id)
+        with metricas.paso('borrado'):
+            storage.delete(target_id, registry.generation)
+    Room.release_id(target_id)
+
+
+def cargar_habitacion(target_id):
+    """ Carga una habitación de las consultas, sin precarga.
+
+    :param target_id: Identificador único de la habitación.
+    :returns: Habitación, None si no existe."""
+
+    data = consultas.get(target_id)
+    return None if data is None else Room.from_dict(data)
+
+
+def por_habitacion(handler):
+    """ Serializa las peticiones que modifican una misma habitación.
+
+    Decorador de las rutas con parámetro target_id: el handler se
+    ejecuta con el cerrojo de la habitación, de modo que la lectura,
+    la modificación y la persistencia no se entrelazan con las de
+    otra petición sobre la misma habitación."""
+
+    @wraps(handler)
+    def wrapper(target_id, **parametros):
+        with registry.room_lock(target_id):
+            return handler(target_id, **parametros)
+
+    return wrapper
 
 
 @post('/')
@@ -87,19 +308,20 @@ def alta_habitacion():
     y el precio por noche de la habitacion.
 
     :returns: Si crea la habitacion response code 200,
-    si no response code 400
+    si no response code 400, o 503 si no quedan IDs libres
     """
 
     data = request.json
 
     try:
         target = Room(data['plazas'], data['equipamiento'], data['precio'])
-        registry[target.id] = target
-        update(target.id)
+        with registry.room_lock(target.id):
+            registry.add(target)
+            update(target.id)
 
         response.status = 201
         response.content_type = "application/json"
-        return dumps(target.__dict__)
+        return fragmentos.json(target)
 
     except KeyError:
         response.status = 400
@@ -109,8 +331,14 @@ def alta_habitacion():
         response.status = 400
         return 'Los campos plazas y precio tienen que ser positivos.'
 
+    except IndexError as e:
+        response.status = 503
+        response.content_type = "application/json"
+        return dumps({"error_description": str(e)})
+
 
 @delete('/<target_id:int>')
+@por_habitacion
 def borrar_habitacion(target_id):
     """
     Selecciona la habitación correspondiente  con la variable target_id
@@ -133,19 +361,13 @@ def borrar_habitacion(target_id):
             return dumps({"error_description": f"La habitación {target_id} está ocupada, no se permiten"
                                                f" modificaciones."})
         else:
-            del registry[target_id]
-            remove(f'ArchivosServidor/Habitacion{target_id}.json')
+            eliminar(target.id)
             return 'True'
 
     except KeyError:
         response.status = 404
         return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
 
-    except FileNotFoundError:
-        response.status = 200
-        return f'La habitación {target_id} no se encontraba en los ficheros del sistema, ha sido eliminada' \
-               f' del registro.'
-
 
 @get('/<target_id:int>/disponibilidad')
 def get_disponibilidad(target_id):
@@ -153,8 +375,9 @@ def get_disponibilidad(target_id):
 
     @:returns: True si está disponible, False caso contrario"""
 
+    response.content_type = "application/json"
     try:
-        return registry[int(target_id)].disponible
+        return dumps(registry[int(target_id)].disponible)
     except KeyError:
         response.status = 404
         return dumps({"error_description": f"La habitación {target_id} está ocupada, no se permiten"
@@ -162,6 +385,7 @@ def get_disponibilidad(target_id):
 
 
 @put('/<target_id:int>/disponibilidad')
+@por_habitacion
 def modificar_disponibilidad(target_id):
     """ Ocupa una habitación por su id.
 
@@ -183,12 +407,10 @@ def modificar_disponibilidad(target_id):
     try:
         target = registry[int(target_id)]
         if request.query.disponible in ("true", "True", "TRUE"):
-            if not target.disponible:
-                target.disponible = True
+            registry.modify(target.id, disponible=True)
 
         elif request.query.disponible in ("false", "False", "FALSE"):
-            if target.disponible:
-                target.disponible = False
+            registry.modify(target.id, disponible=False)
 
         else:
             response.status = 400
@@ -206,12 +428,18 @@ def modificar_disponibilidad(target_id):
 def get_habitacion(target_id):
     """ Obtiene una habitación por su id.
 
+    La ETag es el ID y la versión de la habitación, con If-None-Match
+    se responde 304 si no ha cambiado.
+
     :param target_id: identificador único de la habitación
     :returns:Si existe, objeto por JSON (Response code 200), si no response code 404
     """
     response.content_type = "application/json"
     try:
-        return dumps(registry[int(target_id)].__dict__)
+        target = registry[int(target_id)]
+        if no_modificado(f'{target.id}-{target.version}'):
+            return ''
+        return fragmentos.json(target)
 
     except KeyError:
         response.status = 404
@@ -222,38 +450,358 @@ def get_habitacion(target_id):
 def get_all():
     """ Devuelve un listado con todas las habitaciones.
 
+    Admite paginación y streaming, ver listado().
+
     :returns: Listado de todas las habitaciones registradas en el sistema.
     Si no existe ninguna response code 204
     """
 
     response.content_type = "application/json"
-    if len(registry) == 0:
+    if len(indice()) == 0:
         response.status = 204
     else:
-        json_registry = {}
-        for key in registry:
-            json_registry[key] = registry[key].__dict__
-        return dumps(json_registry)
+        return listado(indice())
 
 
 @get('/ocupadas')
 def get_ocupadas():
     """Obtiene un listado de todas las habitaciones ocupadas
 
+    Admite paginación y streaming, ver listado().
+
     :returns Listado de habitacones ocupadas en JSON"""
 
+    return listado(indice(False))
+
+
+@get('/ocupadas/total')
+def get_total_ocupadas():
+    """Obtiene el número de habitaciones ocupadas en tiempo constante
+
+    :returns Número de habitaciones ocupadas en JSON"""
+
     response.content_type = "application/json"
-    return habitaciones_ocupadas(True)
+    return dumps({'total': len(indice(False))})
 
 
 @get('/disponibles')
 def get_disponibles():
     """ Obtiene un listado de todas las habitaciones ocupadas.
 
+    Admite paginación y streaming, ver listado().
+
     :returns Listado de habitaciones disponibles en JSON"""
 
+    return listado(indice(True))
+
+
+@get('/disponibles/total')
+def get_total_disponibles():
+    """Obtiene el número de habitaciones disponibles en tiempo constante
+
+    :returns Número de habitaciones disponibles en JSON"""
+
+    response.content_type = "application/json"
+    return dumps({'total': len(indice(True))})
+
+
+@get('/estadisticas')
+def get_estadisticas():
+    """Obtiene las estadísticas agregadas del inventario
+
+    Habitaciones, disponibles, ocupadas y tasa de ocupación, plazas
+    totales, disponibles y ocupadas, precio medio, mínimo y máximo,
+    histograma de precios y número de habitaciones con cada elemento
+    de equipamiento. Los agregados se actualizan en cada alta, baja y
+    modificación del registro, la respuesta no depende del número de
+    habitaciones. Sin precarga se calculan en SQL.
+
+    La ETag es la generación del registro, con If-None-Match se
+    responde 304 si no ha habido cambios.
+
+    :returns Estadísticas en JSON"""
+
+    response.content_type = "application/json"
+    if no_modificado(f'g{registry.generation}'):
+        return ''
+
+    if consultas is not None:
+        limites = registry.estadisticas.limites
+        agregados = consultas.agregados(limites)
+        return dumps(Estadisticas.desde(agregados, limites).to_dict(agregados['minimo'], agregados['maximo'],
+                                                                    agregados['equipamiento']))
+    return dumps(registry.resumen())
+
+
+""" Segundos entre comentarios de latido en el flujo de eventos de GET /cambios """
+LATIDO_SSE = 15
+
+
+def _sse(since, duracion, limit):
+    """ Genera el flujo de eventos (text/event-stream) de los cambios.
+
+    Cada cambio es un evento 'cambio' con su secuencia como id, de
+    modo que el navegador reconecta con Last-Event-ID. Si el cursor se
+    ha quedado atrás se envía un evento 'perdidos' antes de continuar
+    con los cambios conservados. El flujo termina a los `duracion`
+    segundos, tras enviar al menos los cambios ya publicados, y el
+    cliente vuelve a conectar. Con `duracion` positiva
+    ocupa una de las esperas_cambios, que se toma antes de crearlo y
+    se libera al terminar o al desconectarse el cliente."""
+
+    try:
+        fin = time.monotonic() + duracion
+        yield 'retry: 1000\n\n'
+        while True:
+            # Los cambios ya publicados se envían aunque no quede tiempo de espera.
+            restante = fin - time.monotonic()
+            eventos, perdidos = registry.cambios.esperar(since, max(0, min(restante, LATIDO_SSE)), limit)
+            if perdidos:
+                yield f'event: perdidos\ndata: {dumps({"secuencia": registry.cambios.secuencia})}\n\n'
+            for evento in eventos:
+                yield f'id: {evento["secuencia"]}\nevent: cambio\ndata: {dumps(evento)}\n\n'
+            if restante <= 0:
+                return
+            if eventos:
+                since = eventos[-1]['secuencia']
+            elif perdidos:
+                since = registry.cambios.secuencia
+            else:
+                yield ': latido\n\n'
+    finally:
+        if duracion > 0:
+            esperas_cambios.release()
+
+
+def _sin_esperas():
+    """ Respuesta de GET /cambios cuando no quedan esperas libres. """
+
+    response.status = 503
+    response.content_type = "application/json"
+    response.set_header('Retry-After', '1')
+    return dumps({"error_description": "Hay demasiados clientes esperando cambios, inténtelo de nuevo más tarde."})
+
+
+@get('/cambios')
+def get_cambios():
+    """Obtiene los cambios de las habitaciones a partir de un cursor
+
+    Cada alta, baja o modificación es un cambio con su secuencia
+    (la generación del registro, la misma de las ETag "g<secuencia>"
+    de los listados), el tipo, el ID, los campos modificados y la
+    disponibilidad resultante. Por QUERY VARIABLE,
+
+        .../cambios?since=120&timeout=25&limit=100
+
+    devuelve los cambios posteriores a since, y si no hay ninguno
+    espera hasta timeout segundos (como máximo espera_cambios) a que
+    se produzca alguno (long-poll). Sin since se esperan los cambios
+    posteriores a la petición. Con formato=sse o la cabecera
+    Accept: text/event-stream responde un flujo de eventos durante
+    timeout segundos, que admite Last-Event-ID como cursor.
+
+    Solo se conservan los últimos cambios, si el cursor es anterior
+    perdidos es true y el cliente debe volver a leer los listados.
+
+    Cada petición que espera ocupa un hilo del servidor, por eso solo
+    esperan a la vez las que admite esperas_cambios, una parte de los
+    hilos. Con todas ocupadas un long-poll responde sin esperar si ya
+    hay cambios, y si no, igual que un flujo de eventos, 503 con
+    Retry-After.
+
+    :returns: Cambios en JSON, con el cursor siguiente y perdidos, o
+    el flujo de eventos. Si algún parámetro no es válido
+    HTTPResponse 400, 503 si no quedan esperas libres."""
+
+    try:
+        since = request.query.get('since') or request.headers.get('Last-Event-ID')
+        since = registry.cambios.secuencia if since is None else int(since)
+        timeout = min(float(request.query.get('timeout', espera_cambios)), espera_cambios)
+        limit = int(request.query.get('limit', 1000))
+        if timeout < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        response.status = 400
+        response.content_type = "application/json"
+        return dumps({"error_description": "since y limit tienen que ser enteros, limit mayor que 0, y timeout"
+                                           " un número de segundos positivo."})
+
+    if request.query.formato == 'sse' or 'text/event-stream' in request.headers.get('Accept', ''):
+        if timeout > 0 and not esperas_cambios.acquire(blocking=False):
+            return _sin_esperas()
+        response.content_type = 'text/event-stream'
+        response.set_header('Cache-Control', 'no-cache')
+        return _sse(since, timeout, limit)
+
+    if timeout > 0 and not esperas_cambios.acquire(blocking=False):
+        eventos, perdidos = registry.cambios.leer(since, limit)
+        if not eventos and not perdidos:
+            return _sin_esperas()
+    else:
+        try:
+            eventos, perdidos = registry.cambios.esperar(since, timeout, limit)
+        finally:
+            if timeout > 0:
+                esperas_cambios.release()
+    response.content_type = "application/json"
+    if eventos:
+        siguiente = eventos[-1]['secuencia']
+    else:
+        siguiente = registry.cambios.secuencia if perdidos else since
+    return dumps({'cambios': eventos, 'siguiente': siguiente, 'perdidos': perdidos})
+
+
+@get('/persistencia')
+def get_persistencia():
+    """Obtiene las métricas del motor de almacenamiento
+
+    Incluye las escrituras realizadas y las omitidas por no cambiar el
+    estado, con escritura diferida también la cola de cambios
+    pendientes y la latencia de los volcados.
+
+    :returns Métricas del almacenamiento en JSON"""
+
+    response.content_type = "application/json"
+    return dumps(storage.stats())
+
+
+@get('/metrics')
+def get_metrics():
+    """Obtiene las métricas del servicio en formato Prometheus
+
+    Peticiones por ruta y estado, histogramas de latencia por ruta y
+    de cada paso de update(), tamaño del registro, habitaciones
+    disponibles y ocupadas, y las métricas de GET /persistencia.
+
+    :returns Métricas en el formato de texto de Prometheus"""
+
+    response.content_type = CONTENT_TYPE
+    return metricas.exportar()
+
+
+@get('/debug/profile')
+def get_perfil():
+    """Obtiene las funciones más costosas de las peticiones perfiladas
+
+    Admite por QUERY VARIABLE el orden (acumulado, propio o llamadas),
+    el número de funciones por ruta y una plantilla de ruta concreta,
+
+        .../debug/profile?orden=propio&limite=10&ruta=/buscar
+
+    :returns Configuración del perfilado y funciones de cada ruta en
+    JSON, si orden o limite no son válidos HTTPResponse 400"""
+
     response.content_type = "application/json"
-    return habitaciones_disponibles(True)
+    orden = request.query.orden or 'acumulado'
+    try:
+        limite = int(request.query.limite or 20)
+        if orden not in ORDENES or limite < 1:
+            raise ValueError
+    except ValueError:
+        response.status = 400
+        return dumps({"error_description": f"El orden tiene que ser uno de {', '.join(ORDENES)} y el límite un "
+                                           f"entero mayor que 0."})
+
+    return dumps({'configuracion': perfilador.configuracion(),
+                  'rutas': perfilador.funciones(orden, limite, request.query.get('ruta'))})
+
+
+@put('/debug/profile')
+def configurar_perfil():
+    """Activa, desactiva o reconfigura el perfilado sin reiniciar
+
+    Por QUERY VARIABLE, los parámetros ausentes no cambian,
+
+        .../debug/profile?activo=true&tasa=0.01&patron=^/buscar
+
+    :returns: Nueva configuración en JSON, si algún valor no es
+    válido HTTPResponse 400"""
+
+    response.content_type = "application/json"
+    activo = None
+    if request.query.activo in ("true", "True", "TRUE"):
+        activo = True
+    elif request.query.activo in ("false", "False", "FALSE"):
+        activo = False
+    elif request.query.get('activo') is not None:
+        response.status = 400
+        return dumps({"error_description": "Activo es un valor boleano."})
+
+    try:
+        tasa = request.query.get('tasa')
+        tasa = None if tasa is None else float(tasa)
+    except ValueError:
+        response.status = 400
+        return dumps({"error_description": "La tasa tiene que ser un número entre 0 y 1."})
+
+    try:
+        perfilador.configurar(activo, tasa, request.query.get('patron'))
+    except ValueError as e:
+        response.status = 400
+        return dumps({"error_description": str(e)})
+
+    return dumps(perfilador.configuracion())
+
+
+@delete('/debug/profile')
+def reiniciar_perfil():
+    """Descarta los resultados del perfilado acumulados
+
+    :returns: HTTPResponse 204"""
+
+    perfilador.reiniciar()
+    response.status = 204
+    return ''
+
+
+metricas.medidor('registro', 'Habitaciones cargadas en memoria.', lambda: len(registry))
+metricas.medidor('estado', 'Habitaciones disponibles y ocupadas.',
+                 lambda: {'disponibles': len(indice(True)), 'ocupadas': len(indice(False))})
+metricas.medidor('generacion', 'Generación del registro, aumenta con cada cambio.', lambda: registry.generation)
+metricas.medidor('catalogo', 'Elementos distintos de equipamiento.', lambda: len(Room.catalogo))
+metricas.medidor('almacenamiento', 'Métricas del motor de almacenamiento, ver GET /persistencia.',
+                 lambda: {} if storage is None else storage.stats())
+
+
+@get('/buscar')
+def buscar():
+    """ Busca habitaciones combinando predicados por QUERY VARIABLE
+
+        .../buscar?plazas_min=3&precio_max=120&equipamiento=wifi&equipamiento=jacuzzi
+
+    Filtros admitidos: precio_min, precio_max, plazas_min, plazas_max,
+    disponible y equipamiento (repetible, deben estar todos). Los
+    rangos se resuelven con los índices ordenados del registro y el
+    equipamiento con su índice invertido, sin precarga con una
+    consulta SQL.
+
+    :returns: Listado de las habitaciones encontradas en JSON. Si algún
+    filtro no es válido HTTPResponse 400"""
+
+    response.content_type = "application/json"
+    filtros = {}
+    try:
+        for campo in ('precio_min', 'precio_max', 'plazas_min', 'plazas_max'):
+            if request.query.get(campo) is not None:
+                filtros[campo] = float(request.query.get(campo))
+    except ValueError:
+        response.status = 400
+        return dumps({"error_description": "Los filtros de precio y plazas tienen que ser numéricos."})
+
+    if request.query.disponible in ("true", "True", "TRUE"):
+        filtros['disponible'] = True
+    elif request.query.disponible in ("false", "False", "FALSE"):
+        filtros['disponible'] = False
+    elif request.query.get('disponible') is not None:
+        response.status = 400
+        return dumps({"error_description": "La dispobilidad es un valor boleano."})
+
+    filtros['equipamiento'] = request.query.getall('equipamiento')
+
+    if no_modificado(f'g{registry.generation}'):
+        return ''
+
+    return objeto_json(serializadas((registry if consultas is None else consultas).search(**filtros)))
 
 
 @get('/<target_id:int>/equipamiento')
@@ -266,7 +814,7 @@ def get_equipamiento(target_id):
 
     response.content_type = "application/json"
     try:
-        return dumps(registry[int(target_id)].equipamiento)
+        return dumps(registry[int(target_id)].elementos())
     except KeyError:
         response.status = 404
         return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
@@ -274,6 +822,7 @@ def get_equipamiento(target_id):
 
 # noinspection PyBroadException
 @put('/<target_id:int>/equipamiento')
+@por_habitacion
 def modificar_equipamiento(target_id):
     """ Sustituye la lista de equipamiento de una
     habitación por la recibida por JSON.
@@ -304,16 +853,21 @@ def modificar_equipamiento(target_id):
             response.status = 400
             return dumps({'error_description': 'El campo equipamiento no se ha encontrado en la petición.'})
         else:
-            target.equipamiento = request.json['equipamiento'].copy()
+            registry.modify(target.id, equipamiento=request.json['equipamiento'])
             update(target_id)
-            return True
+            return fragmentos.json(target)
 
     except KeyError:
         response.status = 404
         return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
 
+    except ValueError as e:
+        response.status = 400
+        return dumps({"error_description": str(e)})
+
 
 @put('/<target_id:int>/equipamiento/add')
+@por_habitacion
 def add_equipamiento(target_id):
     """ Añade el nuevo o nuevos equipamiento a la 
     habitación.
@@ -321,7 +875,8 @@ def add_equipamiento(target_id):
     Se recibe una lista por JSON que debe ser anexionada
     a la ya existente. Comprueba que no se repitan
     elementos, es decir, antes de añadir un nuevo
-    elemento comprueba que no esté ya en la lista.
+    elemento comprueba que no esté ya en el conjunto
+    de códigos de la habitación.
 
     Si no existe se devuelve HTTPResponse con error
     404.
@@ -344,20 +899,24 @@ def add_equipamiento(target_id):
                                                f" modificaciones."})
         else:
             data = request.json['equipamiento']
-            for e in data:
-                if e not in target.equipamiento:
-                    target.equipamiento.append(e)
-
+            equipamiento = Room.catalogo.anadir(target.equipamiento, data)
+            registry.modify(target.id, equipamiento=equipamiento)
             update(target_id)
             response.status = 200
-            return dumps(target.__dict__)
+            return fragmentos.json(target)
 
     except KeyError:
         response.status = 404
         return response
 
+    except ValueError as e:
+        response.status = 400
+        response.content_type = "application/json"
+        return dumps({"error_description": str(e)})
+
 
 @put('/<target_id:int>/equipamiento/eliminar')
+@por_habitacion
 def eliminar_equipamiento(target_id):
     """ Elimina el equipamiento contenido en la lista 
     recibida de la habitación.
@@ -390,19 +949,20 @@ def eliminar_equipamiento(target_id):
                 response.status = 400
                 return '{"error_description":"No se ha encontrado el parámetro equipamiento en la petición"}'
             else:
-                for e in data:
-                    try:
-                        target.equipamiento.remove(e)
-                    except ValueError:
-                        pass
-
+                equipamiento = Room.catalogo.quitar(target.equipamiento, data)
+                registry.modify(target.id, equipamiento=equipamiento)
                 update(target_id)
-                return dumps(target.__dict__)
+                return fragmentos.json(target)
 
     except KeyError:
         response.status = 404
         return '{"error_description": "La habitación no está registrada en el sistema."}'
 
+    except ValueError as e:
+        response.status = 400
+        response.content_type = "application/json"
+        return dumps({"error_description": str(e)})
+
 
 @get('/<target_id:int>/plazas')
 def get_plazas(target_id):
@@ -417,13 +977,14 @@ def get_plazas(target_id):
 
     response.content_type = "application/json"
     try:
-        return registry[int(target_id)].plazas
+        return dumps(registry[int(target_id)].plazas)
     except KeyError:
         response.status = 404
         return '{"error_description": "La habitación no está registrada en el sistema."}'
 
 
 @put('/<target_id:int>/plazas')
+@por_habitacion
 def modificar_plazas(target_id):
     """Modifica el número de plazas de la habitación
 
@@ -437,9 +998,12 @@ def modificar_plazas(target_id):
     Si existe pero esta ocupada devuelve una HTTPResponse
     con error 409
 
+    Si el valor no es un entero positivo devuelve una
+    HTTPResponse con error 400
+
     :param target_id: Identificador único de la habitación.
     :returns: Si funciona HTTPResponse 200 con el nuevo objeto
-    por JSON. Si no HTTPResponse 404 o 409 segun el error.
+    por JSON. Si no HTTPResponse 400, 404 o 409 segun el error.
     """
 
     response.content_type = "application/json"
@@ -448,7 +1012,10 @@ def modificar_plazas(target_id):
             response.status = 409
             return '{"error_description":"La habitación está ocupada, no se puede modificar."}'
         else:
-            registry[int(target_id)].plazas = request.query.plazas
+            plazas = int(request.query.plazas)
+            if plazas < 0:
+                raise ValueError
+            registry.modify(target_id, plazas=plazas)
             update(target_id)
             return dumps({'plazas': registry[target_id].plazas})
 
@@ -456,6 +1023,10 @@ def modificar_plazas(target_id):
         response.status = 404
         return response
 
+    except ValueError:
+        response.status = 400
+        return dumps({"error_description": "Plazas debe ser un entero positivo."})
+
 
 @get('/<target_id:int>/precio')
 def get_precio(target_id):
@@ -476,10 +1047,14 @@ def get_precio(target_id):
 
 
 @put('/<target_id:int>/precio')
+@por_habitacion
 def modificar_precio(target_id):
     """Modifica el precio por noche de la habitación
 
-    El nuevo valor del precio se pasa por QUERY VARIABLE
+    El nuevo valor del precio se pasa por QUERY VARIABLE, entero o
+    decimal como en el alta
+
+        .../1/precio?precio=99.5
 
     Si no existe se devuelve HTTPResponse con error
     404.
@@ -487,9 +1062,12 @@ def modificar_precio(target_id):
     Si existe pero esta ocupada devuelve una HTTPResponse
     con error 409
 
+    Si el valor no es un número positivo devuelve una
+    HTTPResponse con error 400
+
     :param target_id: Identificador único de la habitación.
     :returns Si funciona objeto modificado por JSON
-    Si no HTTPResponse 404 o 409 segun el error
+    Si no HTTPResponse 400, 404 o 409 segun el error
     """
 
     try:
@@ -497,38 +1075,510 @@ def modificar_precio(target_id):
             response.status = 409
             return '{"error_description":"La habitación está ocupada, no se puede modificar."}'
         else:
-            registry[target_id].precio = request.query.precio
+            registry.modify(target_id, precio=Room.normalize('precio', request.query.precio))
             update(target_id)
-            return registry[target_id].precio
+            return dumps(registry[target_id].precio)
+
+    except KeyError:
+        response.status = 404
+        return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
+
+    except ValueError:
+        response.status = 400
+        return dumps({"error_description": "Precio debe ser un número positivo."})
+
+
+@get('/<target_id:int>/reservas')
+def get_reservas(target_id):
+    """ Devuelve el calendario de reservas de la habitación.
+
+    :param target_id: Identificador único de la habitación.
+    :returns: Lista de pares de fechas [inicio, fin) en orden."""
+
+    response.content_type = "application/json"
+    try:
+        return dumps(calendario.serializar(registry[target_id].reservas))
+    except KeyError:
+        response.status = 404
+        return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
+
+
+@post('/<target_id:int>/reservas')
+@por_habitacion
+def reservar(target_id):
+    """ Reserva una habitación entre dos fechas.
+
+    Se recibe por JSON la fecha de llegada, incluida, y la de
+    salida, excluida, en formato AAAA-MM-DD,
 
+        {"inicio": "2026-03-12", "fin": "2026-03-15"}
+
+    La reserva no puede solapar ninguna otra de la habitación. Se
+    persiste con el resto de la habitación mediante update().
+
+    :param target_id: Identificador único de la habitación.
+    :returns: Si funciona HTTPResponse 201 con el calendario de la
+    habitación. Si las fechas no son válidas HTTPResponse 400, si la
+    habitación no existe 404 y si solapa otra reserva 409 con ella."""
+
+    response.content_type = "application/json"
+    try:
+        target = registry[target_id]
+        data = request.json
+        if not isinstance(data, dict):
+            raise ValueError('Se requieren las fechas inicio y fin.')
+        inicio, fin = calendario.intervalo(data.get('inicio'), data.get('fin'))
     except KeyError:
         response.status = 404
         return dumps({"error_description": f"La habitación {target_id} no está registrada en el sistema."})
+    except ValueError as e:
+        response.status = 400
+        return dumps({"error_description": str(e)})
+
+    solapada = calendario.solapada(target.reservas, inicio, fin)
+    if solapada is not None:
+        response.status = 409
+        return dumps({"error_description": f"La habitación {target_id} ya está reservada en esas fechas.",
+                      "reserva": calendario.serializar((solapada,))[0]})
+
+    registry.modify(target.id, reservas=calendario.reservar(target.reservas, inicio, fin))
+    update(target_id)
+    response.status = 201
+    return dumps(calendario.serializar(target.reservas))
+
+
+@delete('/<target_id:int>/reservas/<inicio>')
+@por_habitacion
+def cancelar_reserva(target_id, inicio):
+    """ Cancela la reserva de una habitación que empieza en una fecha.
+
+    :param target_id: Identificador único de la habitación.
+    :param inicio: Fecha de llegada de la reserva, AAAA-MM-DD.
+    :returns: Si funciona HTTPResponse 200 con el calendario de la
+    habitación. Si la fecha no es válida HTTPResponse 400, si la
+    habitación o la reserva no existen 404."""
+
+    response.content_type = "application/json"
+    try:
+        target = registry[target_id]
+        reservas = calendario.cancelar(target.reservas, calendario.fecha(inicio))
+    except KeyError:
+        response.status = 404
+        return dumps({"error_description": f"La habitación {target_id} no está registrada o no tiene una reserva"
+                                           f" que empiece el {inicio}."})
+    except ValueError as e:
+        response.status = 400
+        return dumps({"error_description": str(e)})
+
+    registry.modify(target.id, reservas=reservas)
+    update(target_id)
+    return dumps(calendario.serializar(target.reservas))
+
+
+@get('/libres')
+def get_libres():
+    """ Obtiene las habitaciones sin reservas en un intervalo de fechas.
+
+        .../libres?inicio=2026-03-12&fin=2026-03-15
+
+    Las reservas que solapan [inicio, fin) se localizan en el índice
+    de intervalos del registro, o en SQL sin precarga. Admite ETag
+    con la generación del registro, como los listados.
+
+    :returns: Habitaciones libres en JSON, indexadas por ID. Si las
+    fechas no son válidas HTTPResponse 400"""
+
+    response.content_type = "application/json"
+    try:
+        inicio, fin = calendario.intervalo(request.query.get('inicio'), request.query.get('fin'))
+    except ValueError as e:
+        response.status = 400
+        return dumps({"error_description": str(e)})
+
+    if no_modificado(f'g{registry.generation}'):
+        return ''
+
+    if consultas is not None:
+        ids = consultas.libres(calendario.iso(inicio), calendario.iso(fin))
+    else:
+        ids = registry.libres(inicio, fin)
+    return objeto_json(serializadas(ids))
+
+
+def _plazas(data):
+    """ Valida las plazas de una habitación recibida por JSON con la
+    misma regla que el alta individual.
+
+    :param data: Diccionario recibido.
+    :returns: Plazas normalizadas, ver Room.normalize().
+    :raises ValueError: Si no es un entero positivo que quepa en el
+    almacenamiento."""
+
+    valor = data['plazas']
+    try:
+        if isinstance(valor, bool):
+            raise ValueError
+        return Room.normalize('plazas', valor)
+    except (TypeError, ValueError):
+        raise ValueError(f'El campo plazas tiene que ser un entero entre 0 y {PLAZAS_MAXIMO}.')
+
+
+def _precio(data):
+    """ Valida el precio de una habitación recibida por JSON, entero o
+    decimal con la misma regla que el alta individual.
+
+    :param data: Diccionario recibido.
+    :returns: Precio normalizado, ver Room.normalize().
+    :raises ValueError: Si no es un número positivo."""
+
+    valor = data['precio']
+    try:
+        if isinstance(valor, bool):
+            raise ValueError
+        return Room.normalize('precio', valor)
+    except (TypeError, ValueError):
+        raise ValueError('El campo precio tiene que ser un número positivo.')
+
+
+def _lista(data, campo):
+    """ Valida y normaliza un campo lista de una habitación recibida por JSON.
+
+    :raises ValueError: Si no es una lista o algún elemento no es válido."""
+
+    if not isinstance(data[campo], list):
+        raise ValueError(f'El campo {campo} tiene que ser una lista.')
+    return Room.normalize(campo, data[campo])
+
+
+def _lote(clave):
+    """ Obtiene la lista de elementos de un lote recibido por JSON.
+
+    :param clave: Campo del JSON que contiene la lista.
+    :returns: Lista de elementos, None si la petición no es válida."""
+
+    data = request.json
+    if not isinstance(data, dict) or not isinstance(data.get(clave), list):
+        return None
+    return data[clave]
+
+
+def _lote_rechazado(errores):
+    response.status = 400
+    return dumps({"error_description": "El lote no es válido, no se ha aplicado ningún cambio.",
+                  "errores": errores})
+
+
+@post('/lote')
+def alta_lote():
+    """ Da de alta varias habitaciones en una sola petición.
+
+    Se recibe por JSON una lista de habitaciones con los mismos
+    campos que en el alta individual:
+
+        {"habitaciones": [{"plazas": 2, "equipamiento": ["TV"], "precio": 60}, ...]}
+
+    El lote se valida completo antes de aplicarse, si algún elemento
+    no es válido no se da de alta ninguno. Las altas se aplican bajo
+    el cerrojo del registro y se persisten con una única escritura.
+
+    :returns: Si funciona HTTPResponse 201 con el resultado de cada
+    elemento, si no HTTPResponse 400 con los errores de cada elemento
+    o 503 si no quedan IDs libres para todo el lote.
+    """
+
+    response.content_type = "application/json"
+    habitaciones = _lote('habitaciones')
+    if habitaciones is None:
+        response.status = 400
+        return dumps({"error_description": "El campo habitaciones tiene que ser una lista."})
+
+    validas = []
+    errores = []
+    for indice, data in enumerate(habitaciones):
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('Cada habitación tiene que ser un objeto.')
+            validas.append((_plazas(data), _lista(data, 'equipamiento'), _precio(data)))
+        except KeyError:
+            errores.append({"indice": indice, "status": 400,
+                            "error_description": "Los campos plaza, equipamiento y precio son requeridos."})
+        except ValueError as e:
+            errores.append({"indice": indice, "status": 400, "error_description": str(e)})
+    if errores:
+        return _lote_rechazado(errores)
+
+    creadas = []
+    try:
+        for plazas, equipamiento, precio in validas:
+            creadas.append(Room(plazas, equipamiento, precio))
+    except IndexError as e:
+        for target in creadas:
+            Room.release_id(target.id)
+        response.status = 503
+        return dumps({"error_description": str(e)})
+
+    with registry.room_locks([target.id for target in creadas]), registry.lock:
+        for target in creadas:
+            registry.add(target)
+        storage.save_many([target.to_dict() for target in creadas])
+
+    response.status = 201
+    return dumps({"resultados": [{"indice": indice, "status": 201, "habitacion": target.to_dict()}
+                                 for indice, target in enumerate(creadas)]})
+
+
+@put('/lote')
+def modificar_lote():
+    """ Modifica plazas, precio o equipamiento de varias habitaciones.
+
+    Se recibe por JSON una lista de cambios, cada uno con el ID de
+    la habitación y los campos a sustituir:
+
+        {"cambios": [{"id": 3, "precio": 120}, {"id": 4, "plazas": 2, "equipamiento": ["TV"]}, ...]}
+
+    El lote se valida completo antes de aplicarse: las habitaciones
+    deben existir y estar desocupadas. Los cambios se aplican bajo el
+    cerrojo del registro y se persisten con una única escritura.
+
+    :returns: Si funciona HTTPResponse 200 con el resultado de cada
+    elemento, si no HTTPResponse 400 con los errores de cada elemento.
+    """
+
+    response.content_type = "application/json"
+    cambios = _lote('cambios')
+    if cambios is None:
+        response.status = 400
+        return dumps({"error_description": "El campo cambios tiene que ser una lista."})
+
+    ids = [data['id'] for data in cambios if isinstance(data, dict) and type(data.get('id')) is int]
+    with registry.room_locks(ids), registry.lock:
+        validos = []
+        errores = []
+        for indice, data in enumerate(cambios):
+            try:
+                if not isinstance(data, dict) or 'id' not in data:
+                    raise ValueError('Cada cambio tiene que ser un objeto con el campo id.')
+                campos = {}
+                if 'plazas' in data:
+                    campos['plazas'] = _plazas(data)
+                if 'precio' in data:
+                    campos['precio'] = _precio(data)
+                if 'equipamiento' in data:
+                    campos['equipamiento'] = _lista(data, 'equipamiento')
+                if len(campos) == 0:
+                    raise ValueError('Cada cambio tiene que incluir plazas, precio o equipamiento.')
+
+                if type(data['id']) is not int:
+                    # true o 1.0 encontrarían la habitación 1 en el diccionario del registro.
+                    raise KeyError(data['id'])
+                target = registry[data['id']]
+                if not target.disponible:
+                    errores.append({"indice": indice, "id": data['id'], "status": 409,
+                                    "error_description": f"La habitación {data['id']} está ocupada, no se"
+                                                         f" permiten modificaciones."})
+                else:
+                    validos.append((target.id, campos))
+            except (KeyError, TypeError):
+                errores.append({"indice": indice, "id": data['id'], "status": 404,
+                                "error_description": f"La habitación {data['id']} no está registrada en el"
+                                                     f" sistema."})
+            except ValueError as e:
+                errores.append({"indice": indice, "status": 400, "error_description": str(e)})
+        if errores:
+            return _lote_rechazado(errores)
+
+        modificadas = [registry.modify(target_id, **campos) for target_id, campos in validos]
+        storage.save_many([target.to_dict() for target in {target.id: target for target in modificadas}.values()])
+
+        return dumps({"resultados": [{"indice": indice, "id": target.id, "status": 200,
+                                      "habitacion": target.to_dict()} for indice, target in enumerate(modificadas)]})
+
+
+@put('/lote/disponibilidad')
+def modificar_disponibilidad_lote():
+    """ Modifica la disponibilidad de varias habitaciones.
+
+        {"ids": [1, 2, 5], "disponible": false}
+
+    El lote se valida completo antes de aplicarse: todas las
+    habitaciones deben existir. Los cambios se aplican bajo el
+    cerrojo del registro y se persisten con una única escritura.
+
+    :returns: Si funciona HTTPResponse 200 con la disponibilidad de
+    cada habitación, si no HTTPResponse 400 con los errores.
+    """
+
+    response.content_type = "application/json"
+    ids = _lote('ids')
+    if ids is None or not isinstance(request.json.get('disponible'), bool):
+        response.status = 400
+        return dumps({"error_description": "Se requieren la lista ids y el boleano disponible."})
+    disponible = request.json['disponible']
+
+    with registry.room_locks([target_id for target_id in ids if type(target_id) is int]), registry.lock:
+        errores = [{"indice": indice, "id": target_id, "status": 404,
+                    "error_description": f"La habitación {target_id} no está registrada en el sistema."}
+                   for indice, target_id in enumerate(ids)
+                   if type(target_id) is not int or target_id not in registry]
+        if errores:
+            return _lote_rechazado(errores)
+
+        modificadas = {target_id: registry.modify(target_id, disponible=disponible) for target_id in ids}
+        storage.save_many([target.to_dict() for target in modificadas.values()])
+
+        return dumps({"resultados": [{"indice": indice, "id": target_id, "status": 200,
+                                      "disponible": disponible} for indice, target_id in enumerate(ids)]})
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Servicio REST de gestión de habitaciones.')
+    parser.add_argument('--host', default='localhost', help='Dirección en la que escucha el servidor.')
+    parser.add_argument('--puerto', type=int, default=8080, help='Puerto en el que escucha el servidor.')
+    parser.add_argument('--directorio', default='ArchivosServidor/',
+                        help='Directorio de los datos del servidor.')
+    parser.add_argument('--rango-ids', default=None, metavar='INICIO:FIN',
+                        help='Rango de IDs que asigna el servidor, para desplegarlo como partición.')
+    parser.add_argument('--almacenamiento', choices=almacenamiento.MOTORES, default=almacenamiento.MOTOR_DIARIO,
+                        help='Motor de almacenamiento de las habitaciones.')
+    parser.add_argument('--fsync', choices=almacenamiento.POLITICAS_FSYNC, default=almacenamiento.FSYNC_GRUPO,
+                        help='Política de sincronización del diario con el disco.')
+    parser.add_argument('--fsync-intervalo', type=int, default=10,
+                        help='Milisegundos entre fsync con la política grupo.')
+    parser.add_argument('--write-behind', action='store_true',
+                        help='Difiere y agrupa las escrituras al almacenamiento en un hilo aparte.')
+    parser.add_argument('--write-behind-intervalo', type=int, default=50,
+                        help='Milisegundos entre volcados de la escritura diferida.')
+    parser.add_argument('--write-behind-umbral', type=int, default=1000,
+                        help='Habitaciones pendientes que fuerzan un volcado anticipado.')
+    parser.add_argument('--sin-precarga', action='store_true',
+                        help='Con sqlite no carga las habitaciones al arrancar, listados y búsquedas se '
+                             'resuelven en SQL y cada habitación se carga al accederla.')
+    parser.add_argument('--perfilado-tasa', type=float, default=0.0,
+                        help='Fracción de las peticiones que se perfilan con cProfile, ver /debug/profile.')
+    parser.add_argument('--perfilado-patron', default=None,
+                        help='Expresión regular de las rutas cuyas peticiones se perfilan siempre.')
+    parser.add_argument('--snapshot-intervalo', type=int, default=300,
+                        help='Segundos entre instantáneas del registro, 0 las desactiva.')
+    parser.add_argument('--workers-carga', type=int, default=8,
+                        help='Hilos de lectura al cargar el almacenamiento por ficheros.')
+    parser.add_argument('--servidor', choices=('simple', 'hilos'), default='simple',
+                        help='simple atiende las peticiones de una en una, hilos con un grupo de hilos.')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Hilos que atienden peticiones en el modo hilos.')
+    parser.add_argument('--esperas-cambios', type=int, default=None,
+                        help='Peticiones a GET /cambios que esperan a la vez en el modo hilos,'
+                             ' por defecto la cuarta parte de --workers.')
+    args = parser.parse_args()
+    if args.esperas_cambios is None:
+        args.esperas_cambios = max(1, args.workers // 4)
+    if args.servidor == 'hilos' and not 0 < args.esperas_cambios < args.workers:
+        parser.error('--esperas-cambios tiene que ser positivo y menor que --workers, las esperas no pueden'
+                     ' ocupar todos los hilos.')
+    if args.sin_precarga and args.almacenamiento != almacenamiento.MOTOR_SQLITE:
+        parser.error('--sin-precarga requiere --almacenamiento sqlite.')
+    if args.sin_precarga and args.write_behind:
+        parser.error('--sin-precarga no admite --write-behind, las consultas no verían los cambios pendientes.')
+
+    if args.perfilado_tasa or args.perfilado_patron:
+        try:
+            perfilador.configurar(True, args.perfilado_tasa, args.perfilado_patron)
+        except ValueError as e:
+            parser.error(str(e))
+
     logging.basicConfig(level=logging.DEBUG)
     logging.info('Inicializando Servicio')
-    logging.info('\t· Buscando ArchivosServidor/')
 
-    # Detección directorio ArchivosServidor
+    if args.rango_ids is not None:
+        inicio, _, fin = args.rango_ids.partition(':')
+        Room.allocator = IdAllocator(int(inicio), int(fin))
+        logging.info(f'\t· Rango de IDs {inicio}-{fin}')
+    if args.almacenamiento == almacenamiento.MOTOR_MMAP:
+        # Los registros binarios guardan el ID en 32 bits.
+        if Room.allocator.fin is None:
+            Room.allocator = IdAllocator(Room.allocator.inicio, almacenamiento.MmapStorage.ID_MAXIMO)
+        elif Room.allocator.fin > almacenamiento.MmapStorage.ID_MAXIMO:
+            parser.error(f'Con mmap los IDs no pueden superar {almacenamiento.MmapStorage.ID_MAXIMO}.')
+    logging.info(f'\t· Buscando {args.directorio}')
+
+    # Detección directorio de datos
     try:
-        mkdir('ArchivosServidor/')
-        logging.info('\t\t No se ha detectado el directorio ArchivosServidor, se ha generado uno nuevo.')
+        mkdir(args.directorio)
+        logging.info(f'\t\t No se ha detectado el directorio {args.directorio}, se ha generado uno nuevo.')
     except FileExistsError:
-        logging.info('\t\t Directorio ArchivosServidor/ detectado.')
-
-    # Carga de las habitaciones en memoria
-    logging.info('\t · Carga de Habitaciones en memoria')
-    for h in listdir('ArchivosServidor/'):
-        with open(f'ArchivosServidor/{h}', 'r') as file:
-            json_data = load(file)
+        logging.info(f'\t\t Directorio {args.directorio} detectado.')
+
+    logging.info(f'\t· Motor de almacenamiento: {args.almacenamiento}')
+    inicio = time.perf_counter()
+    storage = almacenamiento.abrir_almacenamiento(args.almacenamiento, args.directorio, args.fsync,
+                                                  args.fsync_intervalo, args.workers_carga)
+    motor = storage
+    if args.almacenamiento != almacenamiento.MOTOR_MMAP:
+        # Los registros proyectados se escriben en el sitio, no compensa resumirlos.
+        storage = almacenamiento.DigestStorage(storage)
+    if args.write_behind:
+        # Por fuera del resumen, que solo anota lo que el volcado llega a escribir.
+        storage = almacenamiento.WriteBehindStorage(storage, args.write_behind_intervalo, args.write_behind_umbral)
+        logging.info(f'\t\t Escritura diferida cada {args.write_behind_intervalo}ms '
+                     f'o {args.write_behind_umbral} habitaciones pendientes.')
+    logging.info(f'\t\t Almacenamiento abierto en {time.perf_counter() - inicio:.3f}s.')
+
+    if args.sin_precarga:
+        # Solo se reservan los IDs, las habitaciones se cargan al accederlas.
+        logging.info('\t · Reserva de IDs sin precarga de habitaciones')
+        inicio = time.perf_counter()
+        consultas = motor
+        for target_id in consultas.ids():
+            try:
+                Room.allocator.reserve(target_id)
+            except IndexError:
+                logging.error(f'El id {target_id} no se ha podido reservar.')
+        registry.generation = consultas.generacion()
+        registry.cargar = cargar_habitacion
+        logging.info(f'\t\t {len(Room.allocator)} IDs reservados en {time.perf_counter() - inicio:.3f}s.')
+    else:
+        # Carga de las habitaciones en memoria
+        logging.info('\t · Carga de Habitaciones en memoria')
+        inicio = time.perf_counter()
+        for json_data in storage.load():
             try:
-                habitacion = Room(json_data['plazas'], json_data['equipamiento'], json_data['precio'], json_data['disponible'], json_data['id'])
-                registry[habitacion.id] = habitacion
-                logging.info(f'\t\t Habitación {habitacion.id} cargada en memoria.')
+                habitacion = Room(json_data['plazas'], json_data['equipamiento'], json_data['precio'], json_data['disponible'], json_data['id'], json_data.get('version', 0), json_data.get('reservas', ()))
+                registry.add(habitacion)
             except IndexError:
                 logging.error(f'El id {json_data["id"]} ya está cargado en memoria, la habitación no ha sido cargada.')
-
+        # Las bajas posteriores a la última modificación también cuentan.
+        registry.generation = max(registry.generation, storage.generacion())
+        logging.info(f'\t\t {len(registry)} habitaciones cargadas en memoria en {time.perf_counter() - inicio:.3f}s.')
+
+    # Instantáneas periódicas del registro
+    def datos_registro():
+        return [h.to_dict() for h in list(registry.values())]
+
+    if args.snapshot_intervalo > 0:
+        def instantaneas():
+            while True:
+                time.sleep(args.snapshot_intervalo)
+                try:
+                    storage.snapshot(datos_registro)
+                except Exception:
+                    # Un fallo no detiene las instantáneas siguientes.
+                    logging.exception('No se ha podido escribir la instantánea.')
+
+        threading.Thread(target=instantaneas, name='instantaneas', daemon=True).start()
+
+    registry.cambios.iniciar(registry.generation)
+    if args.servidor != 'hilos':
+        # Una petición en espera bloquearía al resto de clientes.
+        espera_cambios = 0
+    esperas_cambios = threading.BoundedSemaphore(max(1, args.esperas_cambios))
     logging.info('Inicialización finalizada.')
-    run(host='localhost', port=8080)
\ No newline at end of file
+    try:
+        if args.servidor == 'hilos':
+            logging.info(f'Servidor concurrente con {args.workers} hilos.')
+            run(host=args.host, port=args.puerto, server_class=servidor_hilos.servidor_con_hilos(args.workers))
+        else:
+            run(host=args.host, port=args.puerto)
+    finally:
+        # Un segundo Ctrl-C no debe interrumpir la instantánea final.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        storage.snapshot(datos_registro)
+        storage.close()
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIServer
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """ Servidor WSGI que atiende las peticiones con un grupo de hilos
+
+    El servidor wsgiref por defecto atiende las peticiones de una en
+    una, una escritura lenta bloquea a todos los clientes. Este
+    servidor acepta las conexiones en el hilo principal y las entrega
+    a un ThreadPoolExecutor de `workers` hilos."""
+
+    workers = 8  # Número de hilos que atienden peticiones.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self._atender, request, client_address)
+
+    def _atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=True)
+
+
+def servidor_con_hilos(workers):
+    """ Crea la clase de servidor WSGI con el número de hilos indicado.
+
+    Se pasa a bottle.run como server_class del servidor wsgiref:
+
+        run(host='localhost', port=8080, server_class=servidor_con_hilos(8))
+
+    :param workers: Número de hilos que atienden peticiones.
+    :returns: Subclase de ThreadPoolWSGIServer."""
+
+    if workers < 1:
+        raise ValueError('El número de hilos debe ser mayor que 0.')
+    return type('ThreadPoolWSGIServer', (ThreadPoolWSGIServer,), {'workers': workers})
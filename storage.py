@@ -0,0 +1,1353 @@
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from json import dumps, loads, load
+from os import fsync, listdir, mkdir, path, remove, replace
+from shutil import copyfile, copyfileobj
+import mmap
+import sqlite3
+import logging
+import struct
+import threading
+import time
+
+""" Políticas de sincronización con disco del diario """
+FSYNC_SIEMPRE = 'siempre'  # fsync tras cada escritura.
+FSYNC_GRUPO = 'grupo'  # fsync agrupado cada intervalo de milisegundos.
+FSYNC_SO = 'so'  # El sistema operativo decide cuándo volcar a disco.
+POLITICAS_FSYNC = (FSYNC_SIEMPRE, FSYNC_GRUPO, FSYNC_SO)
+
+""" Motores de almacenamiento disponibles """
+MOTOR_DIARIO = 'diario'
+MOTOR_FICHEROS = 'ficheros'
+MOTOR_MMAP = 'mmap'
+MOTOR_SQLITE = 'sqlite'
+MOTORES = (MOTOR_DIARIO, MOTOR_FICHEROS, MOTOR_MMAP, MOTOR_SQLITE)
+
+JOURNAL = 'habitaciones.journal'
+SNAPSHOT = 'habitaciones.snapshot'
+REGISTROS = 'habitaciones.bin'
+EQUIPAMIENTOS = 'habitaciones.equip'
+BASE_DATOS = 'habitaciones.db'
+GENERACION = 'habitaciones.generacion'
+MIGRADOS = 'migrados'
+
+
+def _es_fichero_habitacion(nombre):
+    return nombre.startswith('Habitacion') and nombre.endswith('.json')
+
+
+class Storage:
+    """ Interfaz común de los motores de almacenamiento
+
+    Los motores trabajan con los diccionarios serializables de
+    las habitaciones, nunca con los objetos Room."""
+
+    def load(self):
+        """ Devuelve los datos de todas las habitaciones persistidas.
+
+        :returns: Iterable con los diccionarios de las habitaciones."""
+
+        raise NotImplementedError
+
+    def get(self, target_id):
+        """ Lee una habitación del almacenamiento.
+
+        :param target_id: Identificador único de la habitación.
+        :returns: Diccionario de la habitación, None si no existe.
+        :raises NotImplementedError: Si el motor no admite lecturas
+        por habitación."""
+
+        raise NotImplementedError
+
+    def save(self, data):
+        """ Hace persistente el estado de una habitación.
+
+        :param data: Diccionario serializable de la habitación."""
+
+        raise NotImplementedError
+
+    def delete(self, target_id, generacion=0):
+        """ Elimina una habitación del almacenamiento.
+
+        :param target_id: Identificador único de la habitación.
+        :param generacion: Generación del registro tras la baja, se
+        conserva para que generacion() no retroceda al eliminar las
+        habitaciones más recientes."""
+
+        raise NotImplementedError
+
+    def generacion(self):
+        """ Devuelve la generación del registro persistida.
+
+        No es menor que la versión de ninguna habitación guardada ni
+        que la generación de ninguna baja, de modo que tras reiniciar
+        las versiones nuevas no repiten las de habitaciones eliminadas.
+        Los motores que la calculan al cargar la devuelven tras load().
+
+        :returns: Generación, 0 si no se ha guardado nada."""
+
+        return 0
+
+    def save_many(self, datos):
+        """ Hace persistente el estado de varias habitaciones.
+
+        Los motores que pueden agrupar la escritura lo hacen, por
+        defecto se guarda cada habitación por separado.
+
+        :param datos: Diccionarios serializables de las habitaciones."""
+
+        for data in datos:
+            self.save(data)
+
+    def snapshot(self, datos):
+        """ Consolida el estado completo en una instantánea.
+
+        Los motores que no la necesitan la ignoran.
+
+        :param datos: Función que devuelve los diccionarios de todas
+        las habitaciones, se invoca una vez iniciada la instantánea."""
+
+        pass
+
+    def stats(self):
+        """ Devuelve las métricas del motor.
+
+        :returns: Diccionario serializable con las métricas."""
+
+        return {}
+
+    def close(self):
+        """ Libera los recursos del motor. """
+
+        pass
+
+
+class FileStorage(Storage):
+    """ Motor heredado: un fichero JSON por habitación
+
+    Cada habitación se guarda en {directorio}/Habitacion{id}.json y la
+    generación de la última baja en {directorio}/habitaciones.generacion.
+    La carga lee los ficheros en paralelo con `workers` hilos."""
+
+    def __init__(self, directorio, workers=8):
+        self.directorio = directorio
+        self.workers = workers
+        self.url_generacion = path.join(directorio, GENERACION)
+        self._generacion = 0
+        if path.exists(self.url_generacion):
+            with open(self.url_generacion, 'r') as file:
+                self._generacion = int(file.read() or 0)
+
+    def _url(self, target_id):
+        return path.join(self.directorio, f'Habitacion{target_id}.json')
+
+    def _leer(self, nombre):
+        with open(path.join(self.directorio, nombre), 'r') as file:
+            return load(file)
+
+    def load(self):
+        nombres = [nombre for nombre in listdir(self.directorio) if _es_fichero_habitacion(nombre)]
+        if self.workers <= 1:
+            datos = map(self._leer, nombres)
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                datos = list(executor.map(self._leer, nombres, chunksize=256))
+        for data in datos:
+            self._generacion = max(self._generacion, data.get('version', 0))
+            yield data
+
+    def save(self, data):
+        with open(self._url(data['id']), 'w') as file:
+            file.write(dumps(data))
+        self._generacion = max(self._generacion, data.get('version', 0))
+
+    def delete(self, target_id, generacion=0):
+        try:
+            remove(self._url(target_id))
+        except FileNotFoundError:
+            logging.warning(f'La habitación {target_id} no se encontraba en los ficheros del sistema.')
+        if generacion > self._generacion:
+            self._generacion = generacion
+            temporal = self.url_generacion + '.tmp'
+            with open(temporal, 'w') as file:
+                file.write(str(generacion))
+            replace(temporal, self.url_generacion)
+
+    def generacion(self):
+        return self._generacion
+
+
+class JournalStorage(Storage):
+    """ Motor por defecto: diario de escritura anticipada de solo anexado
+
+    Cada cambio de una habitación se anexa como un registro compacto
+    de una línea al fichero {directorio}/habitaciones.journal:
+
+        {"op":"put","data":{...}}
+        {"op":"del","id":3,"generacion":12}
+
+    Periódicamente se consolida el estado en la instantánea
+    {directorio}/habitaciones.snapshot, con la generación en la primera
+    línea y una habitación por línea, y se vacía el diario. Al cargar se recorre la instantánea en una
+    sola pasada aplicando encima los registros del diario, el último
+    estado de cada habitación es el que prevalece. La política de fsync
+    determina la durabilidad de cada escritura:
+
+        · siempre: fsync tras cada registro.
+        · grupo: fsync agrupado cada `intervalo` milisegundos, una caída
+          puede perder los cambios de ese último intervalo.
+        · so: solo se vuelca al sistema operativo."""
+
+    def __init__(self, directorio, fsync_policy=FSYNC_GRUPO, intervalo=10):
+        if fsync_policy not in POLITICAS_FSYNC:
+            raise ValueError(f'Política de fsync desconocida: {fsync_policy}.')
+
+        self.directorio = directorio
+        self.url = path.join(directorio, JOURNAL)
+        self.url_snapshot = path.join(directorio, SNAPSHOT)
+        self.url_rotado = self.url + '.1'
+        self.fsync_policy = fsync_policy
+        self.intervalo = intervalo / 1000
+
+        if not path.exists(self.url):
+            self._migrar()
+
+        self._lock = threading.Lock()
+        self._pendiente = False
+        self._cerrado = threading.Event()
+        self._generacion = 0  # Mayor versión o generación de baja escrita o leída.
+        self._file = open(self.url, 'ab')
+
+        if self.fsync_policy == FSYNC_GRUPO:
+            self._hilo = threading.Thread(target=self._commit_agrupado, name='journal-fsync', daemon=True)
+            self._hilo.start()
+
+    def _migrar(self):
+        """ Migra el formato heredado de un fichero por habitación.
+
+        Se escriben todas las habitaciones en un diario temporal, se
+        sincroniza y se renombra, después se mueven los ficheros
+        heredados al subdirectorio migrados/."""
+
+        legacy = [nombre for nombre in listdir(self.directorio) if _es_fichero_habitacion(nombre)]
+        if len(legacy) == 0:
+            return
+
+        logging.info(f'\t\t Migrando {len(legacy)} habitaciones al diario {self.url}.')
+        temporal = self.url + '.tmp'
+        with open(temporal, 'wb') as file:
+            for data in FileStorage(self.directorio).load():
+                file.write(self._registro({'op': 'put', 'data': data}))
+            file.flush()
+            fsync(file.fileno())
+        replace(temporal, self.url)
+
+        try:
+            mkdir(path.join(self.directorio, MIGRADOS))
+        except FileExistsError:
+            pass
+        for nombre in legacy:
+            replace(path.join(self.directorio, nombre), path.join(self.directorio, MIGRADOS, nombre))
+
+    @staticmethod
+    def _registro(entrada):
+        return (dumps(entrada, separators=(',', ':')) + '\n').encode('utf-8')
+
+    def _escribir(self, entrada, generacion):
+        self._anexar(self._registro(entrada), generacion)
+
+    def _anexar(self, registro, generacion):
+        with self._lock:
+            self._generacion = max(self._generacion, generacion)
+            self._file.write(registro)
+            if self.fsync_policy == FSYNC_SIEMPRE:
+                self._file.flush()
+                fsync(self._file.fileno())
+            elif self.fsync_policy == FSYNC_SO:
+                self._file.flush()
+            else:
+                self._pendiente = True
+
+    def _commit_agrupado(self):
+        while not self._cerrado.wait(self.intervalo):
+            self._sincronizar()
+
+    def _sincronizar(self):
+        with self._lock:
+            if self._pendiente and not self._file.closed:
+                self._file.flush()
+                fsync(self._file.fileno())
+                self._pendiente = False
+
+    @staticmethod
+    def _leer_lineas(url):
+        with open(url, 'rb') as file:
+            for numero, linea in enumerate(file, 1):
+                try:
+                    yield loads(linea)
+                except ValueError:
+                    logging.warning(f'Registro {numero} de {url} incompleto, se descarta.')
+
+    def load(self):
+        inicio = time.perf_counter()
+        cambios = {}
+        for url in (self.url_rotado, self.url):
+            if path.exists(url):
+                for entrada in self._leer_lineas(url):
+                    if entrada['op'] == 'put':
+                        cambios[entrada['data']['id']] = entrada['data']
+                        generacion = entrada['data'].get('version', 0)
+                    else:
+                        cambios[entrada['id']] = None
+                        generacion = entrada.get('generacion', 0)
+                    self._generacion = max(self._generacion, generacion)
+        logging.info(f'\t\t Diario reproducido: {len(cambios)} habitaciones modificadas'
+                     f' en {time.perf_counter() - inicio:.3f}s.')
+
+        inicio = time.perf_counter()
+        total = 0
+        if path.exists(self.url_snapshot):
+            for data in self._leer_lineas(self.url_snapshot):
+                if 'id' not in data:
+                    self._generacion = max(self._generacion, data['generacion'])
+                    continue
+                total += 1
+                self._generacion = max(self._generacion, data.get('version', 0))
+                if data['id'] in cambios:
+                    data = cambios.pop(data['id'])
+                    if data is None:
+                        continue
+                yield data
+        logging.info(f'\t\t Instantánea leída: {total} habitaciones en {time.perf_counter() - inicio:.3f}s.')
+
+        for data in cambios.values():
+            if data is not None:
+                yield data
+
+    def save(self, data):
+        self._escribir({'op': 'put', 'data': data}, data.get('version', 0))
+
+    def save_many(self, datos):
+        """ Anexa todos los registros con una única escritura y fsync. """
+
+        datos = list(datos)
+        registros = b''.join(self._registro({'op': 'put', 'data': data}) for data in datos)
+        if registros:
+            self._anexar(registros, max(data.get('version', 0) for data in datos))
+
+    def delete(self, target_id, generacion=0):
+        self._escribir({'op': 'del', 'id': target_id, 'generacion': generacion}, generacion)
+
+    def generacion(self):
+        with self._lock:
+            return self._generacion
+
+    def snapshot(self, datos):
+        """ Escribe la instantánea y vacía el diario.
+
+        Se rota el diario antes de leer el registro, de modo que todo
+        cambio posterior a la rotación queda en el diario nuevo y se
+        reaplica sobre la instantánea al cargar. La instantánea empieza
+        con la generación de los cambios del diario rotado, incluidas
+        las bajas que ya no aparecen en ella. Si queda un diario rotado
+        de una instantánea interrumpida, el actual se le anexa: load()
+        los reproduce en ese orden.
+
+        :param datos: Función que devuelve los diccionarios de todas
+        las habitaciones."""
+
+        inicio = time.perf_counter()
+        with self._lock:
+            interrumpida = path.exists(self.url_rotado)
+            if self._file.tell() == 0 and not interrumpida:
+                return
+            self._file.flush()
+            fsync(self._file.fileno())
+            self._file.close()
+            if interrumpida:
+                # Diario rotado por una instantánea que no terminó: se le anexa el actual en lugar de
+                # sustituirlo, sus registros no están en ninguna instantánea.
+                with open(self.url_rotado, 'ab') as rotado, open(self.url, 'rb') as actual:
+                    copyfileobj(actual, rotado)
+                    rotado.flush()
+                    fsync(rotado.fileno())
+                remove(self.url)
+            else:
+                replace(self.url, self.url_rotado)
+            self._file = open(self.url, 'ab')
+            self._pendiente = False
+            generacion = self._generacion
+
+        temporal = self.url_snapshot + '.tmp'
+        total = 0
+        with open(temporal, 'wb') as file:
+            file.write(self._registro({'generacion': generacion}))
+            for data in datos():
+                file.write(self._registro(data))
+                total += 1
+            file.flush()
+            fsync(file.fileno())
+        replace(temporal, self.url_snapshot)
+        remove(self.url_rotado)
+        logging.info(f'Instantánea de {total} habitaciones escrita en {time.perf_counter() - inicio:.3f}s.')
+
+    def close(self):
+        self._cerrado.set()
+        self._sincronizar()
+        with self._lock:
+            self._file.close()
+
+
+class MmapStorage(Storage):
+    """ Registros binarios de ancho fijo en un fichero proyectado en memoria
+
+    {directorio}/habitaciones.bin empieza con una cabecera de
+    CABECERA.size bytes, la marca del formato, la generación de la
+    última baja (uint64) y el número de la tabla de cadenas (uint32)
+    seguidos de bytes reservados, y contiene un registro de
+    REGISTRO.size bytes por habitación:
+
+        id (uint32, 0 si el hueco está libre), plazas (uint32),
+        precio (double), versión (uint64), posición y longitud del
+        equipamiento y de las reservas en la tabla de cadenas (uint32,
+        uint32, uint32, uint32) y banderas (disponible, precio entero,
+        equipamiento en JSON).
+
+    El equipamiento y las reservas se guardan en
+    {directorio}/habitaciones.equip (habitaciones.equip.N a partir de
+    la primera compactación), una tabla de solo anexado en la que cada
+    combinación distinta aparece una vez. Los elementos se separan con
+    SEPARADOR, o se guardan como una lista JSON si alguno no es una
+    cadena no vacía sin SEPARADOR, para recuperarlos tal cual. Cada
+    calendario de reservas distinto ocupa una entrada nueva, así que la
+    tabla crece con las reservas y cancelaciones. snapshot() y close() la compactan cuando
+    ha doblado su tamaño desde la última compactación y las cadenas
+    que ya no usa ningún registro ocupan más que las que sí, y al
+    menos `compactar_desde` bytes: se escribe la tabla N + 1 con solo
+    las cadenas en uso y después, con un reemplazo atómico, un
+    habitaciones.bin que apunta a ella. Al abrir se borran las tablas
+    de otros números que haya dejado una compactación interrumpida.
+    Los ficheros de formatos anteriores, sin
+    reservas (HABMMAP1) o sin generación (HABMMAP2), se convierten al
+    abrirlos. Guardar o consultar una habitación solo toca los bytes de
+    su registro, sin JSON. Al arrancar se proyecta el fichero y se
+    recorren los registros con struct, sin analizar texto.
+
+    Con la política 'siempre' se sincroniza la página del registro tras
+    cada escritura, con 'grupo' se sincroniza el fichero cada
+    `intervalo` milisegundos si ha cambiado, con 'so' decide el sistema
+    operativo. close() y snapshot() siempre sincronizan."""
+
+    MARCA = b'HABMMAP3'
+    CABECERA = struct.Struct('<8sQI12x')
+    GENERACION = struct.Struct('<Q')  # Campo de la cabecera tras la marca.
+    TABLA = struct.Struct('<I')  # Campo de la cabecera tras la generación.
+    REGISTRO = struct.Struct('<IIdQIIIIB7x')
+    # Formatos anteriores, con una cabecera de solo la marca: registro y conversión al actual.
+    ANTERIORES = {
+        b'HABMMAP1': (struct.Struct('<IIdQIIB7x'), lambda registro: registro[:6] + (0, 0) + registro[6:]),
+        b'HABMMAP2': (struct.Struct('<IIdQIIIIB7x'), lambda registro: registro),
+    }
+    ID_MAXIMO = 2 ** 32 - 1  # Mayor ID que cabe en el registro.
+    DISPONIBLE = 1
+    PRECIO_ENTERO = 2
+    EQUIPAMIENTO_JSON = 4
+    SEPARADOR = '\x1f'
+
+    def __init__(self, directorio, fsync_policy=FSYNC_GRUPO, intervalo=10, capacidad=1024, compactar_desde=1 << 20):
+        if fsync_policy not in POLITICAS_FSYNC:
+            raise ValueError(f'Política de fsync desconocida: {fsync_policy}.')
+
+        self.directorio = directorio
+        self.url = path.join(directorio, REGISTROS)
+        self.fsync_policy = fsync_policy
+        self.intervalo = intervalo / 1000
+        self.compactar_desde = compactar_desde
+
+        if not path.exists(self.url):
+            with open(self.url, 'wb') as file:
+                file.write(self.CABECERA.pack(self.MARCA, 0, 0))
+                file.truncate(self.CABECERA.size + capacidad * self.REGISTRO.size)
+        self._file = open(self.url, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        if self._mm[:len(self.MARCA)] in self.ANTERIORES:
+            self._migrar(self._mm[:len(self.MARCA)])
+        if self._mm[:len(self.MARCA)] != self.MARCA:
+            raise ValueError(f'{self.url} no es un fichero de habitaciones.')
+        self._generacion = self.GENERACION.unpack_from(self._mm, len(self.MARCA))[0]
+
+        self._numero_tabla = self.TABLA.unpack_from(self._mm, len(self.MARCA) + self.GENERACION.size)[0]
+        self.url_equipamiento = self._url_tabla(self._numero_tabla)
+        self._borrar_tablas_sobrantes()
+        with open(self.url_equipamiento, 'ab+') as file:
+            file.seek(0)
+            self._tabla = file.read()
+        self._equipamiento = open(self.url_equipamiento, 'ab')
+        self._posiciones = {}  # Posición y longitud en la tabla de cada cadena.
+        self._cadenas = {}  # Valores de cada posición, longitud y formato de la tabla.
+        self._compactada = len(self._tabla)  # Tamaño de la tabla tras la última compactación.
+
+        self._huecos = {}  # Hueco de cada ID.
+        self._libres = []  # Huecos libres por debajo de _usados.
+        self._usados = 0  # Huecos ocupados alguna vez.
+        self._lock = threading.Lock()
+        self._pendiente = False
+        self._cerrado = threading.Event()
+
+        if self.fsync_policy == FSYNC_GRUPO:
+            self._hilo = threading.Thread(target=self._commit_agrupado, name='mmap-fsync', daemon=True)
+            self._hilo.start()
+
+    def _migrar(self, marca):
+        """ Convierte un fichero de un formato anterior al actual, sin
+        reservas si no las tenía y con la generación a 0. """
+
+        anterior, convertir = self.ANTERIORES[marca]
+        vista = memoryview(self._mm)[len(marca):]
+        try:
+            registros = [convertir(registro) for registro in anterior.iter_unpack(vista)]
+        finally:
+            vista.release()
+        self._mm.close()
+        self._file.close()
+
+        temporal = self.url + '.tmp'
+        with open(temporal, 'wb') as file:
+            file.write(self.CABECERA.pack(self.MARCA, 0, 0))
+            for registro in registros:
+                file.write(self.REGISTRO.pack(*registro) if registro[0] else bytes(self.REGISTRO.size))
+            file.flush()
+            fsync(file.fileno())
+        replace(temporal, self.url)
+        logging.info(f'\t\t {self.url} convertido de {marca.decode()} a {self.MARCA.decode()}.')
+
+        self._file = open(self.url, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+    def _url_tabla(self, numero):
+        nombre = EQUIPAMIENTOS if numero == 0 else f'{EQUIPAMIENTOS}.{numero}'
+        return path.join(self.directorio, nombre)
+
+    def _borrar_tablas_sobrantes(self):
+        actual = path.basename(self.url_equipamiento)
+        for nombre in listdir(self.directorio):
+            if nombre != actual and (nombre == EQUIPAMIENTOS or nombre.startswith(EQUIPAMIENTOS + '.')):
+                remove(path.join(self.directorio, nombre))
+                logging.info(f'\t\t Tabla de cadenas sobrante {nombre} eliminada.')
+
+    def _compactar(self):
+        """ Reescribe la tabla de cadenas con solo las que usan los
+        registros, si compensa. Se llama con el cerrojo tomado. """
+
+        if len(self._tabla) < max(2 * self._compactada, self.compactar_desde):
+            return
+        inicio = time.perf_counter()
+        registros = {hueco: self.REGISTRO.unpack_from(self._mm, self._offset(hueco))
+                     for hueco in self._huecos.values()}
+        tabla, nuevas, posiciones = bytearray(), {}, {}  # Tabla nueva, clave nueva de cada antigua y de cada cadena.
+        for posicion, longitud in sorted({clave for registro in registros.values()
+                                          for clave in (registro[4:6], registro[6:8]) if clave[1]}):
+            cadena = self._tabla[posicion:posicion + longitud]
+            if cadena not in posiciones:
+                posiciones[cadena] = (len(tabla), longitud)
+                tabla += cadena
+            nuevas[(posicion, longitud)] = posiciones[cadena]
+        self._compactada = len(self._tabla)
+        if len(self._tabla) - len(tabla) <= len(tabla):
+            return
+
+        numero = self._numero_tabla + 1
+        url_tabla = self._url_tabla(numero)
+        with open(url_tabla, 'wb') as file:
+            file.write(tabla)
+            file.flush()
+            fsync(file.fileno())
+
+        # La copia apunta a la tabla nueva y sustituye a la original de una vez.
+        temporal = self.url + '.tmp'
+        self._mm.flush()
+        copyfile(self.url, temporal)
+        with open(temporal, 'r+b') as file, mmap.mmap(file.fileno(), 0) as copia:
+            self.TABLA.pack_into(copia, len(self.MARCA) + self.GENERACION.size, numero)
+            for hueco, registro in registros.items():
+                self.REGISTRO.pack_into(copia, self._offset(hueco), *registro[:4], *nuevas.get(registro[4:6], (0, 0)),
+                                        *nuevas.get(registro[6:8], (0, 0)), registro[8])
+            copia.flush()
+            fsync(file.fileno())
+        self._mm.close()
+        self._file.close()
+        replace(temporal, self.url)
+        self._file = open(self.url, 'r+b')
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._equipamiento.close()
+        remove(self.url_equipamiento)
+        logging.info(f'\t\t Tabla de cadenas compactada de {len(self._tabla)} a {len(tabla)} bytes'
+                     f' en {time.perf_counter() - inicio:.3f}s.')
+
+        self._numero_tabla, self.url_equipamiento = numero, url_tabla
+        self._equipamiento = open(url_tabla, 'ab')
+        self._tabla = bytes(tabla)
+        self._compactada = len(tabla)
+        self._cadenas = {nuevas[clave[:2]] + clave[2:]: valores for clave, valores in self._cadenas.items()
+                         if clave[:2] in nuevas}
+        self._posiciones = posiciones
+        self._pendiente = False
+
+    def _capacidad(self):
+        return (len(self._mm) - self.CABECERA.size) // self.REGISTRO.size
+
+    def _offset(self, hueco):
+        return self.CABECERA.size + hueco * self.REGISTRO.size
+
+    def _decodificar(self, posicion, longitud, en_json=False):
+        if longitud == 0:
+            return ()
+        clave = (posicion, longitud, en_json)
+        valores = self._cadenas.get(clave)
+        if valores is None:
+            cadena = self._tabla[posicion:posicion + longitud]
+            valores = tuple(loads(cadena) if en_json else cadena.decode('utf-8').split(self.SEPARADOR))
+            self._cadenas[clave] = valores
+            self._posiciones.setdefault(cadena, clave[:2])
+        return valores
+
+    def _codificar(self, valores):
+        """ Añade a la tabla una combinación de valores si no está ya.
+
+        :param valores: Valores de la combinación, en orden.
+        :returns: Posición y longitud en la tabla y si está en JSON."""
+
+        valores = tuple(valores)
+        if len(valores) == 0:
+            return 0, 0, False
+        en_json = not all(isinstance(valor, str) and valor and self.SEPARADOR not in valor for valor in valores)
+        cadena = (dumps(valores, ensure_ascii=False) if en_json else self.SEPARADOR.join(valores)).encode('utf-8')
+        clave = self._posiciones.get(cadena)
+        if clave is None:
+            clave = (len(self._tabla), len(cadena))
+            self._equipamiento.write(cadena)
+            self._equipamiento.flush()
+            if self.fsync_policy == FSYNC_SIEMPRE:
+                fsync(self._equipamiento.fileno())
+            self._tabla += cadena
+            self._posiciones[cadena] = clave
+            self._cadenas[clave + (en_json,)] = valores
+        return clave + (en_json,)
+
+    def _datos(self, registro):
+        target_id, plazas, precio, version, posicion, longitud, posicion_reservas, longitud_reservas, banderas = registro
+        return {'id': target_id, 'plazas': plazas,
+                'precio': int(precio) if banderas & self.PRECIO_ENTERO else precio,
+                'equipamiento': list(self._decodificar(posicion, longitud,
+                                                       bool(banderas & self.EQUIPAMIENTO_JSON))),
+                'disponible': bool(banderas & self.DISPONIBLE), 'version': version,
+                'reservas': [reserva.split('/') for reserva in self._decodificar(posicion_reservas, longitud_reservas)]}
+
+    def _hueco(self, target_id):
+        hueco = self._huecos.get(target_id)
+        if hueco is not None:
+            return hueco
+        if self._libres:
+            hueco = self._libres.pop()
+        else:
+            hueco = self._usados
+            self._usados += 1
+            if hueco >= self._capacidad():
+                self._mm.resize(self._offset(2 * max(self._capacidad(), 1)))
+        self._huecos[target_id] = hueco
+        return hueco
+
+    def _escribir(self, hueco, registro):
+        offset = self._offset(hueco)
+        self._mm[offset:offset + self.REGISTRO.size] = registro
+        if self.fsync_policy == FSYNC_SIEMPRE:
+            pagina = offset - offset % mmap.PAGESIZE
+            self._mm.flush(pagina, offset + self.REGISTRO.size - pagina)
+        else:
+            self._pendiente = True
+
+    def _commit_agrupado(self):
+        while not self._cerrado.wait(self.intervalo):
+            self._sincronizar()
+
+    def _sincronizar(self):
+        with self._lock:
+            if self._pendiente and not self._mm.closed:
+                self._mm.flush()
+                fsync(self._equipamiento.fileno())
+                self._pendiente = False
+
+    def load(self):
+        inicio = time.perf_counter()
+        vista = memoryview(self._mm)[self.CABECERA.size:]
+        libres = []
+        try:
+            for hueco, registro in enumerate(self.REGISTRO.iter_unpack(vista)):
+                if registro[0] == 0:
+                    libres.append(hueco)
+                    continue
+                self._huecos[registro[0]] = hueco
+                self._usados = hueco + 1
+                self._generacion = max(self._generacion, registro[3])
+                yield self._datos(registro)
+        finally:
+            vista.release()
+        self._libres = [hueco for hueco in reversed(libres) if hueco < self._usados]
+        logging.info(f'\t\t Registros proyectados: {len(self._huecos)} habitaciones'
+                     f' en {time.perf_counter() - inicio:.3f}s.')
+
+    def get(self, target_id):
+        with self._lock:
+            hueco = self._huecos.get(target_id)
+            if hueco is None:
+                return None
+            return self._datos(self.REGISTRO.unpack_from(self._mm, self._offset(hueco)))
+
+    def save(self, data):
+        with self._lock:
+            posicion, longitud, en_json = self._codificar(data['equipamiento'])
+            reservas = self._codificar(f'{inicio}/{fin}' for inicio, fin in data.get('reservas', ()))[:2]
+            banderas = (self.DISPONIBLE if data['disponible'] else 0) | \
+                       (self.PRECIO_ENTERO if isinstance(data['precio'], int) else 0) | \
+                       (self.EQUIPAMIENTO_JSON if en_json else 0)
+            registro = self.REGISTRO.pack(data['id'], data['plazas'], data['precio'], data.get('version', 0),
+                                          posicion, longitud, *reservas, banderas)
+            self._escribir(self._hueco(data['id']), registro)
+            self._generacion = max(self._generacion, data.get('version', 0))
+
+    def delete(self, target_id, generacion=0):
+        with self._lock:
+            if generacion > self._generacion:
+                # Las versiones guardadas ya cuentan, solo se anota la generación de las bajas.
+                self._generacion = generacion
+                self.GENERACION.pack_into(self._mm, len(self.MARCA), generacion)
+                if self.fsync_policy == FSYNC_SIEMPRE:
+                    self._mm.flush(0, self.CABECERA.size)
+                else:
+                    self._pendiente = True
+            hueco = self._huecos.pop(target_id, None)
+            if hueco is None:
+                logging.warning(f'La habitación {target_id} no se encontraba en los registros.')
+                return
+            self._escribir(hueco, bytes(self.REGISTRO.size))
+            self._libres.append(hueco)
+
+    def generacion(self):
+        with self._lock:
+            return self._generacion
+
+    def snapshot(self, datos):
+        """ Los registros ya son el estado completo, solo se
+        sincronizan y, si compensa, se compacta la tabla de cadenas. """
+
+        with self._lock:
+            self._mm.flush()
+            fsync(self._equipamiento.fileno())
+            self._pendiente = False
+            self._compactar()
+
+    def close(self):
+        self._cerrado.set()
+        with self._lock:
+            self._mm.flush()
+            fsync(self._equipamiento.fileno())
+            self._compactar()
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+            self._equipamiento.close()
+
+
+class ConsultaIds:
+    """ Vista de los IDs de una consulta a SQLite
+
+    Ofrece la misma interfaz de lectura que SortedIdSet (len, iter y
+    after), de modo que los listados paginados funcionan igual sobre
+    el registro en memoria o sobre la base de datos."""
+
+    def __init__(self, storage, disponible=None):
+        self.storage = storage
+        self.disponible = disponible
+
+    def _where(self, condiciones=(), parametros=()):
+        condiciones, parametros = list(condiciones), list(parametros)
+        if self.disponible is not None:
+            condiciones.append('disponible = ?')
+            parametros.append(int(self.disponible))
+        return (' WHERE ' + ' AND '.join(condiciones)) if condiciones else '', parametros
+
+    def __len__(self):
+        where, parametros = self._where()
+        return self.storage._consultar(f'SELECT COUNT(*) FROM habitaciones{where}', parametros)[0][0]
+
+    def __iter__(self):
+        where, parametros = self._where()
+        return iter([fila[0] for fila in self.storage._consultar(f'SELECT id FROM habitaciones{where} ORDER BY id',
+                                                                  parametros)])
+
+    def after(self, cursor=None, limit=None):
+        where, parametros = self._where(() if cursor is None else ('id > ?',), () if cursor is None else (cursor,))
+        limite = '' if limit is None else f' LIMIT {int(limit)}'
+        return [fila[0] for fila in self.storage._consultar(f'SELECT id FROM habitaciones{where} ORDER BY id{limite}',
+                                                             parametros)]
+
+
+class SqliteStorage(Storage):
+    """ Base de datos SQLite en modo WAL
+
+    Las habitaciones se guardan en {directorio}/habitaciones.db, en la
+    tabla habitaciones, con índices sobre disponible, precio y plazas,
+    su equipamiento en la tabla hija equipamiento, con un índice
+    por elemento y la posición de cada uno para conservar el orden, y
+    sus reservas en la tabla reservas, con fechas ISO y un índice por
+    fecha de inicio. La generación de la última baja se guarda en la
+    tabla meta. El precio se guarda como REAL con la columna
+    precio_entero, como PRECIO_ENTERO de MmapStorage, para devolver 50
+    y 50.0 tal como se guardaron.
+
+    Todas las sentencias son parametrizadas, el módulo sqlite3 reutiliza
+    su preparación. Con la política 'siempre' cada escritura es una
+    transacción con synchronous=FULL. Con 'grupo' y 'so' las escrituras
+    se acumulan en una transacción abierta que se confirma cada
+    `intervalo` milisegundos, con synchronous NORMAL y OFF.
+
+    Además de la interfaz de Storage admite consultas (get, ids,
+    search, libres, habitaciones), con las que el servidor puede atender los
+    listados y búsquedas sin cargar todas las habitaciones en memoria."""
+
+    ESQUEMA = (
+        'CREATE TABLE IF NOT EXISTS habitaciones (id INTEGER PRIMARY KEY, plazas INTEGER NOT NULL,'
+        ' precio REAL NOT NULL, disponible INTEGER NOT NULL, version INTEGER NOT NULL,'
+        ' precio_entero INTEGER NOT NULL DEFAULT 0)',
+        'CREATE TABLE IF NOT EXISTS equipamiento (habitacion INTEGER NOT NULL, posicion INTEGER NOT NULL,'
+        ' elemento TEXT NOT NULL, PRIMARY KEY (habitacion, posicion)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS habitaciones_disponible ON habitaciones (disponible, id)',
+        'CREATE INDEX IF NOT EXISTS habitaciones_precio ON habitaciones (precio)',
+        'CREATE INDEX IF NOT EXISTS habitaciones_plazas ON habitaciones (plazas)',
+        'CREATE INDEX IF NOT EXISTS equipamiento_elemento ON equipamiento (elemento, habitacion)',
+        'CREATE TABLE IF NOT EXISTS reservas (habitacion INTEGER NOT NULL, inicio TEXT NOT NULL, fin TEXT NOT NULL,'
+        ' PRIMARY KEY (habitacion, inicio)) WITHOUT ROWID',
+        'CREATE INDEX IF NOT EXISTS reservas_inicio ON reservas (inicio, fin, habitacion)',
+        'CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER NOT NULL)',
+    )
+    SYNCHRONOUS = {FSYNC_SIEMPRE: 'FULL', FSYNC_GRUPO: 'NORMAL', FSYNC_SO: 'OFF'}
+    LOTE_IN = 500  # IDs por consulta IN, por debajo del límite de parámetros de SQLite.
+
+    def __init__(self, directorio, fsync_policy=FSYNC_GRUPO, intervalo=10):
+        if fsync_policy not in POLITICAS_FSYNC:
+            raise ValueError(f'Política de fsync desconocida: {fsync_policy}.')
+
+        self.url = path.join(directorio, BASE_DATOS)
+        self.fsync_policy = fsync_policy
+        self.intervalo = intervalo / 1000
+
+        self._conexion = sqlite3.connect(self.url, isolation_level=None, check_same_thread=False)
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute(f'PRAGMA synchronous={self.SYNCHRONOUS[fsync_policy]}')
+        for sentencia in self.ESQUEMA:
+            self._conexion.execute(sentencia)
+        self._migrar()
+
+        self._lock = threading.Lock()
+        self._pendiente = False  # Hay una transacción abierta sin confirmar.
+        self._cerrado = threading.Event()
+
+        if self.fsync_policy != FSYNC_SIEMPRE:
+            self._hilo = threading.Thread(target=self._commit_agrupado, name='sqlite-commit', daemon=True)
+            self._hilo.start()
+
+    def _migrar(self):
+        """ Añade precio_entero a las bases de datos anteriores, con
+        precio NUMERIC, en las que los precios enteros se guardaban como
+        INTEGER. """
+
+        columnas = [fila[1] for fila in self._conexion.execute('PRAGMA table_info(habitaciones)')]
+        if 'precio_entero' not in columnas:
+            with self._conexion:
+                self._conexion.execute('BEGIN')
+                self._conexion.execute('ALTER TABLE habitaciones ADD COLUMN precio_entero INTEGER NOT NULL DEFAULT 0')
+                self._conexion.execute("UPDATE habitaciones SET precio_entero = typeof(precio) = 'integer'")
+            logging.info(f'\t\t {self.url} convertida a precio REAL con precio_entero.')
+
+    def _consultar(self, sentencia, parametros=()):
+        with self._lock:
+            return self._conexion.execute(sentencia, parametros).fetchall()
+
+    def _modificar(self, escribir):
+        with self._lock:
+            if not self._pendiente:
+                self._conexion.execute('BEGIN')
+                self._pendiente = True
+            escribir(self._conexion)
+            if self.fsync_policy == FSYNC_SIEMPRE:
+                self._conexion.execute('COMMIT')
+                self._pendiente = False
+
+    def _commit_agrupado(self):
+        while not self._cerrado.wait(self.intervalo):
+            self._sincronizar()
+
+    def _sincronizar(self):
+        with self._lock:
+            if self._pendiente:
+                self._conexion.execute('COMMIT')
+                self._pendiente = False
+
+    @staticmethod
+    def _fila(data):
+        return (data['id'], data['plazas'], float(data['precio']), int(data['disponible']), data.get('version', 0),
+                int(isinstance(data['precio'], int)))
+
+    @staticmethod
+    def _precio(precio, entero):
+        return int(precio) if entero else float(precio)
+
+    @staticmethod
+    def _guardar(conexion, datos):
+        conexion.executemany('INSERT INTO habitaciones (id, plazas, precio, disponible, version, precio_entero)'
+                             ' VALUES (?, ?, ?, ?, ?, ?)'
+                             ' ON CONFLICT (id) DO UPDATE SET plazas = excluded.plazas, precio = excluded.precio,'
+                             ' disponible = excluded.disponible, version = excluded.version,'
+                             ' precio_entero = excluded.precio_entero',
+                             [SqliteStorage._fila(data) for data in datos])
+        conexion.executemany('DELETE FROM equipamiento WHERE habitacion = ?', [(data['id'],) for data in datos])
+        conexion.executemany('INSERT INTO equipamiento (habitacion, posicion, elemento) VALUES (?, ?, ?)',
+                             [(data['id'], posicion, elemento) for data in datos
+                              for posicion, elemento in enumerate(data['equipamiento'])])
+        conexion.executemany('DELETE FROM reservas WHERE habitacion = ?', [(data['id'],) for data in datos])
+        conexion.executemany('INSERT INTO reservas (habitacion, inicio, fin) VALUES (?, ?, ?)',
+                             [(data['id'], inicio, fin) for data in datos for inicio, fin in data.get('reservas', ())])
+
+    @staticmethod
+    def _datos(fila, equipamiento, reservas):
+        return {'id': fila[0], 'plazas': fila[1], 'precio': SqliteStorage._precio(fila[2], fila[5]),
+                'equipamiento': equipamiento, 'disponible': bool(fila[3]), 'version': fila[4], 'reservas': reservas}
+
+    @staticmethod
+    def _hijas(filas):
+        """ Agrupa por habitación las filas (habitación, valor) de una
+        tabla hija ordenadas por habitación.
+
+        :returns: Función que devuelve la lista de valores de un ID,
+        llamada con IDs crecientes."""
+
+        j = 0
+
+        def valores(target_id):
+            nonlocal j
+            resultado = []
+            while j < len(filas) and filas[j][0] < target_id:
+                j += 1
+            while j < len(filas) and filas[j][0] == target_id:
+                resultado.append(filas[j][1])
+                j += 1
+            return resultado
+
+        return valores
+
+    def load(self):
+        inicio = time.perf_counter()
+        with self._lock:
+            filas = self._conexion.execute('SELECT id, plazas, precio, disponible, version, precio_entero'
+                                           ' FROM habitaciones ORDER BY id').fetchall()
+            elementos = self._conexion.execute('SELECT habitacion, elemento FROM equipamiento'
+                                               ' ORDER BY habitacion, posicion').fetchall()
+            reservas = self._conexion.execute('SELECT habitacion, inicio, fin FROM reservas'
+                                              ' ORDER BY habitacion, inicio').fetchall()
+        logging.info(f'\t\t Base de datos leída: {len(filas)} habitaciones en {time.perf_counter() - inicio:.3f}s.')
+
+        # Todas las consultas están ordenadas por habitación, se combinan en una pasada.
+        equipamiento = self._hijas(elementos)
+        calendario = self._hijas([(habitacion, [inicio, fin]) for habitacion, inicio, fin in reservas])
+        for fila in filas:
+            yield self._datos(fila, equipamiento(fila[0]), calendario(fila[0]))
+
+    def get(self, target_id):
+        datos = self.habitaciones([target_id])
+        return datos[0] if datos else None
+
+    def habitaciones(self, ids):
+        """ Lee varias habitaciones de la base de datos.
+
+        :param ids: Identificadores de las habitaciones.
+        :returns: Lista de diccionarios de las habitaciones que existen,
+        en el orden de los IDs."""
+
+        ids = list(ids)
+        filas = {}
+        equipamientos = {}
+        reservas = {}
+        for inicio in range(0, len(ids), self.LOTE_IN):
+            lote = ids[inicio:inicio + self.LOTE_IN]
+            marcas = ', '.join('?' * len(lote))
+            for fila in self._consultar(f'SELECT id, plazas, precio, disponible, version, precio_entero'
+                                        f' FROM habitaciones WHERE id IN ({marcas})', lote):
+                filas[fila[0]] = fila
+                equipamientos[fila[0]] = []
+                reservas[fila[0]] = []
+            for habitacion, elemento in self._consultar(f'SELECT habitacion, elemento FROM equipamiento'
+                                                        f' WHERE habitacion IN ({marcas})'
+                                                        f' ORDER BY habitacion, posicion', lote):
+                equipamientos[habitacion].append(elemento)
+            for habitacion, inicio, fin in self._consultar(f'SELECT habitacion, inicio, fin FROM reservas'
+                                                           f' WHERE habitacion IN ({marcas})'
+                                                           f' ORDER BY habitacion, inicio', lote):
+                reservas[habitacion].append([inicio, fin])
+        return [self._datos(filas[target_id], equipamientos[target_id], reservas[target_id])
+                for target_id in ids if target_id in filas]
+
+    def ids(self, disponible=None):
+        """ :param disponible: Disponibilidad, None para no filtrar.
+        :returns: Vista ordenada de los IDs, ver ConsultaIds."""
+
+        return ConsultaIds(self, disponible)
+
+    def generacion(self):
+        """ :returns: Mayor versión almacenada o generación de baja, 0 sin cambios. """
+
+        return self._consultar("SELECT MAX((SELECT COALESCE(MAX(version), 0) FROM habitaciones),"
+                               " (SELECT COALESCE(MAX(valor), 0) FROM meta WHERE clave = 'generacion'))")[0][0]
+
+    def search(self, precio_min=None, precio_max=None, plazas_min=None, plazas_max=None, disponible=None,
+               equipamiento=()):
+        """ Busca en SQL las habitaciones que cumplen todos los predicados.
+
+        Mismos parámetros que Registry.search, cada predicado se traduce
+        a una condición que SQLite resuelve con sus índices.
+
+        :returns: Lista de IDs ordenada."""
+
+        condiciones, parametros = [], []
+        for columna, operador, valor in (('precio', '>=', precio_min), ('precio', '<=', precio_max),
+                                         ('plazas', '>=', plazas_min), ('plazas', '<=', plazas_max)):
+            if valor is not None:
+                condiciones.append(f'{columna} {operador} ?')
+                parametros.append(valor)
+        if disponible is not None:
+            condiciones.append('disponible = ?')
+            parametros.append(int(disponible))
+        for elemento in set(equipamiento):
+            condiciones.append('id IN (SELECT habitacion FROM equipamiento WHERE elemento = ?)')
+            parametros.append(elemento)
+        where = (' WHERE ' + ' AND '.join(condiciones)) if condiciones else ''
+        return [fila[0] for fila in self._consultar(f'SELECT id FROM habitaciones{where} ORDER BY id', parametros)]
+
+    def agregados(self, limites):
+        """ Calcula en SQL los agregados de GET /estadisticas.
+
+        Recorre la tabla, solo se usa si las habitaciones no están en
+        memoria; el mínimo y el máximo de precio salen del índice.
+
+        :param limites: Límites de los intervalos del histograma de precios.
+        :returns: Diccionario con habitaciones, disponibles, plazas,
+        plazas_disponibles, suma_precio, minimo, maximo, histograma
+        (habitaciones por intervalo) y equipamiento (habitaciones con
+        cada elemento)."""
+
+        intervalo = 'CASE ' + ' '.join(f'WHEN precio < ? THEN {i}' for i in range(len(limites))) + \
+                    f' ELSE {len(limites)} END'
+        with self._lock:
+            fila = self._conexion.execute('SELECT COUNT(*), COALESCE(SUM(disponible), 0), COALESCE(SUM(plazas), 0),'
+                                          ' COALESCE(SUM(plazas * disponible), 0),'
+                                          ' COALESCE(SUM(CASE WHEN precio_entero THEN CAST(precio AS INTEGER) END), 0),'
+                                          ' SUM(CASE WHEN precio_entero THEN NULL ELSE precio END)'
+                                          ' FROM habitaciones').fetchone()
+            # Con MIN y MAX, precio_entero es el de la fila del mínimo o del máximo.
+            extremos = [self._conexion.execute(f'SELECT {funcion}(precio), precio_entero FROM habitaciones').fetchone()
+                        for funcion in ('MIN', 'MAX')]
+            histograma = [0] * (len(limites) + 1)
+            for indice, total in self._conexion.execute(f'SELECT {intervalo} AS intervalo, COUNT(*) FROM habitaciones'
+                                                        f' GROUP BY intervalo', list(limites)):
+                histograma[indice] = total
+            equipamiento = dict(self._conexion.execute('SELECT elemento, COUNT(DISTINCT habitacion) FROM equipamiento'
+                                                       ' GROUP BY elemento').fetchall())
+        return {'habitaciones': fila[0], 'disponibles': fila[1], 'plazas': fila[2], 'plazas_disponibles': fila[3],
+                'suma_precio': fila[4] if fila[5] is None else fila[4] + fila[5],
+                'minimo': None if extremos[0][0] is None else self._precio(*extremos[0]),
+                'maximo': None if extremos[1][0] is None else self._precio(*extremos[1]),
+                'histograma': histograma, 'equipamiento': equipamiento}
+
+    def libres(self, inicio, fin):
+        """ Busca en SQL las habitaciones sin reservas en un intervalo.
+
+        :param inicio: Fecha ISO de llegada, incluida.
+        :param fin: Fecha ISO de salida, excluida.
+        :returns: Lista de IDs ordenada."""
+
+        return [fila[0] for fila in self._consultar(
+            'SELECT id FROM habitaciones WHERE id NOT IN'
+            ' (SELECT habitacion FROM reservas WHERE inicio < ? AND fin > ?) ORDER BY id', (fin, inicio))]
+
+    def save(self, data):
+        self._modificar(lambda conexion: self._guardar(conexion, (data,)))
+
+    def save_many(self, datos):
+        """ Guarda todas las habitaciones en una única transacción. """
+
+        datos = list(datos)
+        if datos:
+            self._modificar(lambda conexion: self._guardar(conexion, datos))
+
+    def delete(self, target_id, generacion=0):
+        def borrar(conexion):
+            conexion.execute('DELETE FROM habitaciones WHERE id = ?', (target_id,))
+            conexion.execute('DELETE FROM equipamiento WHERE habitacion = ?', (target_id,))
+            conexion.execute('DELETE FROM reservas WHERE habitacion = ?', (target_id,))
+            conexion.execute("INSERT INTO meta (clave, valor) VALUES ('generacion', ?) ON CONFLICT (clave)"
+                             " DO UPDATE SET valor = MAX(valor, excluded.valor)", (generacion,))
+
+        self._modificar(borrar)
+
+    def snapshot(self, datos):
+        """ La base de datos ya es el estado completo, se confirma la
+        transacción pendiente y se vuelca el WAL al fichero principal. """
+
+        self._sincronizar()
+        with self._lock:
+            self._conexion.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        self._cerrado.set()
+        self._sincronizar()
+        with self._lock:
+            self._conexion.close()
+
+
+class DigestStorage(Storage):
+    """ Omite las escrituras que no cambian el estado persistido
+
+    Guarda en memoria un resumen (blake2b de 16 bytes) del último
+    estado persistido de cada habitación y solo delega en el motor
+    envuelto los save() cuyo resumen difiere, sin leer el estado
+    anterior del disco. El resumen se anota una vez escrito, un error
+    de escritura no deja la habitación como persistida. Los resúmenes
+    se siembran en load(), por lo que tras reiniciar tampoco se
+    reescriben habitaciones intactas."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._resumenes = {}  # Resumen del último estado persistido por ID.
+        self._lock = threading.Lock()
+        self._metricas = {'escrituras': 0, 'omitidas': 0}
+
+    @staticmethod
+    def _resumen(data):
+        return blake2b(dumps(data).encode(), digest_size=16).digest()
+
+    def _cambiados(self, datos):
+        cambiados = {}
+        for data in datos:
+            resumen = self._resumen(data)
+            if self._resumenes.get(data['id']) != resumen:
+                cambiados[data['id']] = resumen
+        with self._lock:
+            self._metricas['omitidas'] += len(datos) - len(cambiados)
+        return cambiados
+
+    def _persistidos(self, cambiados):
+        with self._lock:
+            self._resumenes.update(cambiados)
+            self._metricas['escrituras'] += len(cambiados)
+
+    def load(self):
+        for data in self.storage.load():
+            self._resumenes[data['id']] = self._resumen(data)
+            yield data
+
+    def get(self, target_id):
+        return self.storage.get(target_id)
+
+    def generacion(self):
+        return self.storage.generacion()
+
+    def save(self, data):
+        cambiados = self._cambiados((data,))
+        if cambiados:
+            self.storage.save(data)
+            self._persistidos(cambiados)
+
+    def delete(self, target_id, generacion=0):
+        self.storage.delete(target_id, generacion)
+        with self._lock:
+            self._resumenes.pop(target_id, None)
+            self._metricas['escrituras'] += 1
+
+    def save_many(self, datos):
+        datos = list(datos)
+        cambiados = self._cambiados(datos)
+        if cambiados:
+            self.storage.save_many([data for data in datos if data['id'] in cambiados])
+            self._persistidos(cambiados)
+
+    def snapshot(self, datos):
+        self.storage.snapshot(datos)
+
+    def stats(self):
+        with self._lock:
+            metricas = dict(self._metricas)
+        metricas.update(self.storage.stats())
+        return metricas
+
+    def close(self):
+        self.storage.close()
+
+
+class WriteBehindStorage(Storage):
+    """ Escritura diferida y coalescida sobre otro motor
+
+    save() y delete() solo anotan el último estado de cada habitación
+    en memoria y vuelven de inmediato. Un hilo vuelca los cambios
+    pendientes al motor envuelto cada `intervalo` milisegundos, o
+    antes si se acumulan `umbral` habitaciones pendientes, con una
+    sola llamada a save_many por lote. Los cambios repetidos de una
+    misma habitación entre dos volcados se escriben una única vez.
+
+    Una caída del proceso pierde los cambios pendientes, close()
+    vuelca todo lo pendiente antes de cerrar el motor envuelto. Si
+    falla un volcado, los cambios que no se han escrito vuelven a la
+    cola, salvo los de habitaciones con un cambio más reciente, y se
+    reintentan en el siguiente."""
+
+    def __init__(self, storage, intervalo=50, umbral=1000):
+        self.storage = storage
+        self.intervalo = intervalo / 1000
+        self.umbral = umbral
+        self._pendientes = {}  # Último estado de cada habitación, None si se ha eliminado.
+        self._generacion = 0  # Mayor generación de las bajas pendientes.
+        self._condicion = threading.Condition()
+        self._cerrado = False
+        self._volcado = threading.Lock()  # Serializa los volcados al motor envuelto.
+        self._metricas = {'cambios': 0, 'coalescidos': 0, 'volcados': 0, 'escritas': 0, 'errores': 0,
+                          'latencia_ultima': 0.0, 'latencia_max': 0.0, 'latencia_total': 0.0}
+        self._hilo = threading.Thread(target=self._volcar_periodicamente, name='write-behind', daemon=True)
+        self._hilo.start()
+
+    def _anotar(self, target_id, data):
+        with self._condicion:
+            self._metricas['cambios'] += 1
+            if target_id in self._pendientes:
+                self._metricas['coalescidos'] += 1
+            self._pendientes[target_id] = data
+            if len(self._pendientes) >= self.umbral:
+                self._condicion.notify()
+
+    def _volcar_periodicamente(self):
+        with self._condicion:
+            while not self._cerrado:
+                self._condicion.wait(self.intervalo)
+                if self._pendientes:
+                    self._condicion.release()
+                    try:
+                        self.flush()
+                    except Exception:
+                        logging.exception('No se han podido volcar los cambios pendientes.')
+                    finally:
+                        self._condicion.acquire()
+
+    def flush(self):
+        """ Vuelca al motor envuelto todos los cambios pendientes. """
+
+        with self._volcado:
+            with self._condicion:
+                pendientes, self._pendientes = self._pendientes, {}
+                generacion = self._generacion
+            if len(pendientes) == 0:
+                return
+
+            inicio = time.perf_counter()
+            escritos = set()
+            try:
+                self.storage.save_many([data for data in pendientes.values() if data is not None])
+                escritos.update(target_id for target_id, data in pendientes.items() if data is not None)
+                for target_id, data in pendientes.items():
+                    if data is None:
+                        # Basta con que la generación anotada no sea menor que la de cada baja.
+                        self.storage.delete(target_id, generacion)
+                        escritos.add(target_id)
+            except Exception:
+                with self._condicion:
+                    self._metricas['errores'] += 1
+                    for target_id, data in pendientes.items():
+                        if target_id not in escritos:
+                            # Un cambio anotado durante el volcado es más reciente que el que ha fallado.
+                            self._pendientes.setdefault(target_id, data)
+                raise
+            latencia = time.perf_counter() - inicio
+
+            with self._condicion:
+                self._metricas['volcados'] += 1
+                self._metricas['escritas'] += len(pendientes)
+                self._metricas['latencia_ultima'] = latencia
+                self._metricas['latencia_max'] = max(self._metricas['latencia_max'], latencia)
+                self._metricas['latencia_total'] += latencia
+
+    def load(self):
+        return self.storage.load()
+
+    def get(self, target_id):
+        with self._condicion:
+            if target_id in self._pendientes:
+                return self._pendientes[target_id]
+        return self.storage.get(target_id)
+
+    def generacion(self):
+        with self._condicion:
+            generacion = self._generacion
+        return max(generacion, self.storage.generacion())
+
+    def save(self, data):
+        self._anotar(data['id'], data)
+
+    def delete(self, target_id, generacion=0):
+        with self._condicion:
+            self._generacion = max(self._generacion, generacion)
+        self._anotar(target_id, None)
+
+    def save_many(self, datos):
+        for data in datos:
+            self._anotar(data['id'], data)
+
+    def snapshot(self, datos):
+        self.flush()
+        self.storage.snapshot(datos)
+
+    def stats(self):
+        with self._condicion:
+            metricas = dict(self._metricas)
+            metricas['cola'] = len(self._pendientes)
+        metricas['latencia_media'] = metricas['latencia_total'] / metricas['volcados'] if metricas['volcados'] else 0.0
+        metricas.update(self.storage.stats())
+        return metricas
+
+    def close(self):
+        with self._condicion:
+            self._cerrado = True
+            self._condicion.notify()
+        self._hilo.join()
+        try:
+            self.flush()
+        finally:
+            self.storage.close()
+
+
+def abrir_almacenamiento(motor, directorio, fsync_policy=FSYNC_GRUPO, intervalo=10, workers=8):
+    """ Crea el motor de almacenamiento indicado.
+
+    :param motor: 'diario', 'ficheros', 'mmap' o 'sqlite'.
+    :param directorio: Directorio donde se guardan los datos.
+    :param fsync_policy: Política de sincronización con disco.
+    :param intervalo: Milisegundos entre fsync en la política 'grupo'.
+    :param workers: Hilos de lectura del motor de ficheros.
+    :returns: Motor de almacenamiento.
+    :raises ValueError: Si el motor no existe."""
+
+    if motor == MOTOR_DIARIO:
+        return JournalStorage(directorio, fsync_policy, intervalo)
+    elif motor == MOTOR_FICHEROS:
+        return FileStorage(directorio, workers)
+    elif motor == MOTOR_MMAP:
+        return MmapStorage(directorio, fsync_policy, intervalo)
+    elif motor == MOTOR_SQLITE:
+        return SqliteStorage(directorio, fsync_policy, intervalo)
+    else:
+        raise ValueError(f'Motor de almacenamiento desconocido: {motor}.')
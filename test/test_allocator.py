@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+
+from allocator import IdAllocator
+
+
+class TestIdAllocator(unittest.TestCase):
+    """ Asignación y reutilización de identificadores """
+
+    def test_asigna_en_orden(self):
+        ids = IdAllocator()
+        self.assertEqual([ids.allocate() for _ in range(3)], [1, 2, 3])
+        self.assertEqual(len(ids), 3)
+        self.assertIn(2, ids)
+
+    def test_reutiliza_el_menor_liberado(self):
+        ids = IdAllocator()
+        for _ in range(5):
+            ids.allocate()
+        ids.release(4)
+        ids.release(2)
+        self.assertNotIn(2, ids)
+        self.assertEqual([ids.allocate() for _ in range(3)], [2, 4, 6])
+
+    def test_liberado_y_reservado_se_descarta(self):
+        ids = IdAllocator()
+        for _ in range(3):
+            ids.allocate()
+        ids.release(2)
+        self.assertEqual(ids.reserve(2), 2)
+        self.assertEqual(ids.allocate(), 4)
+
+    def test_reserva(self):
+        ids = IdAllocator()
+        self.assertEqual(ids.reserve(2), 2)
+        with self.assertRaises(IndexError):
+            ids.reserve(2)
+        # El contador salta los IDs reservados.
+        self.assertEqual([ids.allocate() for _ in range(2)], [1, 3])
+
+    def test_liberar_no_asignado(self):
+        with self.assertRaises(KeyError):
+            IdAllocator().release(1)
+
+    def test_rango(self):
+        ids = IdAllocator(11, 13)
+        self.assertEqual([ids.allocate() for _ in range(3)], [11, 12, 13])
+        with self.assertRaises(IndexError):
+            ids.allocate()
+        for target_id in (10, 14):
+            with self.subTest(target_id=target_id), self.assertRaises(IndexError):
+                ids.reserve(target_id)
+        ids.release(12)
+        self.assertEqual(ids.allocate(), 12)
+
+    def test_concurrente(self):
+        ids = IdAllocator()
+        with ThreadPoolExecutor(8) as executor:
+            asignados = list(executor.map(lambda _: ids.allocate(), range(1000)))
+        self.assertEqual(sorted(asignados), list(range(1, 1001)))
+
+
+if __name__ == '__main__':
+    unittest.main()
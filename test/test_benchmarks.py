@@ -0,0 +1,49 @@
+from json import load
+from os import path
+from tempfile import TemporaryDirectory
+import subprocess
+import sys
+import unittest
+
+from test.utilidades import puerto_libre
+
+BENCHMARKS = path.join(path.dirname(path.abspath(__file__)), '..', 'benchmarks')
+
+
+def ejecutar(script, *argumentos):
+    """ Ejecuta un benchmark y devuelve su salida estándar. """
+
+    return subprocess.run([sys.executable, path.join(BENCHMARKS, script), *argumentos], capture_output=True,
+                          text=True, check=True, timeout=120).stdout
+
+
+class TestCarga(unittest.TestCase):
+    """ La prueba de carga funciona de principio a fin con una carga mínima """
+
+    def test_resultados(self):
+        with TemporaryDirectory() as directorio:
+            salida = path.join(directorio, 'resultados.json')
+            ejecutar('bench_carga.py', '--habitaciones', '50', '--clientes', '2', '--duracion', '0.5',
+                     '--mezcla', 'habitacion=3,disponibilidad=1,alta=1', '--puerto', str(puerto_libre()),
+                     '--salida', salida)
+            with open(salida) as file:
+                resultados = load(file)
+
+        self.assertEqual(set(resultados['rutas']), {'habitacion', 'disponibilidad', 'alta'})
+        self.assertGreater(resultados['peticiones'], 0)
+        self.assertEqual(sum(ruta['peticiones'] for ruta in resultados['rutas'].values()),
+                         resultados['peticiones'])
+        for nombre, ruta in resultados['rutas'].items():
+            with self.subTest(ruta=nombre):
+                self.assertEqual(ruta['errores_5xx'], 0)
+                if ruta['peticiones']:
+                    self.assertLessEqual(ruta['p50_ms'], ruta['p95_ms'])
+                    self.assertLessEqual(ruta['p95_ms'], ruta['p99_ms'])
+
+    def test_mezcla_no_valida(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            ejecutar('bench_carga.py', '--mezcla', 'desconocida=1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+HABITACIONES = [
+    {'plazas': 1, 'precio': 40, 'equipamiento': ['TV']},
+    {'plazas': 2, 'precio': 75.5, 'equipamiento': ['TV', 'Wifi']},
+    {'plazas': 3, 'precio': 120, 'equipamiento': ['Wifi', 'Jacuzzi']},
+    {'plazas': 4, 'precio': 200, 'equipamiento': ['TV', 'Wifi', 'Jacuzzi']},
+    {'plazas': 2, 'precio': 90, 'equipamiento': []},
+]
+
+CONSULTAS = {
+    'plazas_min=3': [3, 4],
+    'precio_max=90': [1, 2, 5],
+    'precio_min=75.5&precio_max=120': [2, 3, 5],
+    'plazas_min=2&plazas_max=3&precio_max=100': [2, 5],
+    'equipamiento=Wifi': [2, 3, 4],
+    'equipamiento=Wifi&equipamiento=TV': [2, 4],
+    'equipamiento=Wifi&plazas_max=3': [2, 3],
+    'equipamiento=Cuna': [],
+    'disponible=false': [2, 4],
+    'disponible=true&equipamiento=Jacuzzi': [3],
+    '': [1, 2, 3, 4, 5],
+}
+
+
+class TestBuscar(unittest.TestCase):
+    """ GET /buscar combina los predicados con los índices del registro """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = self.abrir()
+        self.servidor = cargar_servidor(self.storage)
+        for data in HABITACIONES:
+            self.assertEqual(json(wsgi('POST', '/', data))[0], 201)
+        for target_id in (2, 4):
+            self.assertEqual(json(wsgi('PUT', f'/{target_id}/disponibilidad?disponible=false'))[0], 200)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def abrir(self):
+        return almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+
+    def comprobar(self):
+        for consulta, ids in CONSULTAS.items():
+            with self.subTest(consulta=consulta):
+                estado, cuerpo = json(wsgi('GET', f'/buscar?{consulta}'))
+                self.assertIn(estado, (200, 204))
+                self.assertEqual([int(target_id) for target_id in cuerpo or {}], ids)
+
+    def test_predicados(self):
+        self.comprobar()
+
+    def test_tras_modificar(self):
+        self.assertEqual(json(wsgi('PUT', '/1/precio?precio=130'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/1/equipamiento/add', {'equipamiento': ['Wifi']}))[0], 200)
+        self.assertEqual([int(target_id) for target_id in json(wsgi('GET', '/buscar?precio_min=100'))[1]],
+                         [1, 3, 4])
+        self.assertEqual([int(target_id) for target_id in json(wsgi('GET', '/buscar?equipamiento=Wifi'))[1]],
+                         [1, 2, 3, 4])
+        self.assertEqual(wsgi('DELETE', '/3')[0].split()[0], '200')
+        self.assertEqual([int(target_id) for target_id in json(wsgi('GET', '/buscar?equipamiento=Jacuzzi'))[1]],
+                         [4])
+
+    def test_filtros_no_validos(self):
+        for consulta in ('precio_min=barato', 'plazas_max=', 'disponible=quizas'):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(json(wsgi('GET', f'/buscar?{consulta}'))[0], 400)
+
+
+class TestBuscarSinPrecarga(TestBuscar):
+    """ Sin precarga GET /buscar se resuelve en SQL con los mismos resultados """
+
+    def abrir(self):
+        return almacenamiento.SqliteStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+
+    def test_predicados(self):
+        self.storage.close()
+        self.storage = self.abrir()
+        servidor = cargar_servidor(self.storage, consultas=self.storage)
+        self.comprobar()
+        self.assertEqual(len(servidor.registry), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
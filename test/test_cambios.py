@@ -0,0 +1,187 @@
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+import threading
+import time
+import unittest
+
+import requests
+
+from cambios import Cambios
+import router
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, puerto_libre, wsgi
+
+
+class TestCursor(unittest.TestCase):
+    """ Lectura de la secuencia de cambios a partir de un cursor """
+
+    def setUp(self):
+        self.cambios = Cambios(capacidad=3)
+        self.cambios.iniciar(10)
+
+    def publicar(self, *secuencias):
+        for secuencia in secuencias:
+            self.cambios.publicar(secuencia, 'modificacion', secuencia, ('precio',), True)
+
+    @staticmethod
+    def secuencias(eventos):
+        return [evento['secuencia'] for evento in eventos]
+
+    def test_sin_cambios(self):
+        self.assertEqual(self.cambios.leer(10), ([], False))
+
+    def test_cambios_posteriores(self):
+        self.publicar(11, 12)
+        eventos, perdidos = self.cambios.leer(10)
+        self.assertEqual((self.secuencias(eventos), perdidos), ([11, 12], False))
+        self.assertEqual(eventos[0], {'secuencia': 11, 'tipo': 'modificacion', 'id': 11, 'campos': ['precio'],
+                                      'disponible': True})
+        self.assertEqual(self.secuencias(self.cambios.leer(11)[0]), [12])
+        self.assertEqual(self.cambios.leer(12), ([], False))
+
+    def test_limite(self):
+        self.publicar(11, 12, 13)
+        self.assertEqual(self.secuencias(self.cambios.leer(10, 2)[0]), [11, 12])
+
+    def test_cursor_descartado(self):
+        self.publicar(11, 12, 13, 14, 15)
+        # Solo se conservan 13, 14 y 15: los cambios 11 y 12 se han perdido.
+        eventos, perdidos = self.cambios.leer(10)
+        self.assertEqual((self.secuencias(eventos), perdidos), ([13, 14, 15], True))
+        eventos, perdidos = self.cambios.leer(12)
+        self.assertEqual((self.secuencias(eventos), perdidos), ([13, 14, 15], False))
+
+    def test_cursor_futuro(self):
+        # Un cursor de otra ejecución, por delante de la secuencia actual.
+        self.publicar(11)
+        self.assertEqual(self.cambios.leer(50), ([], True))
+
+    def test_esperar(self):
+        hilo = threading.Timer(0.05, self.publicar, (11,))
+        hilo.start()
+        eventos, perdidos = self.cambios.esperar(10, 5)
+        hilo.join()
+        self.assertEqual((self.secuencias(eventos), perdidos), ([11], False))
+        self.assertEqual(self.cambios.esperar(11, 0.01), ([], False))
+
+
+class TestEsperasLimitadas(unittest.TestCase):
+    """ Las peticiones que esperan cambios no ocupan todos los hilos """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        self.espera, self.esperas = self.servidor.espera_cambios, self.servidor.esperas_cambios
+        self.servidor.espera_cambios = 5
+        self.servidor.esperas_cambios = threading.BoundedSemaphore(1)
+
+    def tearDown(self):
+        self.servidor.espera_cambios, self.servidor.esperas_cambios = self.espera, self.esperas
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def alta(self):
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': [], 'precio': 50}))[0], 201)
+
+    def ocupar(self):
+        """ Lanza un long-poll y espera a que ocupe la única espera. """
+
+        respuestas = []
+        hilo = threading.Thread(target=lambda: respuestas.append(json(wsgi('GET', '/cambios?since=0&timeout=5'))))
+        hilo.start()
+        limite = time.monotonic() + 5
+        while self.servidor.esperas_cambios.acquire(blocking=False):
+            self.servidor.esperas_cambios.release()
+            self.assertLess(time.monotonic(), limite)
+            time.sleep(0.01)
+        return hilo, respuestas
+
+    def test_long_poll_sin_esperas_libres(self):
+        hilo, respuestas = self.ocupar()
+        inicio = time.monotonic()
+        estado, _ = json(wsgi('GET', '/cambios?since=0&timeout=5'))
+        self.assertEqual(estado, 503)
+        self.assertLess(time.monotonic() - inicio, 1)
+
+        self.alta()
+        hilo.join(5)
+        estado, cuerpo = respuestas[0]
+        self.assertEqual((estado, cuerpo['siguiente']), (200, 1))
+
+        # Con la espera libre se vuelve a esperar.
+        self.assertTrue(self.servidor.esperas_cambios.acquire(blocking=False))
+        self.servidor.esperas_cambios.release()
+
+    def test_long_poll_con_cambios_no_espera(self):
+        self.alta()
+        self.servidor.esperas_cambios.acquire()
+        try:
+            estado, cuerpo = json(wsgi('GET', '/cambios?since=0&timeout=5'))
+        finally:
+            self.servidor.esperas_cambios.release()
+        self.assertEqual((estado, [evento['id'] for evento in cuerpo['cambios']]), (200, [1]))
+
+    def test_sin_timeout_no_cuenta(self):
+        self.servidor.esperas_cambios.acquire()
+        try:
+            estado, cuerpo = json(wsgi('GET', '/cambios?since=0&timeout=0'))
+        finally:
+            self.servidor.esperas_cambios.release()
+        self.assertEqual((estado, cuerpo['cambios']), (200, []))
+
+    def test_sse(self):
+        self.servidor.esperas_cambios.acquire()
+        try:
+            self.assertEqual(json(wsgi('GET', '/cambios?formato=sse&timeout=1'))[0], 503)
+        finally:
+            self.servidor.esperas_cambios.release()
+
+        # El flujo libera la espera al terminar.
+        self.alta()
+        estado, cuerpo = wsgi('GET', '/cambios?formato=sse&since=0&timeout=0.1')
+        self.assertTrue(estado.startswith('200'))
+        self.assertIn(b'event: cambio', cuerpo)
+        self.assertTrue(self.servidor.esperas_cambios.acquire(blocking=False))
+        self.servidor.esperas_cambios.release()
+
+    def test_sse_sin_espera(self):
+        self.alta()
+        self.alta()
+        for espera, consulta in ((5, 'timeout=0'), (0, '')):
+            with self.subTest(espera=espera, consulta=consulta):
+                self.servidor.espera_cambios = espera
+                estado, cuerpo = wsgi('GET', f'/cambios?formato=sse&since=0&{consulta}')
+                self.assertTrue(estado.startswith('200'))
+                self.assertEqual(cuerpo.count(b'event: cambio'), 2)
+                self.assertIn(b'id: 2\n', cuerpo)
+        # Sin espera no se ocupa ninguna.
+        self.assertTrue(self.servidor.esperas_cambios.acquire(blocking=False))
+        self.servidor.esperas_cambios.release()
+
+
+class TestServidorConHilos(unittest.TestCase):
+    """ Los clientes que esperan cambios no dejan sin hilos al resto """
+
+    def test_get_con_esperas_ocupadas(self):
+        with TemporaryDirectory() as directorio:
+            puerto = puerto_libre()
+            base = f'http://localhost:{puerto}'
+            proceso = router.lanzar_servidor(puerto, directorio, ['--servidor', 'hilos', '--workers', '4'])
+            try:
+                # Con 4 hilos solo espera 1 petición, el resto de long-poll responde 503 al momento.
+                with ThreadPoolExecutor(6) as executor:
+                    esperas = [executor.submit(requests.get, base + '/cambios', params={'timeout': 3}, timeout=10)
+                               for _ in range(6)]
+                    time.sleep(0.5)
+                    inicio = time.monotonic()
+                    self.assertIn(requests.get(base + '/', timeout=10).status_code, (200, 204))
+                    self.assertLess(time.monotonic() - inicio, 1)
+                    estados = sorted(espera.result().status_code for espera in esperas)
+                self.assertEqual(estados, [200] + [503] * 5)
+            finally:
+                router.detener_servidor(proceso)
+
+
+if __name__ == '__main__':
+    unittest.main()
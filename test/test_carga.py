@@ -0,0 +1,92 @@
+from json import dumps
+from os import path
+from tempfile import TemporaryDirectory
+import unittest
+
+import requests
+
+import router
+import storage as almacenamiento
+from test.utilidades import puerto_libre
+
+
+def habitacion(target_id, version=1):
+    return {'id': target_id, 'plazas': 2, 'precio': 50, 'equipamiento': ['TV'], 'disponible': True,
+            'version': version, 'reservas': []}
+
+
+class TestCargaParalela(unittest.TestCase):
+    """ Lectura en paralelo del almacenamiento por ficheros """
+
+    def test_misma_carga_con_y_sin_hilos(self):
+        with TemporaryDirectory() as directorio:
+            for target_id in range(1, 51):
+                with open(path.join(directorio, f'Habitacion{target_id}.json'), 'w') as file:
+                    file.write(dumps(habitacion(target_id, version=target_id)))
+
+            cargas = []
+            for workers in (1, 4):
+                storage = almacenamiento.FileStorage(directorio, workers)
+                cargas.append(sorted(storage.load(), key=lambda data: data['id']))
+                self.assertEqual(storage.generacion(), 50)
+            self.assertEqual(cargas[0], cargas[1])
+            self.assertEqual(len(cargas[0]), 50)
+
+
+class TestArranque(unittest.TestCase):
+    """ Instantánea al parar y reproducción del diario al arrancar """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.directorio = self._directorio.name
+        self.puerto = puerto_libre()
+        self.base = f'http://localhost:{self.puerto}'
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def lanzar(self):
+        return router.lanzar_servidor(self.puerto, self.directorio, ['--snapshot-intervalo', '0', '--fsync', 'siempre'])
+
+    def listado(self):
+        r = requests.get(self.base + '/', timeout=10)
+        return {} if r.status_code == 204 else r.json()
+
+    def test_instantanea_y_diario(self):
+        proceso = self.lanzar()
+        try:
+            for precio in (50, 60, 70):
+                r = requests.post(self.base + '/', json={'plazas': 2, 'equipamiento': ['TV'], 'precio': precio},
+                                  timeout=10)
+                self.assertEqual(r.status_code, 201)
+            self.assertEqual(requests.put(self.base + '/1/precio', params={'precio': 55}, timeout=10).status_code, 200)
+            self.assertEqual(requests.delete(self.base + '/2', timeout=10).status_code, 200)
+            esperado = self.listado()
+        finally:
+            router.detener_servidor(proceso)
+
+        # La parada consolida el diario en la instantánea.
+        self.assertTrue(path.exists(path.join(self.directorio, almacenamiento.SNAPSHOT)))
+        self.assertEqual(path.getsize(path.join(self.directorio, almacenamiento.JOURNAL)), 0)
+
+        proceso = self.lanzar()
+        try:
+            self.assertEqual(self.listado(), esperado)
+            self.assertEqual(sorted(esperado), ['1', '3'])
+            r = requests.post(self.base + '/', json={'plazas': 4, 'equipamiento': [], 'precio': 90}, timeout=10)
+            self.assertEqual(r.json()['id'], 2)
+            esperado = self.listado()
+        finally:
+            # Sin instantánea: el alta solo está en el diario.
+            proceso.kill()
+            proceso.wait()
+
+        proceso = self.lanzar()
+        try:
+            self.assertEqual(self.listado(), esperado)
+        finally:
+            router.detener_servidor(proceso)
+
+
+if __name__ == '__main__':
+    unittest.main()
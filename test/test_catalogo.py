@@ -0,0 +1,93 @@
+from tempfile import TemporaryDirectory
+import gc
+import unittest
+
+from catalogo import Catalogo
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+
+class TestCatalogo(unittest.TestCase):
+    """ Codificación compartida del equipamiento """
+
+    def setUp(self):
+        self.catalogo = Catalogo()
+
+    def test_combinaciones_compartidas(self):
+        tv_wifi = self.catalogo.codificar(['TV', 'Wifi'])
+        self.assertIs(self.catalogo.codificar(['TV', 'Wifi']), tv_wifi)
+        self.assertIsNot(self.catalogo.codificar(['Wifi', 'TV']), tv_wifi)
+        self.assertEqual(self.catalogo.decodificar(tv_wifi), ('TV', 'Wifi'))
+        self.assertIs(self.catalogo.codificar(tv_wifi), tv_wifi)
+
+    def test_anadir_y_quitar(self):
+        tv = self.catalogo.codificar(['TV'])
+        tv_wifi = self.catalogo.anadir(tv, ['Wifi', 'TV', 'Wifi'])
+        self.assertEqual(self.catalogo.decodificar(tv_wifi), ('TV', 'Wifi'))
+        self.assertIs(self.catalogo.quitar(tv_wifi, ['Wifi', 'Cuna', [1]]), tv)
+
+    def test_tipo_y_valor(self):
+        elementos = [1, True, 1.0, '1']
+        codificado = self.catalogo.codificar(elementos)
+        self.assertEqual([type(elemento) for elemento in self.catalogo.decodificar(codificado)],
+                         [int, bool, float, str])
+        self.assertEqual(len(self.catalogo), 4)
+        self.assertEqual(self.catalogo.decodificar(self.catalogo.quitar(codificado, [True])), (1, 1.0, '1'))
+
+    def test_solo_listas(self):
+        tv = self.catalogo.codificar(['TV'])
+        for valor in ('wifi', {'TV': 1}, 5, None, ['nuevo', [1]], ['nuevo', {'a': 1}]):
+            with self.subTest(valor=valor):
+                with self.assertRaises(ValueError):
+                    self.catalogo.codificar(valor)
+                with self.assertRaises(ValueError):
+                    self.catalogo.anadir(tv, valor)
+        with self.assertRaises(ValueError):
+            self.catalogo.quitar(tv, 'TV')
+        # Los elementos válidos de una lista rechazada no reciben código.
+        self.assertEqual(len(self.catalogo), 1)
+
+    def test_libera_lo_que_no_se_usa(self):
+        tv = self.catalogo.codificar(['TV'])
+        usadas = [self.catalogo.codificar(['TV', f'E{indice}']) for indice in range(100)]
+        self.assertEqual(len(self.catalogo), 101)
+        del usadas
+        gc.collect()
+        self.assertEqual(self.catalogo.decodificar(self.catalogo.codificar(['Cuna'])), ('Cuna',))
+        self.assertEqual(len(self.catalogo), 2)
+        self.assertEqual(len(self.catalogo._combinaciones), 1)
+        # Los códigos liberados se reutilizan.
+        self.assertEqual(len(self.catalogo.elementos), 101)
+        self.assertEqual(self.catalogo.decodificar(tv), ('TV',))
+
+
+class TestRutasEquipamiento(unittest.TestCase):
+    """ El equipamiento recibido tiene que ser una lista """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': 50}))[0], 201)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def test_no_listas(self):
+        for valor in ('wifi', {'TV': 1}):
+            with self.subTest(valor=valor):
+                for ruta in ('/1/equipamiento', '/1/equipamiento/add', '/1/equipamiento/eliminar'):
+                    self.assertEqual(json(wsgi('PUT', ruta, {'equipamiento': valor}))[0], 400)
+                estado, _ = wsgi('POST', '/', {'plazas': 2, 'equipamiento': valor, 'precio': 50})
+                self.assertTrue(estado.startswith('400'))
+        self.assertEqual(json(wsgi('GET', '/1'))[1]['equipamiento'], ['TV'])
+        self.assertEqual(sorted(self.servidor.registry), [1])
+
+    def test_tipos_distintos(self):
+        self.assertEqual(json(wsgi('PUT', '/1/equipamiento', {'equipamiento': [1, True, 1.0]}))[0], 200)
+        self.assertEqual(json(wsgi('GET', '/1'))[1]['equipamiento'], [1, True, 1.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+from cliente_api import ClienteHabitaciones, ErrorServidor, Habitacion
+import router
+from test.utilidades import puerto_libre
+
+
+class TestClienteHabitaciones(unittest.TestCase):
+    """ Biblioteca cliente contra un servidor real """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directorio = TemporaryDirectory()
+        puerto = puerto_libre()
+        cls.proceso = router.lanzar_servidor(puerto, cls._directorio.name, ['--snapshot-intervalo', '0'])
+        cls.cliente = ClienteHabitaciones(f'http://localhost:{puerto}')
+        cls.creadas = cls.cliente.alta_lote([{'plazas': 2, 'equipamiento': ['TV'], 'precio': precio}
+                                             for precio in range(10, 80, 10)])
+        cls.cliente.borrar(4)
+        cls.cliente.disponibilidad_lote([2, 6], False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cliente.close()
+        router.detener_servidor(cls.proceso)
+        cls._directorio.cleanup()
+
+    def ids(self, habitaciones):
+        return [habitacion.id for habitacion in habitaciones]
+
+    def test_recorrer_por_paginas(self):
+        for pagina in (1, 2, 4, 1000):
+            with self.subTest(pagina=pagina):
+                self.assertEqual(self.ids(self.cliente.recorrer(pagina=pagina)), [1, 2, 3, 5, 6, 7])
+                self.assertEqual(self.ids(self.cliente.recorrer(True, pagina)), [1, 3, 5, 7])
+                self.assertEqual(self.ids(self.cliente.recorrer(False, pagina)), [2, 6])
+
+    def test_recorrer_coincide_con_el_listado(self):
+        habitaciones = self.cliente.habitaciones()
+        self.assertEqual(list(self.cliente.recorrer(pagina=2)), habitaciones)
+        self.assertTrue(all(isinstance(habitacion, Habitacion) for habitacion in habitaciones))
+        self.assertEqual(habitaciones[0], self.creadas[0])
+
+    def test_totales(self):
+        self.assertEqual((self.cliente.total(True), self.cliente.total(False)), (4, 2))
+        self.assertEqual(self.ids(self.cliente.ocupadas()), [2, 6])
+
+    def test_errores(self):
+        with self.assertRaises(ErrorServidor) as contexto:
+            self.cliente.habitacion(99)
+        self.assertEqual(contexto.exception.status, 404)
+        with self.assertRaises(ErrorServidor) as contexto:
+            self.cliente.alta(-1, [], 50)
+        self.assertEqual(contexto.exception.status, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from aiohttp import web
+
+from cliente_api import ErrorServidor
+from cliente_async import ClienteAsincrono
+
+
+class TestReintentos(unittest.IsolatedAsyncioTestCase):
+    """ Solo se reintentan las peticiones idempotentes """
+
+    async def asyncSetUp(self):
+        self.recibidas = []
+
+        async def fallar(peticion):
+            self.recibidas.append(peticion.method)
+            return web.json_response({'error_description': 'No disponible'}, status=503)
+
+        app = web.Application()
+        app.router.add_route('*', '/{ruta:.*}', fallar)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        sitio = web.TCPSite(self.runner, 'localhost', 0)
+        await sitio.start()
+        puerto = self.runner.addresses[0][1]
+        self.cliente = ClienteAsincrono(f'http://localhost:{puerto}/', reintentos=2, espera=0)
+        await self.cliente.__aenter__()
+
+    async def asyncTearDown(self):
+        await self.cliente.close()
+        await self.runner.cleanup()
+
+    async def comprobar(self, corrutina, peticiones):
+        with self.assertRaises(ErrorServidor) as contexto:
+            await corrutina
+        self.assertEqual(contexto.exception.status, 503)
+        self.assertEqual(len(self.recibidas), peticiones)
+
+    async def test_get_se_reintenta(self):
+        await self.comprobar(self.cliente.habitacion(1), 3)
+
+    async def test_put_y_delete_se_reintentan(self):
+        await self.comprobar(self.cliente.modificar_precio(1, 120), 3)
+        await self.comprobar(self.cliente.cancelar_reserva(1, '2026-03-12'), 6)
+
+    async def test_alta_no_se_reintenta(self):
+        await self.comprobar(self.cliente.alta(2, ['TV'], 50), 1)
+
+    async def test_reserva_no_se_reintenta(self):
+        await self.comprobar(self.cliente.reservar(1, '2026-03-12', '2026-03-15'), 1)
+
+    async def test_reintento_explicito(self):
+        await self.comprobar(self.cliente._peticion('POST', '', reintentar=True, json={}), 3)
+        await self.comprobar(self.cliente._peticion('GET', '', reintentar=False), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
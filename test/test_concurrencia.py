@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
+import unittest
+
+import requests
+
+import router
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, puerto_libre, wsgi
+
+
+class TestCerrojosPorHabitacion(unittest.TestCase):
+    """ Las escrituras concurrentes sobre una habitación no se pierden """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def test_modificaciones_de_una_habitacion(self):
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': [], 'precio': 50}))[0], 201)
+        version = self.servidor.registry[1].version
+
+        def anadir(indice):
+            return json(wsgi('PUT', '/1/equipamiento/add', {'equipamiento': [f'E{indice}']}))[0]
+
+        with ThreadPoolExecutor(8) as executor:
+            self.assertEqual(set(executor.map(anadir, range(200))), {200})
+
+        room = self.servidor.registry[1]
+        self.assertEqual(sorted(room.elementos()), sorted(f'E{indice}' for indice in range(200)))
+        self.assertEqual(room.version, version + 200)
+
+        # El último registro persistido es el estado en memoria.
+        self.storage.close()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.assertEqual(list(self.storage.load()), [room.to_dict()])
+
+    def test_altas_concurrentes(self):
+        def alta(precio):
+            estado, cuerpo = json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': precio}))
+            self.assertEqual(estado, 201)
+            return cuerpo['id']
+
+        with ThreadPoolExecutor(8) as executor:
+            ids = list(executor.map(alta, range(200)))
+        self.assertEqual(sorted(ids), list(range(1, 201)))
+        self.assertEqual(len(self.servidor.registry), 200)
+        self.assertEqual(json(wsgi('GET', '/disponibles/total'))[1], {'total': 200})
+        self.assertEqual(self.servidor.registry.generation, 200)
+
+
+class TestServidorConHilos(unittest.TestCase):
+    """ Servidor con grupo de hilos atendiendo peticiones en paralelo """
+
+    def test_peticiones_en_paralelo(self):
+        with TemporaryDirectory() as directorio:
+            puerto = puerto_libre()
+            base = f'http://localhost:{puerto}'
+            proceso = router.lanzar_servidor(puerto, directorio, ['--servidor', 'hilos', '--workers', '4'])
+            try:
+                requests.post(base + '/', json={'plazas': 2, 'equipamiento': [], 'precio': 50}, timeout=10)
+
+                def anadir(indice):
+                    return requests.put(base + '/1/equipamiento/add', json={'equipamiento': [f'E{indice}']},
+                                        timeout=10).status_code
+
+                with ThreadPoolExecutor(8) as executor:
+                    self.assertEqual(set(executor.map(anadir, range(50))), {200})
+                equipamiento = requests.get(base + '/1/equipamiento', timeout=10).json()
+                self.assertEqual(sorted(equipamiento), sorted(f'E{indice}' for indice in range(50)))
+            finally:
+                router.detener_servidor(proceso)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+
+class TestIndicesDisponibilidad(unittest.TestCase):
+    """ Listados y totales de ocupadas y disponibles tras cada cambio """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        for _ in range(4):
+            self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': [], 'precio': 50}))[0], 201)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def comprobar(self, ocupadas, disponibles):
+        for ruta, ids in (('/ocupadas', ocupadas), ('/disponibles', disponibles)):
+            with self.subTest(ruta=ruta):
+                estado, cuerpo = json(wsgi('GET', ruta))
+                self.assertIn(estado, (200, 204))
+                self.assertEqual(sorted(cuerpo or {}, key=int), [str(target_id) for target_id in ids])
+                self.assertEqual(json(wsgi('GET', ruta + '/total')), (200, {'total': len(ids)}))
+
+    def test_altas(self):
+        self.comprobar([], [1, 2, 3, 4])
+
+    def test_cambio_de_disponibilidad(self):
+        self.assertEqual(json(wsgi('PUT', '/2/disponibilidad?disponible=false')), (200, False))
+        self.assertEqual(json(wsgi('PUT', '/4/disponibilidad?disponible=false')), (200, False))
+        self.comprobar([2, 4], [1, 3])
+        # Repetir el mismo valor no cambia los índices.
+        self.assertEqual(json(wsgi('PUT', '/2/disponibilidad?disponible=false')), (200, False))
+        self.assertEqual(json(wsgi('PUT', '/4/disponibilidad?disponible=true')), (200, True))
+        self.comprobar([2], [1, 3, 4])
+        self.assertEqual(json(wsgi('PUT', '/3/disponibilidad?disponible=quizas'))[0], 400)
+        self.comprobar([2], [1, 3, 4])
+
+    def test_baja(self):
+        self.assertEqual(json(wsgi('PUT', '/2/disponibilidad?disponible=false'))[0], 200)
+        # Una habitación ocupada no se puede eliminar.
+        self.assertEqual(wsgi('DELETE', '/2')[0].split()[0], '409')
+        self.assertEqual(wsgi('DELETE', '/3')[0].split()[0], '200')
+        self.comprobar([2], [1, 4])
+
+    def test_lote(self):
+        estado, _ = json(wsgi('PUT', '/lote/disponibilidad', {'ids': [1, 3], 'disponible': False}))
+        self.assertEqual(estado, 200)
+        self.comprobar([1, 3], [2, 4])
+
+
+class TestIndicesSinPrecarga(unittest.TestCase):
+    """ Sin precarga los totales se cuentan en SQL """
+
+    def test_totales(self):
+        with TemporaryDirectory() as directorio:
+            storage = almacenamiento.SqliteStorage(directorio, almacenamiento.FSYNC_SO)
+            cargar_servidor(storage)
+            for _ in range(3):
+                json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': [], 'precio': 50}))
+            json(wsgi('PUT', '/1/disponibilidad?disponible=false'))
+            storage.close()
+
+            storage = almacenamiento.SqliteStorage(directorio, almacenamiento.FSYNC_SO)
+            servidor = cargar_servidor(storage, consultas=storage)
+            try:
+                self.assertEqual(json(wsgi('GET', '/ocupadas/total')), (200, {'total': 1}))
+                self.assertEqual(json(wsgi('GET', '/disponibles/total')), (200, {'total': 2}))
+                self.assertEqual(len(servidor.registry), 0)
+            finally:
+                storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+from bisect import bisect_right
+from collections import Counter
+from tempfile import TemporaryDirectory
+import unittest
+
+from estadisticas import LIMITES_PRECIO
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, pedir, wsgi
+
+
+def calcular(habitaciones):
+    """ Recalcula desde cero las estadísticas de GET /estadisticas.
+
+    :param habitaciones: Diccionarios de las habitaciones.
+    :returns: Diccionario de estadísticas."""
+
+    habitaciones = list(habitaciones)
+    precios = [data['precio'] for data in habitaciones]
+    disponibles = [data for data in habitaciones if data['disponible']]
+    plazas = sum(data['plazas'] for data in habitaciones)
+    plazas_disponibles = sum(data['plazas'] for data in disponibles)
+    histograma = [0] * (len(LIMITES_PRECIO) + 1)
+    for precio in precios:
+        histograma[bisect_right(LIMITES_PRECIO, precio)] += 1
+    equipamiento = Counter(elemento for data in habitaciones for elemento in data['equipamiento'])
+    return {
+        'habitaciones': len(habitaciones), 'disponibles': len(disponibles),
+        'ocupadas': len(habitaciones) - len(disponibles),
+        'ocupacion': (len(habitaciones) - len(disponibles)) / len(habitaciones) if habitaciones else 0.0,
+        'plazas': {'total': plazas, 'disponibles': plazas_disponibles, 'ocupadas': plazas - plazas_disponibles},
+        'precio': {'medio': sum(precios) / len(precios) if precios else None,
+                   'minimo': min(precios, default=None), 'maximo': max(precios, default=None)},
+        'histograma_precio': [{'desde': desde, 'hasta': hasta, 'habitaciones': total} for desde, hasta, total
+                              in zip((0,) + LIMITES_PRECIO, LIMITES_PRECIO + (None,), histograma)],
+        'equipamiento': dict(sorted(equipamiento.items(), key=lambda par: (-par[1], par[0]))),
+    }
+
+
+class TestEstadisticas(unittest.TestCase):
+    """ Los agregados de GET /estadisticas siguen a cada alta, modificación y baja """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = self.abrir()
+        self.servidor = cargar_servidor(self.storage)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def abrir(self):
+        return almacenamiento.SqliteStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+
+    def comprobar(self):
+        estado, cuerpo = json(wsgi('GET', '/estadisticas'))
+        self.assertEqual(estado, 200)
+        esperadas = calcular(room.to_dict() for room in self.servidor.registry.values())
+        self.assertEqual(cuerpo, esperadas)
+        return cuerpo
+
+    def poblar(self):
+        for plazas, precio, equipamiento in ((1, 20, ['TV']), (2, 75.5, ['TV', 'Wifi']), (4, 150, ['Wifi']),
+                                             (3, 1200, [])):
+            estado, _ = json(wsgi('POST', '/', {'plazas': plazas, 'equipamiento': equipamiento, 'precio': precio}))
+            self.assertEqual(estado, 201)
+
+    def test_vacio(self):
+        self.assertEqual(self.comprobar()['precio'], {'medio': None, 'minimo': None, 'maximo': None})
+
+    def test_altas_modificaciones_y_bajas(self):
+        self.poblar()
+        self.assertEqual(self.comprobar()['habitaciones'], 4)
+
+        self.assertEqual(json(wsgi('PUT', '/2/disponibilidad?disponible=false'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/1/precio?precio=30.25'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/3/plazas?plazas=6'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/4/equipamiento/add', {'equipamiento': ['Jacuzzi', 'TV']}))[0], 200)
+        estadisticas = self.comprobar()
+        self.assertEqual((estadisticas['ocupadas'], estadisticas['plazas']['ocupadas']), (1, 2))
+        self.assertEqual(estadisticas['equipamiento'], {'TV': 3, 'Wifi': 2, 'Jacuzzi': 1})
+
+        self.assertEqual(json(wsgi('PUT', '/lote', {'cambios': [{'id': 1, 'precio': 20}, {'id': 4, 'plazas': 1}]}))[0],
+                         200)
+        self.assertEqual(json(wsgi('PUT', '/4/equipamiento/eliminar', {'equipamiento': ['TV']}))[0], 200)
+        self.comprobar()
+
+        self.assertEqual(wsgi('DELETE', '/3')[0].split()[0], '200')
+        self.assertEqual(wsgi('DELETE', '/1')[0].split()[0], '200')
+        estadisticas = self.comprobar()
+        self.assertEqual(estadisticas['precio'], {'medio': (75.5 + 1200) / 2, 'minimo': 75.5, 'maximo': 1200})
+
+    def test_etag(self):
+        self.poblar()
+        estado, cabeceras, _ = pedir('/estadisticas')
+        self.assertEqual(estado, 200)
+        etag = {'HTTP_IF_NONE_MATCH': cabeceras['Etag']}
+        self.assertEqual(wsgi('GET', '/estadisticas', cabeceras=etag)[0].split()[0], '304')
+        self.assertEqual(json(wsgi('PUT', '/1/precio?precio=25'))[0], 200)
+        self.assertEqual(json(wsgi('GET', '/estadisticas', cabeceras=etag))[0], 200)
+
+    def test_sin_precarga(self):
+        self.poblar()
+        self.assertEqual(json(wsgi('PUT', '/2/disponibilidad?disponible=false'))[0], 200)
+        self.assertEqual(wsgi('DELETE', '/1')[0].split()[0], '200')
+        esperadas = self.comprobar()
+
+        # Calculadas en SQL coinciden con las mantenidas en memoria.
+        self.storage.close()
+        self.storage = self.abrir()
+        servidor = cargar_servidor(self.storage, consultas=self.storage)
+        self.assertEqual(json(wsgi('GET', '/estadisticas'))[1], esperadas)
+        self.assertEqual(len(servidor.registry), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
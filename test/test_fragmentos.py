@@ -0,0 +1,94 @@
+from json import loads
+from tempfile import TemporaryDirectory
+import unittest
+
+from allocator import IdAllocator
+from fragmentos import Fragmentos
+from room import Room
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+
+class TestFragmentos(unittest.TestCase):
+    """ Un fragmento vale mientras no cambie la versión de la habitación """
+
+    def test_versiones(self):
+        Room.allocator = IdAllocator()
+        room = Room(2, ['TV'], 50)
+        fragmentos = Fragmentos()
+        texto = fragmentos.json(room)
+        self.assertEqual(texto, room.to_json())
+        self.assertIs(fragmentos.json(room), texto)
+
+        room.precio, room.version = 60, room.version + 1
+        self.assertEqual(loads(fragmentos.json(room))['precio'], 60)
+        fragmentos.descartar(room.id)
+        fragmentos.descartar(room.id)
+        self.assertEqual(len(fragmentos), 0)
+
+
+class TestInvalidacion(unittest.TestCase):
+    """ Los listados reflejan cada modificación y baja """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        for precio in (50, 60, 70):
+            self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': precio}))[0],
+                             201)
+        # Llena la caché con los fragmentos de todas las habitaciones.
+        self.listado()
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def listado(self, ruta='/'):
+        estado, cuerpo = json(wsgi('GET', ruta))
+        self.assertEqual(estado, 200)
+        return {int(target_id): data for target_id, data in cuerpo.items()}
+
+    def comprobar(self):
+        """ El listado coincide con la serialización actual del registro. """
+
+        listado = self.listado()
+        self.assertEqual(listado, {room.id: room.to_dict() for room in self.servidor.registry.values()})
+        for target_id, data in listado.items():
+            self.assertEqual(json(wsgi('GET', f'/{target_id}'))[1], data)
+        return listado
+
+    def test_modificaciones(self):
+        self.assertEqual(json(wsgi('PUT', '/1/precio?precio=55'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/2/plazas?plazas=4'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/3/equipamiento/add', {'equipamiento': ['Wifi']}))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/1/disponibilidad?disponible=false'))[0], 200)
+        listado = self.comprobar()
+        self.assertEqual((listado[1]['precio'], listado[1]['disponible']), (55, False))
+        self.assertEqual(listado[2]['plazas'], 4)
+        self.assertEqual(listado[3]['equipamiento'], ['TV', 'Wifi'])
+        self.assertEqual(list(self.listado('/ocupadas')), [1])
+
+        self.assertEqual(json(wsgi('PUT', '/lote', {'cambios': [{'id': 2, 'precio': 90}, {'id': 3, 'plazas': 1}]}))[0],
+                         200)
+        self.assertEqual(json(wsgi('PUT', '/3/equipamiento/eliminar', {'equipamiento': ['TV']}))[0], 200)
+        listado = self.comprobar()
+        self.assertEqual((listado[2]['precio'], listado[3]['plazas'], listado[3]['equipamiento']), (90, 1, ['Wifi']))
+
+    def test_bajas(self):
+        self.assertEqual(wsgi('DELETE', '/2')[0].split()[0], '200')
+        self.assertEqual(list(self.comprobar()), [1, 3])
+        self.assertEqual(len(self.servidor.fragmentos), 2)
+        self.assertEqual(json(wsgi('GET', '/2'))[0], 404)
+
+    def test_id_reutilizado(self):
+        # La nueva habitación reutiliza el ID con la misma versión que la borrada.
+        self.assertEqual(wsgi('DELETE', '/2')[0].split()[0], '200')
+        estado, cuerpo = json(wsgi('POST', '/', {'plazas': 5, 'equipamiento': [], 'precio': 99}))
+        self.assertEqual((estado, cuerpo['id']), (201, 2))
+        listado = self.comprobar()
+        self.assertEqual((listado[2]['plazas'], listado[2]['precio'], listado[2]['equipamiento']), (5, 99, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+import requests
+
+import router
+import storage as almacenamiento
+from test.utilidades import puerto_libre
+
+
+def habitacion(target_id, version):
+    return {'id': target_id, 'plazas': 2, 'precio': 50, 'equipamiento': ['TV'], 'disponible': True,
+            'version': version, 'reservas': []}
+
+
+class TestGeneracionPersistida(unittest.TestCase):
+    """ La generación no retrocede al eliminar las habitaciones más recientes """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.directorio = self._directorio.name
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def abrir(self, motor, envoltorio=None):
+        storage = almacenamiento.abrir_almacenamiento(motor, self.directorio, almacenamiento.FSYNC_SO)
+        return storage if envoltorio is None else envoltorio(storage)
+
+    def comprobar(self, motor, envoltorio=None):
+        storage = self.abrir(motor, envoltorio)
+        for version in (1, 2, 3):
+            storage.save(habitacion(version, version))
+        storage.delete(3, 4)
+        storage.delete(2, 5)
+        storage.close()
+
+        storage = self.abrir(motor, envoltorio)
+        self.assertEqual([data['id'] for data in storage.load()], [1])
+        self.assertEqual(storage.generacion(), 5)
+        storage.close()
+
+    def test_motores(self):
+        for motor in almacenamiento.MOTORES:
+            for envoltorio in (None, almacenamiento.DigestStorage, almacenamiento.WriteBehindStorage):
+                with self.subTest(motor=motor, envoltorio=envoltorio), TemporaryDirectory() as directorio:
+                    self.directorio = directorio
+                    self.comprobar(motor, envoltorio)
+
+    def test_instantanea_del_diario(self):
+        storage = self.abrir(almacenamiento.MOTOR_DIARIO)
+        storage.save(habitacion(1, 1))
+        storage.save(habitacion(2, 2))
+        storage.delete(2, 3)
+        storage.snapshot(lambda: [habitacion(1, 1)])
+        storage.close()
+
+        storage = self.abrir(almacenamiento.MOTOR_DIARIO)
+        self.assertEqual(len(list(storage.load())), 1)
+        self.assertEqual(storage.generacion(), 3)
+        storage.close()
+
+    def test_sin_bajas_es_la_mayor_version(self):
+        for motor in almacenamiento.MOTORES:
+            with self.subTest(motor=motor), TemporaryDirectory() as directorio:
+                self.directorio = directorio
+                storage = self.abrir(motor)
+                storage.save(habitacion(1, 7))
+                storage.save(habitacion(2, 4))
+                storage.close()
+
+                storage = self.abrir(motor)
+                list(storage.load())
+                self.assertEqual(storage.generacion(), 7)
+                storage.close()
+
+
+class TestETagTrasReiniciar(unittest.TestCase):
+    """ Las ETag de las habitaciones y los listados no se repiten tras reiniciar el servidor """
+
+    def comprobar(self, *argumentos):
+        with TemporaryDirectory() as directorio:
+            puerto = puerto_libre()
+            base = f'http://localhost:{puerto}'
+            proceso = router.lanzar_servidor(puerto, directorio, argumentos)
+            try:
+                for _ in range(2):
+                    requests.post(base + '/', json={'plazas': 2, 'equipamiento': ['TV'], 'precio': 50})
+                etag_borrada = requests.get(base + '/2').headers['ETag']
+                self.assertEqual(requests.delete(base + '/2').status_code, 200)
+                etag_listado = requests.get(base + '/').headers['ETag']
+            finally:
+                router.detener_servidor(proceso)
+
+            proceso = router.lanzar_servidor(puerto, directorio, argumentos)
+            try:
+                self.assertEqual(requests.get(base + '/').headers['ETag'], etag_listado)
+                self.assertEqual(requests.post(base + '/', json={'plazas': 4, 'equipamiento': [],
+                                                                 'precio': 90}).json()['id'], 2)
+                r = requests.get(base + '/2', headers={'If-None-Match': etag_borrada})
+                self.assertEqual(r.status_code, 200)
+                self.assertNotEqual(r.headers['ETag'], etag_borrada)
+                self.assertNotEqual(requests.get(base + '/').headers['ETag'], etag_listado)
+            finally:
+                router.detener_servidor(proceso)
+
+    def test_diario(self):
+        self.comprobar('--almacenamiento', 'diario')
+
+    def test_mmap(self):
+        self.comprobar('--almacenamiento', 'mmap')
+
+    def test_sqlite(self):
+        self.comprobar('--almacenamiento', 'sqlite')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import random
+import unittest
+
+from indexes import IntervalIndex
+
+
+class TestIntervalIndex(unittest.TestCase):
+    """ Consultas de solapamiento frente a una búsqueda exhaustiva """
+
+    @staticmethod
+    def solapan(intervalos, inicio, fin):
+        return {target_id for target_id, propios in intervalos.items()
+                for comienzo, final in propios if comienzo < fin and final > inicio}
+
+    def comprobar(self, indice, intervalos):
+        for inicio in range(-5, 130, 3):
+            for duracion in (1, 2, 7, 40):
+                with self.subTest(inicio=inicio, fin=inicio + duracion):
+                    self.assertEqual(indice.ids(inicio, inicio + duracion),
+                                     self.solapan(intervalos, inicio, inicio + duracion))
+        self.assertEqual(len(indice), sum(len(propios) for propios in intervalos.values()))
+
+    def test_aleatorio(self):
+        aleatorio = random.Random(7)
+        indice, intervalos = IntervalIndex(), {}
+        for _ in range(300):
+            target_id = aleatorio.randrange(40)
+            propios = set()
+            for _ in range(aleatorio.randrange(4)):
+                inicio = aleatorio.randrange(120)
+                propios.add((inicio, inicio + aleatorio.choice((1, 1, 2, 3, 5, 8, 13, 60))))
+            indice.update(target_id, propios)
+            if propios:
+                intervalos[target_id] = propios
+            else:
+                intervalos.pop(target_id, None)
+        for target_id in list(intervalos)[::3]:
+            indice.remove(target_id)
+            del intervalos[target_id]
+        self.comprobar(indice, intervalos)
+
+    def test_bordes(self):
+        indice = IntervalIndex()
+        indice.update(1, [(10, 12)])
+        self.assertEqual(indice.ids(12, 14), set())
+        self.assertEqual(indice.ids(8, 10), set())
+        self.assertEqual(indice.ids(11, 12), {1})
+        self.assertEqual(IntervalIndex().ids(0, 10), set())
+
+    def test_una_reserva_larga_no_recorre_las_cortas(self):
+        indice = IntervalIndex()
+        for target_id in range(1000):
+            indice.update(target_id, [(target_id * 2, target_id * 2 + 1)])
+        indice.update(5000, [(0, 5000)])
+        self.assertEqual(indice.ids(1500, 1502), {750, 5000})
+
+        # Solo se recorren los intervalos de la clase de la reserva larga y los cortos cercanos.
+        recorridos = []
+        for clase, entradas in indice._clases.items():
+            entradas = _Contador(entradas, recorridos)
+            indice._clases[clase] = entradas
+        indice.ids(1500, 1502)
+        self.assertLess(sum(recorridos), 10)
+        indice.remove(5000)
+        self.assertEqual(len(indice._clases), 1)
+
+
+class _Contador(list):
+    """ Lista que anota cuántos elementos se leen con cada porción """
+
+    def __init__(self, entradas, recorridos):
+        super().__init__(entradas)
+        self.recorridos = recorridos
+
+    def __getitem__(self, indice):
+        elementos = super().__getitem__(indice)
+        if isinstance(indice, slice):
+            self.recorridos.append(len(elementos))
+        return elementos
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+from json import loads
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, pedir, wsgi
+
+
+class TestPaginacion(unittest.TestCase):
+    """ Listados paginados por cursor y en NDJSON """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        for precio in range(10, 80, 10):
+            self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': [], 'precio': precio}))[0], 201)
+        self.assertEqual(wsgi('DELETE', '/4')[0].split()[0], '200')
+        self.assertEqual(json(wsgi('PUT', '/6/disponibilidad?disponible=false'))[0], 200)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def paginas(self, ruta, limit):
+        """ Recorre un listado siguiendo X-Next-Cursor. """
+
+        paginas = []
+        after = None
+        while True:
+            consulta = f'{ruta}?limit={limit}' + ('' if after is None else f'&after={after}')
+            estado, cabeceras, cuerpo = pedir(consulta)
+            self.assertEqual(estado, 200)
+            pagina = loads(cuerpo)
+            self.assertLessEqual(len(pagina), limit)
+            paginas.append([int(target_id) for target_id in pagina])
+            after = cabeceras.get('X-Next-Cursor')
+            if after is None:
+                return paginas
+            self.assertEqual(after, str(paginas[-1][-1]))
+
+    def test_cursor(self):
+        self.assertEqual(self.paginas('/', 2), [[1, 2], [3, 5], [6, 7]])
+        self.assertEqual(self.paginas('/', 4), [[1, 2, 3, 5], [6, 7]])
+        self.assertEqual(self.paginas('/disponibles', 3), [[1, 2, 3], [5, 7]])
+        self.assertEqual(self.paginas('/ocupadas', 3), [[6]])
+
+    def test_cursor_borrado(self):
+        # Un cursor que ya no existe sigue siendo una posición válida.
+        self.assertEqual(list(json(wsgi('GET', '/?limit=2&after=4'))[1]), ['5', '6'])
+        self.assertEqual(json(wsgi('GET', '/?limit=2&after=99'))[1], {})
+
+    def test_sin_paginacion(self):
+        estado, cabeceras, cuerpo = pedir('/')
+        self.assertEqual((estado, list(loads(cuerpo))), (200, ['1', '2', '3', '5', '6', '7']))
+        self.assertNotIn('X-Next-Cursor', cabeceras)
+
+    def test_ndjson(self):
+        estado, cabeceras, cuerpo = pedir('/?formato=ndjson')
+        self.assertEqual(estado, 200)
+        self.assertTrue(cabeceras['Content-Type'].startswith('application/x-ndjson'))
+        habitaciones = [loads(linea) for linea in cuerpo.splitlines()]
+        self.assertEqual([data['id'] for data in habitaciones], [1, 2, 3, 5, 6, 7])
+        self.assertEqual(habitaciones[0], json(wsgi('GET', '/1'))[1])
+
+        cuerpo = pedir('/disponibles?formato=ndjson&after=2&limit=2')[2]
+        self.assertEqual([loads(linea)['id'] for linea in cuerpo.splitlines()], [3, 5])
+
+    def test_parametros_no_validos(self):
+        for consulta in ('limit=0', 'limit=-1', 'limit=a', 'after=a'):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(json(wsgi('GET', f'/?{consulta}'))[0], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
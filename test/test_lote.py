@@ -0,0 +1,56 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+
+class TestLote(unittest.TestCase):
+    """ Validación de las rutas por lotes """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        habitaciones = [{'plazas': 2, 'equipamiento': ['TV'], 'precio': 50} for _ in range(2)]
+        self.assertEqual(json(wsgi('POST', '/lote', {'habitaciones': habitaciones}))[0], 201)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def test_alta_con_precio_decimal(self):
+        estado, cuerpo = json(wsgi('POST', '/lote', {'habitaciones': [
+            {'plazas': 2, 'equipamiento': [], 'precio': 80.5}]}))
+        self.assertEqual(estado, 201)
+        self.assertEqual(cuerpo['resultados'][0]['habitacion']['precio'], 80.5)
+
+    def test_alta_rechaza_precios_no_validos(self):
+        for precio in (-1, True, 'abc', None, [1]):
+            with self.subTest(precio=precio):
+                estado, _ = json(wsgi('POST', '/lote', {'habitaciones': [
+                    {'plazas': 2, 'equipamiento': [], 'precio': precio}]}))
+                self.assertEqual(estado, 400)
+        self.assertEqual(len(self.servidor.registry), 2)
+
+    def test_modificacion_con_precio_decimal(self):
+        estado, cuerpo = json(wsgi('PUT', '/lote', {'cambios': [{'id': 1, 'precio': 99.5}]}))
+        self.assertEqual(estado, 200)
+        self.assertEqual(self.servidor.registry[1].precio, 99.5)
+
+    def test_ids_que_no_son_enteros(self):
+        for target_id in (True, 1.0, '1'):
+            with self.subTest(id=target_id):
+                estado, cuerpo = json(wsgi('PUT', '/lote/disponibilidad', {'ids': [target_id], 'disponible': False}))
+                self.assertEqual(estado, 400)
+                self.assertEqual(cuerpo['errores'][0]['status'], 404)
+
+                estado, cuerpo = json(wsgi('PUT', '/lote', {'cambios': [{'id': target_id, 'precio': 70}]}))
+                self.assertEqual(estado, 400)
+                self.assertEqual(cuerpo['errores'][0]['status'], 404)
+        self.assertTrue(self.servidor.registry[1].disponible)
+        self.assertEqual(self.servidor.registry[1].precio, 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+from metricas import CONTENT_TYPE, Histograma, Metricas
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, pedir, wsgi
+
+
+def muestras(texto):
+    """ :param texto: Métricas en el formato de texto de Prometheus.
+    :returns: Diccionario de valores por nombre y etiquetas de cada muestra."""
+
+    valores = {}
+    for linea in texto.splitlines():
+        if linea and not linea.startswith('#'):
+            muestra, _, valor = linea.rpartition(' ')
+            valores[muestra] = float(valor)
+    return valores
+
+
+class TestHistograma(unittest.TestCase):
+    """ Exportación de histogramas y medidores """
+
+    def test_recuentos_acumulados(self):
+        histograma = Histograma((0.1, 1.0))
+        for valor in (0.05, 0.1, 0.5, 3):
+            histograma.observar(valor)
+        self.assertEqual(list(histograma.muestras('latencia', ruta='/')), [
+            'latencia_bucket{ruta="/",le="0.1"} 2',
+            'latencia_bucket{ruta="/",le="1.0"} 3',
+            'latencia_bucket{ruta="/",le="+Inf"} 4',
+            'latencia_sum{ruta="/"} 3.65',
+            'latencia_count{ruta="/"} 4',
+        ])
+
+    def test_medidores_y_escapado(self):
+        metricas = Metricas('prueba')
+        metricas.medidor('total', 'Total.', lambda: 3)
+        metricas.medidor('estado', 'Por tipo.', lambda: {'a"b': 1, 'c\\d': 2.5})
+        metricas.observar('escritura', 0.002)
+        valores = muestras(metricas.exportar())
+        self.assertEqual(valores['prueba_total'], 3)
+        self.assertEqual(valores['prueba_estado{tipo="a\\"b"}'], 1)
+        self.assertEqual(valores['prueba_estado{tipo="c\\\\d"}'], 2.5)
+        self.assertEqual(valores['prueba_paso_segundos_count{paso="escritura"}'], 1)
+
+
+class TestRutaMetrics(unittest.TestCase):
+    """ GET /metrics cuenta las peticiones por plantilla de ruta y estado """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def metricas(self):
+        estado, cabeceras, cuerpo = pedir('/metrics')
+        self.assertEqual((estado, cabeceras['Content-Type']), (200, CONTENT_TYPE))
+        return muestras(cuerpo.decode())
+
+    def test_peticiones_y_medidores(self):
+        # Las métricas son globales del módulo, se comparan diferencias.
+        antes = self.metricas()
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': 50}))[0], 201)
+        self.assertEqual(json(wsgi('PUT', '/1/precio?precio=60'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/1/precio?precio=60'))[0], 200)
+        self.assertEqual(json(wsgi('PUT', '/99/precio?precio=60'))[0], 404)
+        self.assertEqual(json(wsgi('PUT', '/1/disponibilidad?disponible=false'))[0], 200)
+        despues = self.metricas()
+
+        def diferencia(muestra):
+            return despues.get(muestra, 0) - antes.get(muestra, 0)
+
+        precio = 'metodo="PUT",ruta="/<target_id:int>/precio"'
+        self.assertEqual(diferencia(f'habitaciones_peticiones_total{{{precio},estado="200"}}'), 2)
+        self.assertEqual(diferencia(f'habitaciones_peticiones_total{{{precio},estado="404"}}'), 1)
+        self.assertEqual(diferencia(f'habitaciones_peticion_segundos_count{{{precio}}}'), 3)
+        self.assertEqual(diferencia(f'habitaciones_peticion_segundos_bucket{{{precio},le="+Inf"}}'), 3)
+        self.assertEqual(diferencia('habitaciones_peticiones_total{metodo="POST",ruta="/",estado="201"}'), 1)
+        self.assertGreater(diferencia('habitaciones_paso_segundos_count{paso="escritura"}'), 0)
+
+        self.assertEqual(despues['habitaciones_registro'], 1)
+        self.assertEqual(despues['habitaciones_estado{tipo="disponibles"}'], 0)
+        self.assertEqual(despues['habitaciones_estado{tipo="ocupadas"}'], 1)
+        self.assertEqual(despues['habitaciones_generacion'], self.servidor.registry.generation)
+
+
+if __name__ == '__main__':
+    unittest.main()
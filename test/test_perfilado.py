@@ -0,0 +1,73 @@
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+PRECIO = '/<target_id:int>/precio'
+
+
+class TestPerfilado(unittest.TestCase):
+    """ Activación, consulta y reinicio del perfilado con /debug/profile """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': 50}))[0], 201)
+
+    def tearDown(self):
+        # El perfilador es global del módulo servidor.
+        self.servidor.perfilador.configurar(False, 0.0, '')
+        self.servidor.perfilador.reiniciar()
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def perfiladas(self, **consulta):
+        estado, cuerpo = json(wsgi('GET', '/debug/profile?' + '&'.join(f'{k}={v}' for k, v in consulta.items())))
+        self.assertEqual(estado, 200)
+        return {(ruta['metodo'], ruta['ruta']): ruta for ruta in cuerpo['rutas']}
+
+    def test_desactivado(self):
+        self.assertEqual(json(wsgi('PUT', '/debug/profile?activo=false&tasa=1'))[1],
+                         {'activo': False, 'tasa': 1.0, 'patron': None})
+        for _ in range(3):
+            self.assertEqual(json(wsgi('GET', '/1/precio'))[0], 200)
+        self.assertEqual(self.perfiladas(), {})
+
+    def test_activado_por_patron(self):
+        self.assertEqual(json(wsgi('PUT', '/debug/profile?activo=true&patron=precio$'))[1],
+                         {'activo': True, 'tasa': 0.0, 'patron': 'precio$'})
+        for precio in (60, 70):
+            self.assertEqual(json(wsgi('PUT', f'/1/precio?precio={precio}'))[0], 200)
+        self.assertEqual(json(wsgi('GET', '/1/precio'))[0], 200)
+        self.assertEqual(json(wsgi('GET', '/1/disponibilidad'))[0], 200)
+
+        rutas = self.perfiladas(orden='propio', limite=5)
+        self.assertEqual(set(rutas), {('GET', PRECIO), ('PUT', PRECIO)})
+        self.assertEqual(rutas[('PUT', PRECIO)]['peticiones'], 2)
+        funciones = rutas[('PUT', PRECIO)]['funciones']
+        self.assertTrue(0 < len(funciones) <= 5)
+        self.assertEqual([funcion['propio'] for funcion in funciones],
+                         sorted((funcion['propio'] for funcion in funciones), reverse=True))
+        self.assertEqual(set(self.perfiladas(ruta=PRECIO)), {('GET', PRECIO), ('PUT', PRECIO)})
+
+        # Desactivado deja de perfilar y conserva lo acumulado hasta reiniciar.
+        self.assertEqual(json(wsgi('PUT', '/debug/profile?activo=false'))[1]['activo'], False)
+        self.assertEqual(json(wsgi('PUT', '/1/precio?precio=80'))[0], 200)
+        self.assertEqual(self.perfiladas()[('PUT', PRECIO)]['peticiones'], 2)
+        self.assertEqual(wsgi('DELETE', '/debug/profile')[0].split()[0], '204')
+        self.assertEqual(self.perfiladas(), {})
+
+    def test_parametros_no_validos(self):
+        for consulta in ('activo=quizas', 'tasa=2', 'tasa=mucha', 'patron=('):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(json(wsgi('PUT', f'/debug/profile?{consulta}'))[0], 400)
+        for consulta in ('orden=alfabetico', 'limite=0', 'limite=a'):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(json(wsgi('GET', f'/debug/profile?{consulta}'))[0], 400)
+        self.assertEqual(self.servidor.perfilador.configuracion(), {'activo': False, 'tasa': 0.0, 'patron': None})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+from datetime import date
+from tempfile import TemporaryDirectory
+import unittest
+
+import reservas as calendario
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+
+class TestFechas(unittest.TestCase):
+    """ Conversión y validación de las fechas de las reservas """
+
+    def test_fecha(self):
+        ordinal = date(2026, 3, 12).toordinal()
+        self.assertEqual(calendario.fecha('2026-03-12'), ordinal)
+        self.assertEqual(calendario.fecha(date(2026, 3, 12)), ordinal)
+        self.assertEqual(calendario.fecha(ordinal), ordinal)
+
+    def test_fechas_no_validas(self):
+        for valor in ('2026-02-30', '12/03/2026', None, 1.5, True, 0, -3, date.max.toordinal() + 1):
+            with self.subTest(valor=valor), self.assertRaises(ValueError):
+                calendario.fecha(valor)
+
+    def test_normalizar(self):
+        self.assertEqual(calendario.serializar(calendario.normalizar([['2026-04-01', '2026-04-03'],
+                                                                      ['2026-03-12', '2026-03-15']])),
+                         [['2026-03-12', '2026-03-15'], ['2026-04-01', '2026-04-03']])
+        with self.assertRaises(ValueError):
+            calendario.normalizar([['2026-03-12', '2026-03-15'], ['2026-03-14', '2026-03-16']])
+        with self.assertRaises(ValueError):
+            calendario.normalizar([['2026-03-12', '2026-03-12']])
+
+
+class TestRutasReservas(unittest.TestCase):
+    """ Las reservas no válidas se rechazan antes de modificar la habitación """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = almacenamiento.JournalStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': 50}))[0], 201)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def test_reservar_y_cancelar(self):
+        estado, cuerpo = json(wsgi('POST', '/1/reservas', {'inicio': '2026-03-12', 'fin': '2026-03-15'}))
+        self.assertEqual((estado, cuerpo), (201, [['2026-03-12', '2026-03-15']]))
+        estado, cuerpo = json(wsgi('POST', '/1/reservas', {'inicio': '2026-03-14', 'fin': '2026-03-16'}))
+        self.assertEqual((estado, cuerpo['reserva']), (409, ['2026-03-12', '2026-03-15']))
+        self.assertEqual(json(wsgi('GET', '/libres?inicio=2026-03-13&fin=2026-03-14'))[1], {})
+        self.assertEqual(json(wsgi('DELETE', '/1/reservas/2026-03-12'))[0], 200)
+        self.assertEqual(json(wsgi('GET', '/1/reservas'))[1], [])
+
+    def test_ordinales_fuera_de_rango(self):
+        for inicio, fin in ((0, 5), (-10, -2), (1, date.max.toordinal() + 2), ('2026-03-12', 10 ** 9)):
+            with self.subTest(inicio=inicio, fin=fin):
+                estado, _ = json(wsgi('POST', '/1/reservas', {'inicio': inicio, 'fin': fin}))
+                self.assertEqual(estado, 400)
+        self.assertEqual(self.servidor.registry[1].reservas, ())
+        self.assertEqual(json(wsgi('GET', '/1'))[0], 200)
+        self.assertEqual(json(wsgi('GET', '/'))[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+from json import loads
+import unittest
+
+from allocator import IdAllocator
+from room import PLAZAS_MAXIMO, Room
+
+
+class TestRoom(unittest.TestCase):
+    """ Registro compacto de una habitación y normalización de sus campos """
+
+    def setUp(self):
+        Room.allocator = IdAllocator()
+
+    def test_sin_diccionario(self):
+        room = Room(2, ['TV'], 50)
+        self.assertFalse(hasattr(room, '__dict__'))
+        with self.assertRaises(AttributeError):
+            room.color = 'azul'
+
+    def test_normalizar(self):
+        casos = [('plazas', '3', 3), ('plazas', 2.0, 2), ('plazas', PLAZAS_MAXIMO, PLAZAS_MAXIMO),
+                 ('precio', '50', 50), ('precio', '75.5', 75.5), ('precio', 80, 80), ('precio', 80.0, 80.0)]
+        for campo, valor, esperado in casos:
+            with self.subTest(campo=campo, valor=valor):
+                normalizado = Room.normalize(campo, valor)
+                self.assertEqual((normalizado, type(normalizado)), (esperado, type(esperado)))
+
+    def test_valores_no_validos(self):
+        casos = [('plazas', -1), ('plazas', 'dos'), ('plazas', PLAZAS_MAXIMO + 1), ('precio', -0.5),
+                 ('precio', 'nan'), ('precio', 'inf'), ('precio', 'caro'), ('equipamiento', 'TV'),
+                 ('equipamiento', [['TV']]), ('reservas', [['2026-03-12', '2026-03-10']])]
+        for campo, valor in casos:
+            with self.subTest(campo=campo, valor=valor), self.assertRaises(ValueError):
+                Room.normalize(campo, valor)
+
+    def test_no_consume_ids_con_valores_no_validos(self):
+        with self.assertRaises(ValueError):
+            Room(-1, [], 50)
+        with self.assertRaises(ValueError):
+            Room(2, 'TV', 50)
+        self.assertEqual(Room(2, [], 50).id, 1)
+
+    def test_serializacion(self):
+        room = Room(2, ['TV', 'Wifi'], 75.5, reservas=[['2026-03-12', '2026-03-15']])
+        data = room.to_dict()
+        self.assertEqual(data, {'id': 1, 'plazas': 2, 'precio': 75.5, 'equipamiento': ['TV', 'Wifi'],
+                                'disponible': True, 'version': 0, 'reservas': [['2026-03-12', '2026-03-15']]})
+        self.assertEqual(loads(room.to_json()), data)
+
+        copia = Room.from_dict(dict(data, version=4))
+        self.assertEqual(copia.to_dict(), dict(data, version=4))
+        # from_dict no reserva el ID, ya asignado.
+        self.assertEqual(len(Room.allocator), 1)
+
+    def test_equipamiento_compartido(self):
+        primera, segunda = Room(2, ['TV', 'Wifi'], 50), Room(3, ['TV', 'Wifi'], 60)
+        self.assertIs(primera.equipamiento, segunda.equipamiento)
+        self.assertEqual(segunda.elementos(), ('TV', 'Wifi'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+from json import loads
+from tempfile import TemporaryDirectory
+from os import path
+import subprocess
+import sys
+import unittest
+
+import router
+from test.utilidades import json, puerto_libre, wsgi
+
+TAM_RANGO = 1000
+
+
+class TestRouter(unittest.TestCase):
+    """ Reparto de las peticiones entre dos particiones """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._directorio = TemporaryDirectory()
+        cls.procesos = []
+        urls = []
+        for indice in range(2):
+            puerto = puerto_libre()
+            cls.procesos.append(router.lanzar_servidor(puerto, path.join(cls._directorio.name, f'shard{indice}'),
+                                                       ['--rango-ids', router.rango_shard(indice, TAM_RANGO)]))
+            urls.append(f'http://localhost:{puerto}')
+        cls.router = router.Router(urls, TAM_RANGO)
+        for _ in range(2):
+            json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': 50}, app=cls.router.app))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.router.close()
+        for proceso in cls.procesos:
+            router.detener_servidor(proceso)
+        cls._directorio.cleanup()
+
+    def test_listado_combinado_ignora_if_none_match(self):
+        # Las dos particiones tienen la misma generación, g1, que no identifica el listado combinado.
+        estado, cuerpo = json(wsgi('GET', '/', cabeceras={'HTTP_IF_NONE_MATCH': '"g1"'}, app=self.router.app))
+        self.assertEqual(estado, 200)
+        self.assertEqual(sorted(cuerpo), ['1', str(TAM_RANGO + 1)])
+
+        estado, cuerpo = json(wsgi('GET', '/?limit=5', cabeceras={'HTTP_IF_NONE_MATCH': '"g1"'},
+                                   app=self.router.app))
+        self.assertEqual((estado, len(cuerpo)), (200, 2))
+
+    def test_habitacion_admite_if_none_match(self):
+        estado, cuerpo = json(wsgi('GET', '/1', app=self.router.app))
+        self.assertEqual(estado, 200)
+        estado, _ = json(wsgi('GET', '/1', cabeceras={'HTTP_IF_NONE_MATCH': f'"1-{cuerpo["version"]}"'},
+                              app=self.router.app))
+        self.assertEqual(estado, 304)
+
+    def test_limit_no_valido(self):
+        for limit in ('0', '-1', 'a'):
+            with self.subTest(limit=limit):
+                self.assertEqual(json(wsgi('GET', f'/?limit={limit}', app=self.router.app))[0], 400)
+
+    def test_lote_rechazado_entero(self):
+        estado, cuerpo = json(wsgi('PUT', '/lote/disponibilidad', {'ids': [1, TAM_RANGO + 1], 'disponible': 'no'},
+                                   app=self.router.app))
+        self.assertEqual(estado, 400)
+        self.assertIn('error_description', cuerpo)
+        self.assertTrue(json(wsgi('GET', '/1', app=self.router.app))[1]['disponible'])
+
+    def test_cursor_negativo(self):
+        # Como una sola partición, empieza desde el principio.
+        estado, cuerpo = json(wsgi('GET', '/?limit=5&after=-3', app=self.router.app))
+        self.assertEqual((estado, list(cuerpo)), (200, ['1', str(TAM_RANGO + 1)]))
+        estado, cuerpo = wsgi('GET', '/?formato=ndjson&after=-3', app=self.router.app)
+        self.assertEqual([loads(linea)['id'] for linea in cuerpo.splitlines()], [1, TAM_RANGO + 1])
+
+
+class TestRangos(unittest.TestCase):
+    """ Los rangos de IDs de las particiones caben en el motor de almacenamiento """
+
+    def test_mmap_rechaza_ids_de_mas_de_32_bits(self):
+        r = subprocess.run([sys.executable, router.ROUTER, '--shards', '5', '--tam-rango', str(10 ** 9),
+                            '--almacenamiento', 'mmap'], capture_output=True, text=True, timeout=30)
+        self.assertEqual(r.returncode, 2)
+        self.assertIn('mmap', r.stderr)
+
+    def test_servidor_mmap_rechaza_ids_de_mas_de_32_bits(self):
+        servidor = path.join(path.dirname(router.ROUTER), 'servidor.py')
+        with TemporaryDirectory() as directorio:
+            r = subprocess.run([sys.executable, servidor, '--almacenamiento', 'mmap', '--directorio', directorio,
+                                '--rango-ids', f'{4 * 10 ** 9}:{5 * 10 ** 9}'],
+                               capture_output=True, text=True, timeout=30)
+        self.assertEqual(r.returncode, 2)
+        self.assertIn('mmap', r.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
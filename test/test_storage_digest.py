@@ -0,0 +1,82 @@
+from os import path
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+
+def habitacion(target_id, precio=50, version=1):
+    return {'id': target_id, 'plazas': 2, 'precio': precio, 'equipamiento': ['TV'], 'disponible': True,
+            'version': version, 'reservas': []}
+
+
+class TestDigest(unittest.TestCase):
+    """ Omisión de las escrituras que no cambian el estado persistido """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.directorio = self._directorio.name
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def abrir(self, motor=almacenamiento.JournalStorage):
+        return almacenamiento.DigestStorage(motor(self.directorio, almacenamiento.FSYNC_SO))
+
+    def contadores(self, storage):
+        stats = storage.stats()
+        return stats['escrituras'], stats['omitidas']
+
+    def lineas_diario(self):
+        with open(path.join(self.directorio, almacenamiento.JOURNAL), 'rb') as file:
+            return len(file.readlines())
+
+    def test_omite_lo_repetido(self):
+        storage = self.abrir()
+        storage.save(habitacion(1))
+        storage.save(habitacion(1))
+        self.assertEqual(self.contadores(storage), (1, 1))
+        storage.save(habitacion(1, precio=60, version=2))
+        storage.save_many([habitacion(1, precio=60, version=2), habitacion(2), habitacion(3)])
+        self.assertEqual(self.contadores(storage), (4, 2))
+        storage.close()
+        self.assertEqual(self.lineas_diario(), 4)
+
+    def test_baja_olvida_el_resumen(self):
+        storage = self.abrir()
+        storage.save(habitacion(1))
+        storage.delete(1, 2)
+        storage.save(habitacion(1))
+        self.assertEqual(self.contadores(storage), (3, 0))
+        storage.close()
+
+    def test_resumenes_sembrados_al_cargar(self):
+        for motor in (almacenamiento.JournalStorage, almacenamiento.SqliteStorage):
+            with self.subTest(motor=motor.__name__):
+                storage = self.abrir(motor)
+                storage.save_many([habitacion(1), habitacion(2, precio=80.0)])
+                storage.close()
+
+                storage = self.abrir(motor)
+                cargadas = list(storage.load())
+                storage.save_many(cargadas)
+                self.assertEqual(self.contadores(storage), (0, 2))
+                storage.close()
+
+    def test_rutas(self):
+        storage = self.abrir()
+        cargar_servidor(storage)
+        try:
+            self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': [], 'precio': 50}))[0], 201)
+            # Mismo precio: la habitación no cambia y no se reescribe.
+            self.assertEqual(json(wsgi('PUT', '/1/precio?precio=50'))[0], 200)
+            self.assertEqual(json(wsgi('PUT', '/1/precio?precio=55'))[0], 200)
+            estado, metricas = json(wsgi('GET', '/persistencia'))
+            self.assertEqual((estado, metricas['escrituras'], metricas['omitidas']), (200, 2, 1))
+        finally:
+            storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+from json import dumps
+from os import listdir, path, replace
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+
+
+def habitacion(target_id, precio=50, version=1):
+    return {'id': target_id, 'plazas': 2, 'precio': precio, 'equipamiento': ['TV'], 'disponible': True,
+            'version': version, 'reservas': []}
+
+
+class TestJournalStorage(unittest.TestCase):
+    """ Reproducción del diario y consolidación en la instantánea """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.directorio = self._directorio.name
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def abrir(self):
+        return almacenamiento.JournalStorage(self.directorio, almacenamiento.FSYNC_SO)
+
+    def cargar(self):
+        storage = self.abrir()
+        try:
+            return {data['id']: data for data in storage.load()}
+        finally:
+            storage.close()
+
+    def test_reproduce_el_ultimo_estado(self):
+        storage = self.abrir()
+        storage.save(habitacion(1))
+        storage.save(habitacion(2))
+        storage.save(habitacion(1, precio=80, version=3))
+        storage.delete(2)
+        storage.save_many([habitacion(3), habitacion(4)])
+        storage.close()
+
+        self.assertEqual(self.cargar(), {1: habitacion(1, precio=80, version=3), 3: habitacion(3),
+                                         4: habitacion(4)})
+
+    def test_descarta_el_registro_incompleto(self):
+        storage = self.abrir()
+        storage.save(habitacion(1))
+        storage.close()
+        with open(path.join(self.directorio, almacenamiento.JOURNAL), 'ab') as file:
+            file.write(dumps({'op': 'put', 'data': habitacion(2)}).encode()[:20])
+
+        self.assertEqual(list(self.cargar()), [1])
+
+    def test_instantanea_vacia_el_diario(self):
+        storage = self.abrir()
+        for target_id in range(1, 4):
+            storage.save(habitacion(target_id))
+        storage.snapshot(lambda: [habitacion(target_id) for target_id in range(1, 4)])
+
+        self.assertEqual(path.getsize(storage.url), 0)
+        self.assertFalse(path.exists(storage.url_rotado))
+
+        # Los cambios posteriores se reaplican sobre la instantánea.
+        storage.delete(2)
+        storage.save(habitacion(3, precio=90, version=5))
+        storage.close()
+
+        self.assertEqual(self.cargar(), {1: habitacion(1), 3: habitacion(3, precio=90, version=5)})
+
+    def test_instantanea_sin_cambios_no_reescribe(self):
+        storage = self.abrir()
+        storage.snapshot(lambda: self.fail('No hay cambios que consolidar.'))
+        storage.close()
+
+        self.assertFalse(path.exists(path.join(self.directorio, almacenamiento.SNAPSHOT)))
+
+    def test_reproduce_el_diario_rotado(self):
+        # Una caída durante la instantánea deja el diario rotado sin consolidar.
+        storage = self.abrir()
+        storage.save(habitacion(1))
+        storage.save(habitacion(2))
+        storage.close()
+        url = path.join(self.directorio, almacenamiento.JOURNAL)
+        replace(url, url + '.1')
+
+        storage = self.abrir()
+        storage.delete(1)
+        storage.close()
+
+        self.assertEqual(self.cargar(), {2: habitacion(2)})
+
+    def test_instantanea_fallida_conserva_el_diario_rotado(self):
+        storage = self.abrir()
+        storage.save(habitacion(1))
+        storage.save(habitacion(2))
+        storage.close()
+        url = path.join(self.directorio, almacenamiento.JOURNAL)
+        replace(url, url + '.1')
+
+        storage = self.abrir()
+        list(storage.load())
+        storage.save(habitacion(3))
+
+        def fallo():
+            raise RuntimeError('fallo al recorrer el registro')
+            yield
+
+        with self.assertRaises(RuntimeError):
+            storage.snapshot(fallo)
+        storage.close()
+        self.assertEqual(self.cargar(), {1: habitacion(1), 2: habitacion(2), 3: habitacion(3)})
+
+        # Una instantánea que termina consolida los dos diarios.
+        storage = self.abrir()
+        cargadas = list(storage.load())
+        storage.snapshot(lambda: cargadas)
+        self.assertFalse(path.exists(storage.url_rotado))
+        storage.close()
+        self.assertEqual(self.cargar(), {1: habitacion(1), 2: habitacion(2), 3: habitacion(3)})
+
+    def test_migra_un_fichero_por_habitacion(self):
+        for target_id in (1, 2):
+            with open(path.join(self.directorio, f'Habitacion{target_id}.json'), 'w') as file:
+                file.write(dumps(habitacion(target_id)))
+
+        self.assertEqual(self.cargar(), {1: habitacion(1), 2: habitacion(2)})
+        self.assertEqual(sorted(listdir(path.join(self.directorio, almacenamiento.MIGRADOS))),
+                         ['Habitacion1.json', 'Habitacion2.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
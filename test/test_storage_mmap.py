@@ -0,0 +1,267 @@
+from os import listdir, path
+from tempfile import TemporaryDirectory
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+MmapStorage = almacenamiento.MmapStorage
+
+
+def habitacion(target_id, **campos):
+    data = {'id': target_id, 'plazas': 2, 'precio': 50, 'equipamiento': ['TV', 'Wifi'], 'disponible': True,
+            'version': target_id, 'reservas': []}
+    data.update(campos)
+    return data
+
+
+class TestMmap(unittest.TestCase):
+    """ Registros binarios proyectados en memoria """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.directorio = self._directorio.name
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def abrir(self, **kwargs):
+        return MmapStorage(self.directorio, almacenamiento.FSYNC_SO, **kwargs)
+
+    def reabrir(self, storage):
+        storage.close()
+        storage = self.abrir()
+        return storage, {data['id']: data for data in storage.load()}
+
+    def test_guardar_y_reabrir(self):
+        habitaciones = [habitacion(1),
+                        habitacion(2, precio=80.5, disponible=False, equipamiento=[]),
+                        habitacion(3, equipamiento=['Cuna'], reservas=[['2026-03-12', '2026-03-15'],
+                                                                       ['2026-04-01', '2026-04-02']])]
+        # Capacidad inicial menor que el número de habitaciones, el fichero tiene que crecer.
+        storage = self.abrir(capacidad=1)
+        storage.save_many(habitaciones)
+        self.assertEqual(storage.get(2), habitaciones[1])
+
+        storage, cargadas = self.reabrir(storage)
+        self.assertEqual(cargadas, {data['id']: data for data in habitaciones})
+        self.assertIsInstance(cargadas[1]['precio'], int)
+        self.assertEqual(storage.generacion(), 3)
+        storage.close()
+
+    def test_baja_reutiliza_el_hueco(self):
+        storage = self.abrir()
+        storage.save_many([habitacion(1), habitacion(2), habitacion(3)])
+        storage.delete(2, 4)
+        self.assertIsNone(storage.get(2))
+        storage, cargadas = self.reabrir(storage)
+        self.assertEqual(sorted(cargadas), [1, 3])
+
+        tam = path.getsize(storage.url)
+        storage.save(habitacion(7))
+        self.assertEqual(path.getsize(storage.url), tam)
+        storage, cargadas = self.reabrir(storage)
+        self.assertEqual(sorted(cargadas), [1, 3, 7])
+        self.assertEqual(storage.generacion(), 7)
+        storage.close()
+
+    def test_modificacion_en_el_sitio(self):
+        storage = self.abrir()
+        storage.save(habitacion(1))
+        storage.save(habitacion(1, precio=99, disponible=False, version=5, reservas=[['2026-01-01', '2026-01-03']]))
+        storage, cargadas = self.reabrir(storage)
+        self.assertEqual(cargadas, {1: habitacion(1, precio=99, disponible=False, version=5,
+                                                  reservas=[['2026-01-01', '2026-01-03']])})
+        storage.close()
+
+    def test_equipamiento_sin_perdidas(self):
+        equipamientos = [[''], ['TV', ''], [1, 'x'], [True, 1, 1.5, None], ['a\x1fb'], ['[1]'], ['Cuna']]
+        storage = self.abrir()
+        storage.save_many([habitacion(target_id, equipamiento=equipamiento)
+                           for target_id, equipamiento in enumerate(equipamientos, 1)])
+        storage, cargadas = self.reabrir(storage)
+        for target_id, equipamiento in enumerate(equipamientos, 1):
+            with self.subTest(equipamiento=equipamiento):
+                self.assertEqual(cargadas[target_id]['equipamiento'], equipamiento)
+                self.assertEqual([type(elemento) for elemento in cargadas[target_id]['equipamiento']],
+                                 [type(elemento) for elemento in equipamiento])
+        storage.close()
+
+    def test_fichero_desconocido(self):
+        with open(path.join(self.directorio, almacenamiento.REGISTROS), 'wb') as file:
+            file.write(b'OTRACOSA' + bytes(64))
+        with self.assertRaises(ValueError):
+            self.abrir()
+
+
+class TestRutasMmap(unittest.TestCase):
+    """ Los valores que no caben en el registro se rechazan sin modificar nada """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.storage = MmapStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        self.servidor = cargar_servidor(self.storage)
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': ['TV'], 'precio': 50}))[0], 201)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def test_plazas_fuera_de_rango(self):
+        self.assertEqual(json(wsgi('PUT', '/1/plazas?plazas=5000000000'))[0], 400)
+        estado, _ = wsgi('POST', '/', {'plazas': 2 ** 32, 'equipamiento': [], 'precio': 50})
+        self.assertTrue(estado.startswith('400'))
+        estado, _ = json(wsgi('POST', '/lote', {'habitaciones': [{'plazas': 2 ** 40, 'equipamiento': [],
+                                                                  'precio': 50}]}))
+        self.assertEqual(estado, 400)
+        self.assertEqual(self.servidor.registry[1].plazas, 2)
+        self.assertEqual(self.storage.get(1)['plazas'], 2)
+        self.assertEqual(sorted(self.servidor.registry), [1])
+        # No se ha consumido ningún ID.
+        self.assertEqual(json(wsgi('POST', '/', {'plazas': 2 ** 32 - 1, 'equipamiento': [], 'precio': 50}))[1]['id'],
+                         2)
+        self.assertEqual(self.storage.get(2)['plazas'], 2 ** 32 - 1)
+
+    def test_equipamiento_no_textual(self):
+        estado, cuerpo = json(wsgi('POST', '/', {'plazas': 2, 'equipamiento': [1, 'x', ''], 'precio': 50}))
+        self.assertEqual(estado, 201)
+        self.assertEqual(json(wsgi('PUT', '/1/equipamiento', {'equipamiento': ['']}))[0], 200)
+        self.storage.close()
+        self.storage = MmapStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+        cargadas = {data['id']: data for data in self.storage.load()}
+        self.assertEqual(cargadas[cuerpo['id']]['equipamiento'], [1, 'x', ''])
+        self.assertEqual(cargadas[1]['equipamiento'], [''])
+
+
+class TestCompactacion(unittest.TestCase):
+    """ La tabla de cadenas no crece sin límite con las reservas """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.directorio = self._directorio.name
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def abrir(self):
+        storage = MmapStorage(self.directorio, almacenamiento.FSYNC_SO, compactar_desde=1)
+        return storage, {data['id']: data for data in storage.load()}
+
+    def tablas(self):
+        return sorted(nombre for nombre in listdir(self.directorio) if nombre.startswith(almacenamiento.EQUIPAMIENTOS))
+
+    def test_reservas_y_cancelaciones(self):
+        storage, _ = self.abrir()
+        storage.save_many([habitacion(1), habitacion(2, equipamiento=['Cuna'])])
+        for dia in range(1, 29):
+            # Cada calendario distinto ocupa una entrada nueva de la tabla.
+            storage.save(habitacion(1, reservas=[[f'2026-02-{dia:02}', '2026-03-01']]))
+        final = habitacion(1, reservas=[['2026-02-28', '2026-03-01']])
+        tam = len(storage._tabla)
+        storage.snapshot(lambda: [])
+        self.assertLess(len(storage._tabla), tam / 4)
+        self.assertEqual(self.tablas(), [almacenamiento.EQUIPAMIENTOS + '.1'])
+        self.assertEqual(storage.get(1), final)
+
+        # La tabla compactada sigue admitiendo cadenas nuevas y repetidas.
+        storage.save(habitacion(3, equipamiento=['Cuna']))
+        storage.save(habitacion(4, equipamiento=['Jacuzzi']))
+        storage.close()
+
+        storage, cargadas = self.abrir()
+        self.assertEqual(cargadas, {1: final, 2: habitacion(2, equipamiento=['Cuna']),
+                                    3: habitacion(3, equipamiento=['Cuna']),
+                                    4: habitacion(4, equipamiento=['Jacuzzi'])})
+
+        # Una segunda compactación, al cerrar, sustituye a la primera tabla.
+        for dia in range(1, 29):
+            storage.save(habitacion(2, equipamiento=['Cuna'], reservas=[[f'2026-04-{dia:02}', '2026-05-01']]))
+        storage.close()
+        self.assertEqual(self.tablas(), [almacenamiento.EQUIPAMIENTOS + '.2'])
+        storage, cargadas = self.abrir()
+        self.assertEqual(cargadas[2]['reservas'], [['2026-04-28', '2026-05-01']])
+        self.assertEqual(cargadas[4], habitacion(4, equipamiento=['Jacuzzi']))
+        storage.close()
+
+    def test_sin_cadenas_sobrantes_no_compacta(self):
+        storage, _ = self.abrir()
+        storage.save_many([habitacion(target_id, equipamiento=[f'E{target_id}']) for target_id in range(1, 20)])
+        storage.close()
+        self.assertEqual(self.tablas(), [almacenamiento.EQUIPAMIENTOS])
+
+    def test_compactacion_interrumpida(self):
+        storage, _ = self.abrir()
+        storage.save(habitacion(1))
+        storage.close()
+        # Tabla nueva escrita sin llegar a sustituir habitaciones.bin.
+        with open(path.join(self.directorio, almacenamiento.EQUIPAMIENTOS + '.1'), 'wb') as file:
+            file.write(b'TV')
+
+        storage, cargadas = self.abrir()
+        self.assertEqual(cargadas, {1: habitacion(1)})
+        self.assertEqual(self.tablas(), [almacenamiento.EQUIPAMIENTOS])
+        storage.close()
+
+
+class TestMigracion(unittest.TestCase):
+    """ Conversión de los formatos anteriores al abrir el fichero """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        self.directorio = self._directorio.name
+        with open(path.join(self.directorio, almacenamiento.EQUIPAMIENTOS), 'wb') as file:
+            file.write('TV\x1fWifi2026-03-12/2026-03-15'.encode())
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def escribir(self, marca, registros):
+        anterior = MmapStorage.ANTERIORES[marca][0]
+        with open(path.join(self.directorio, almacenamiento.REGISTROS), 'wb') as file:
+            file.write(marca)
+            for registro in registros:
+                file.write(anterior.pack(*registro))
+
+    def comprobar(self, esperadas):
+        storage = MmapStorage(self.directorio, almacenamiento.FSYNC_SO)
+        self.assertEqual(list(storage.load()), esperadas)
+        self.assertEqual(storage.generacion(), max(data['version'] for data in esperadas))
+        storage.save(habitacion(9, version=9))
+        storage.close()
+
+        with open(storage.url, 'rb') as file:
+            self.assertEqual(file.read(len(MmapStorage.MARCA)), MmapStorage.MARCA)
+        # Al reabrir ya no hay conversión.
+        storage = MmapStorage(self.directorio, almacenamiento.FSYNC_SO)
+        # La habitación nueva ocupa el primer hueco libre.
+        self.assertEqual(sorted(storage.load(), key=lambda data: data['id']), esperadas + [habitacion(9, version=9)])
+        storage.close()
+
+    def test_habmmap1(self):
+        disponible, entero = MmapStorage.DISPONIBLE, MmapStorage.PRECIO_ENTERO
+        self.escribir(b'HABMMAP1', [(1, 2, 50.0, 3, 0, 7, disponible | entero),
+                                    (0, 0, 0.0, 0, 0, 0, 0),
+                                    (3, 4, 80.5, 2, 0, 2, 0)])
+        self.comprobar([habitacion(1, version=3),
+                        habitacion(3, plazas=4, precio=80.5, equipamiento=['TV'], disponible=False, version=2)])
+
+    def test_habmmap2(self):
+        disponible, entero = MmapStorage.DISPONIBLE, MmapStorage.PRECIO_ENTERO
+        self.escribir(b'HABMMAP2', [(1, 2, 50.0, 4, 0, 7, 7, 21, disponible | entero)])
+        self.comprobar([habitacion(1, version=4, reservas=[['2026-03-12', '2026-03-15']])])
+
+    def test_la_generacion_sigue_tras_migrar(self):
+        self.escribir(b'HABMMAP2', [(1, 2, 50.0, 4, 0, 7, 0, 0, MmapStorage.PRECIO_ENTERO)])
+        storage = MmapStorage(self.directorio, almacenamiento.FSYNC_SO)
+        list(storage.load())
+        storage.delete(1, 6)
+        storage.close()
+
+        storage = MmapStorage(self.directorio, almacenamiento.FSYNC_SO)
+        self.assertEqual(list(storage.load()), [])
+        self.assertEqual(storage.generacion(), 6)
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+from os import path
+from tempfile import TemporaryDirectory
+import sqlite3
+import unittest
+
+import storage as almacenamiento
+from test.utilidades import cargar_servidor, json, wsgi
+
+
+def borrar(target_id):
+    """ :returns: Código de estado de DELETE /<target_id>. """
+
+    return int(wsgi('DELETE', f'/{target_id}')[0].split()[0])
+
+
+class TestSinPrecarga(unittest.TestCase):
+    """ Servidor sobre SQLite que carga las habitaciones al accederlas """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+        storage = self.abrir()
+        cargar_servidor(storage)
+        for plazas in (1, 2, 3):
+            self.assertEqual(json(wsgi('POST', '/', {'plazas': plazas, 'equipamiento': ['TV'], 'precio': 50}))[0],
+                             201)
+        storage.close()
+        self.storage = self.abrir()
+        self.servidor = cargar_servidor(self.storage, consultas=self.storage)
+
+    def tearDown(self):
+        self.storage.close()
+        self._directorio.cleanup()
+
+    def abrir(self):
+        return almacenamiento.SqliteStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+
+    def test_carga_bajo_demanda(self):
+        self.assertEqual(len(self.servidor.registry), 0)
+        estado, cuerpo = json(wsgi('GET', '/2'))
+        self.assertEqual((estado, cuerpo['plazas']), (200, 2))
+        self.assertEqual(list(self.servidor.registry.rooms), [2])
+        self.assertEqual(json(wsgi('GET', '/9'))[0], 404)
+
+        # Los listados se resuelven en SQL, sin cargar el resto.
+        self.assertEqual(sorted(json(wsgi('GET', '/'))[1]), ['1', '2', '3'])
+        self.assertEqual(list(self.servidor.registry.rooms), [2])
+
+    def test_modificacion_de_una_habitacion_sin_cargar(self):
+        self.assertEqual(json(wsgi('PUT', '/3/precio?precio=75.5'))[0], 200)
+        self.assertEqual(self.storage.get(3)['precio'], 75.5)
+        self.assertGreater(self.storage.get(3)['version'], 3)
+
+    def test_baja_de_una_habitacion_sin_cargar(self):
+        self.assertEqual(borrar(3), 200)
+        self.assertNotIn(3, self.servidor.registry.rooms)
+        self.assertIsNone(self.storage.get(3))
+        self.assertEqual(json(wsgi('GET', '/3'))[0], 404)
+
+        # El alta reutiliza el ID sin encontrarse la habitación eliminada.
+        estado, cuerpo = json(wsgi('POST', '/', {'plazas': 6, 'equipamiento': [], 'precio': 90}))
+        self.assertEqual((estado, cuerpo['id']), (201, 3))
+        estado, cuerpo = json(wsgi('GET', '/3'))
+        self.assertEqual((estado, cuerpo['plazas'], cuerpo['equipamiento']), (200, 6, []))
+        self.assertEqual(sorted(json(wsgi('GET', '/'))[1]), ['1', '2', '3'])
+
+    def test_baja_de_una_habitacion_cargada(self):
+        self.assertEqual(json(wsgi('GET', '/1'))[0], 200)
+        self.assertEqual(borrar(1), 200)
+        self.assertIsNone(self.storage.get(1))
+        self.assertEqual(json(wsgi('GET', '/1'))[0], 404)
+
+    def test_baja_persistida_tras_reiniciar(self):
+        self.assertEqual(borrar(2), 200)
+        generacion = self.servidor.registry.generation
+        self.storage.close()
+
+        self.storage = self.abrir()
+        self.servidor = cargar_servidor(self.storage, consultas=self.storage)
+        self.assertEqual(sorted(self.storage.ids()), [1, 3])
+        self.assertEqual(self.servidor.registry.generation, generacion)
+        self.assertEqual(json(wsgi('GET', '/2'))[0], 404)
+
+
+class TestPrecio(unittest.TestCase):
+    """ Los precios enteros y decimales se recuperan tal como se guardaron """
+
+    def setUp(self):
+        self._directorio = TemporaryDirectory()
+
+    def tearDown(self):
+        self._directorio.cleanup()
+
+    def abrir(self):
+        return almacenamiento.SqliteStorage(self._directorio.name, almacenamiento.FSYNC_SO)
+
+    @staticmethod
+    def habitacion(target_id, precio):
+        return {'id': target_id, 'plazas': 2, 'precio': precio, 'equipamiento': [], 'disponible': True,
+                'version': target_id, 'reservas': []}
+
+    def test_entero_y_decimal(self):
+        storage = self.abrir()
+        storage.save_many([self.habitacion(1, 50.0), self.habitacion(2, 50), self.habitacion(3, 80.5)])
+        storage.close()
+        storage = self.abrir()
+        precios = {data['id']: data['precio'] for data in storage.load()}
+        self.assertEqual([(precios[target_id], type(precios[target_id])) for target_id in (1, 2, 3)],
+                         [(50.0, float), (50, int), (80.5, float)])
+        self.assertIs(type(storage.get(1)['precio']), float)
+
+        agregados = storage.agregados((100,))
+        self.assertEqual((agregados['suma_precio'], agregados['minimo'], agregados['maximo']), (180.5, 50.0, 80.5))
+        self.assertIs(type(agregados['minimo']), float)
+        storage.save(self.habitacion(1, 40))
+        agregados = storage.agregados((100,))
+        self.assertEqual((agregados['minimo'], type(agregados['minimo'])), (40, int))
+        storage.close()
+
+    def test_base_de_datos_anterior(self):
+        conexion = sqlite3.connect(path.join(self._directorio.name, almacenamiento.BASE_DATOS))
+        conexion.execute('CREATE TABLE habitaciones (id INTEGER PRIMARY KEY, plazas INTEGER NOT NULL,'
+                         ' precio NUMERIC NOT NULL, disponible INTEGER NOT NULL, version INTEGER NOT NULL)')
+        conexion.executemany('INSERT INTO habitaciones VALUES (?, 2, ?, 1, ?)', [(1, 50, 1), (2, 80.5, 2)])
+        conexion.commit()
+        conexion.close()
+
+        storage = self.abrir()
+        self.assertEqual([(data['precio'], type(data['precio'])) for data in storage.load()],
+                         [(50, int), (80.5, float)])
+        storage.save(self.habitacion(3, 60.0))
+        storage.close()
+        storage = self.abrir()
+        self.assertEqual((storage.get(3)['precio'], type(storage.get(3)['precio'])), (60.0, float))
+        storage.close()
+
+
+class TestRegistro(unittest.TestCase):
+    """ remove() no pasa por la carga bajo demanda """
+
+    def test_remove_no_carga(self):
+        servidor = cargar_servidor(None)
+        servidor.registry.cargar = lambda target_id: self.fail('remove() ha cargado la habitación')
+        with self.assertRaises(KeyError):
+            servidor.registry.remove(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
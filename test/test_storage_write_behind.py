@@ -0,0 +1,162 @@
+import threading
+import unittest
+
+import storage as almacenamiento
+
+
+def habitacion(target_id, precio=50):
+    return {'id': target_id, 'plazas': 2, 'precio': precio, 'equipamiento': ['TV'], 'disponible': True,
+            'version': 1, 'reservas': []}
+
+
+class MotorInestable(almacenamiento.Storage):
+    """ Motor en memoria que falla mientras `fallos` sea positivo """
+
+    def __init__(self):
+        self.datos = {}
+        self.fallos = 0
+        self.error = OSError
+        self.escrituras = 0
+        self.antes_de_escribir = None  # Se llama al empezar cada escritura, antes de fallar.
+        self.cerrado = False
+
+    def _escribir(self):
+        if self.antes_de_escribir is not None:
+            self.antes_de_escribir()
+        if self.fallos > 0:
+            self.fallos -= 1
+            raise self.error('Disco lleno')
+        self.escrituras += 1
+
+    def load(self):
+        return list(self.datos.values())
+
+    def get(self, target_id):
+        return self.datos.get(target_id)
+
+    def save(self, data):
+        self.save_many([data])
+
+    def save_many(self, datos):
+        self._escribir()
+        for data in datos:
+            self.datos[data['id']] = data
+
+    def delete(self, target_id, generacion=0):
+        self._escribir()
+        self.datos.pop(target_id, None)
+
+    def close(self):
+        self.cerrado = True
+
+
+class TestWriteBehind(unittest.TestCase):
+    """ Un volcado fallido no pierde los cambios pendientes """
+
+    def setUp(self):
+        self.motor = MotorInestable()
+        # Sin volcados periódicos durante la prueba, solo los de flush().
+        self.storage = almacenamiento.WriteBehindStorage(self.motor, intervalo=60 * 60 * 1000)
+
+    def tearDown(self):
+        self.motor.fallos = 0
+        self.storage.close()
+
+    def test_reintenta_tras_un_fallo(self):
+        self.storage.save(habitacion(1))
+        self.storage.save(habitacion(2))
+        self.motor.fallos = 1
+        with self.assertRaises(OSError):
+            self.storage.flush()
+        self.assertEqual(self.motor.datos, {})
+        self.assertEqual(self.storage.stats()['cola'], 2)
+        self.assertEqual(self.storage.get(1), habitacion(1))
+
+        self.storage.flush()
+        self.assertEqual(sorted(self.motor.datos), [1, 2])
+        self.assertEqual(self.storage.stats()['cola'], 0)
+        self.assertEqual(self.storage.stats()['errores'], 1)
+
+    def test_baja_fallida(self):
+        self.motor.datos[1] = habitacion(1)
+        self.storage.save(habitacion(2))
+        self.storage.delete(1, 3)
+        # Falla la baja, después de escribir el alta.
+        self.motor.antes_de_escribir = lambda: setattr(self.motor, 'fallos', self.motor.escrituras)
+        with self.assertRaises(OSError):
+            self.storage.flush()
+        self.motor.antes_de_escribir = None
+        self.assertEqual(sorted(self.motor.datos), [1, 2])
+        self.assertEqual(self.storage.stats()['cola'], 1)
+
+        self.storage.flush()
+        self.assertEqual(sorted(self.motor.datos), [2])
+
+    def test_no_pisa_un_cambio_posterior(self):
+        self.storage.save(habitacion(1, precio=50))
+
+        def cambiar_y_fallar():
+            self.motor.antes_de_escribir = None
+            self.storage.save(habitacion(1, precio=70))
+            self.motor.fallos = 1
+
+        self.motor.antes_de_escribir = cambiar_y_fallar
+        with self.assertRaises(OSError):
+            self.storage.flush()
+        self.assertEqual(self.storage.get(1)['precio'], 70)
+        self.storage.flush()
+        self.assertEqual(self.motor.datos[1]['precio'], 70)
+
+    def test_close_vuelca_lo_que_fallo(self):
+        self.storage.save(habitacion(1))
+        self.motor.fallos = 1
+        with self.assertRaises(OSError):
+            self.storage.flush()
+        self.storage.close()
+        self.assertEqual(sorted(self.motor.datos), [1])
+        self.assertTrue(self.motor.cerrado)
+
+    def test_el_hilo_sobrevive_a_errores_inesperados(self):
+        storage = almacenamiento.WriteBehindStorage(self.motor, intervalo=10)
+        escrito = threading.Event()
+        self.motor.error = RuntimeError
+        self.motor.fallos = 1
+
+        def escribir():
+            if self.motor.fallos == 0:
+                escrito.set()
+
+        self.motor.antes_de_escribir = escribir
+        with self.assertLogs(level='ERROR'):
+            storage.save(habitacion(1))
+            self.assertTrue(escrito.wait(5))
+        storage.close()
+        self.assertEqual(sorted(self.motor.datos), [1])
+
+
+class TestDigestConWriteBehind(unittest.TestCase):
+    """ El resumen solo anota los estados que el volcado ha escrito """
+
+    def test_resumen_tras_volcado_fallido(self):
+        motor = MotorInestable()
+        storage = almacenamiento.WriteBehindStorage(almacenamiento.DigestStorage(motor), intervalo=60 * 60 * 1000)
+        storage.save(habitacion(1))
+        motor.fallos = 1
+        with self.assertRaises(OSError):
+            storage.flush()
+        self.assertEqual(storage.stats()['escrituras'], 0)
+
+        storage.flush()
+        self.assertEqual(motor.datos, {1: habitacion(1)})
+        self.assertEqual(storage.stats()['escrituras'], 1)
+
+        # Un estado ya escrito no se vuelve a escribir.
+        storage.save(habitacion(1))
+        storage.flush()
+        self.assertEqual(motor.escrituras, 1)
+        self.assertEqual(storage.stats()['omitidas'], 1)
+        storage.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
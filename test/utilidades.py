@@ -0,0 +1,71 @@
+""" Utilidades comunes de las pruebas del servidor
+
+Cargan servidor.py en el propio proceso con un registro vacío y el
+motor de almacenamiento indicado, y llaman a sus rutas a través de
+WSGI con la función de los benchmarks."""
+from json import loads
+import socket
+
+import bottle
+
+from allocator import IdAllocator
+from benchmarks.utilidades import wsgi
+from fragmentos import Fragmentos
+from registry import Registry
+from room import Room
+
+
+def cargar_servidor(storage, consultas=None):
+    """ Importa servidor.py y reinicia su estado global.
+
+    :param storage: Motor de almacenamiento ya abierto.
+    :param consultas: Motor de las consultas sin precarga, None con
+    precarga. Sin precarga se reservan sus IDs y las habitaciones se
+    cargan al accederlas, como al arrancar con --sin-precarga.
+    :returns: Módulo servidor."""
+
+    import servidor
+    servidor.registry = Registry()
+    servidor.fragmentos = Fragmentos()
+    servidor.storage = storage
+    servidor.consultas = consultas
+    Room.allocator = IdAllocator()
+    if consultas is not None:
+        for target_id in consultas.ids():
+            Room.allocator.reserve(target_id)
+        servidor.registry.generation = consultas.generacion()
+        servidor.registry.cargar = servidor.cargar_habitacion
+    return servidor
+
+
+def json(respuesta):
+    """ :param respuesta: Par (estado, cuerpo) de wsgi().
+    :returns: Par (código de estado, cuerpo JSON analizado)."""
+
+    estado, cuerpo = respuesta
+    return int(estado.split()[0]), loads(cuerpo) if cuerpo else None
+
+
+def puerto_libre():
+    """ :returns: Puerto TCP libre en localhost. """
+
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def pedir(ruta, metodo='GET'):
+    """ Llama a una ruta guardando las cabeceras de la respuesta.
+
+    :returns: Terna (código de estado, cabeceras, cuerpo en bytes)."""
+
+    cabeceras = {}
+
+    def app(environ, start_response):
+        def inicio(status, headers, exc_info=None):
+            cabeceras.update(headers)
+            return start_response(status, headers, exc_info)
+        return bottle.default_app()(environ, inicio)
+
+    estado, cuerpo = wsgi(metodo, ruta, app=app)
+    return int(estado.split()[0]), cabeceras, cuerpo